@@ -1,3 +1,6 @@
 from api.v1.endpoints.films import router as films_router  # noqa: F403,F401
 from api.v1.endpoints.persons import router as persons_router  # noqa: F403,F401
 from api.v1.endpoints.genres import router as genres_router  # noqa: F403,F401
+from api.v1.endpoints.stats import router as stats_router  # noqa: F403,F401
+from api.v1.endpoints.search import router as search_router  # noqa: F403,F401
+from api.v1.endpoints.suggest import router as suggest_router  # noqa: F403,F401
@@ -1,18 +1,24 @@
-import random
 from datetime import datetime
 from http import HTTPStatus
+from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from pydantic import BaseModel
 
 from constants import ListDictType, OptStrType
 from db.elastic import Indexes
-from services.film import FilmService, get_film_service
+from models.models import Film
+from services.film import FILM_LIST_SOURCE, FilmService, get_film_service
+from services.proto_service import ELASTIC_UNAVAILABLE_EXCEPTIONS
 from services.utils import validation_index_model_field
-from api.v1.paginate_params import PaginatedParams, get_paginated_params
+from api.v1.fields_params import FieldsParams, get_fields_params, get_source_includes
+from api.v1.paginate_params import (PaginatedParams, get_cursor_search_params, get_paginated_params,
+                                    get_query_fingerprint, set_next_cursor, set_total_count)
+from api.v1.response_cache import PARTIAL_RESULTS_HEADER, CachedRoute, cache_response, request_deadline
+from core.config import app_settings
 
 
-router = APIRouter()
+router = APIRouter(route_class=CachedRoute)
 
 
 class FilmListSerializer(BaseModel):
@@ -23,6 +29,23 @@ class FilmListSerializer(BaseModel):
     imdb_rating: float
 
 
+class FilmListProjectionSerializer(BaseModel):
+    '''модель для возврата списка фильмов из API с полями, запрошенными в параметре fields.
+    Поля, не запрошенные в параметре fields, в ответ не попадают'''
+
+    id: str
+    title: OptStrType = None
+    imdb_rating: float | None = None
+
+
+# Ответ списка фильмов: полный список либо проекция по параметру fields
+FilmListResponse = list[FilmListSerializer] | list[FilmListProjectionSerializer]
+
+
+# Количество рекомендуемых фильмов в film_details
+RECOMMENDED_FILMS_QTY = 3
+
+
 class FilmSerializer(FilmListSerializer):
     '''модель для возврата экземпляра фильма из API'''
 
@@ -37,45 +60,69 @@ class FilmSerializer(FilmListSerializer):
 
 
 @router.get('/search',
-            response_model=list[FilmListSerializer],
+            response_model=FilmListResponse,
+            response_model_exclude_unset=True,
             description="""Выполните запрос на поиск фильмов по названию, где:
     query - строка, по которой производится полнотекстовый поиск
     page_number - номер страницы
     page_size - размер станицы
+    cursor - курсор следующей страницы из заголовка X-Next-Cursor (вместо page_number)
+    with_total - вернуть общее число найденных фильмов в заголовке X-Total-Count
     sort - поле, по которому ссортируется список
+    fields - поля фильмов в ответе через запятую (по умолчанию - все)
     В ответе будет выведен список фильмов с id, названием и рейтингом.
     """)
+@cache_response(Film, ttl=app_settings.response_cache_film_ttl)
+@request_deadline(app_settings.deadline_search_ms)
 async def film_search(query: str,
+                      response: Response,
                       paginated: PaginatedParams = Depends(get_paginated_params),
                       sort: OptStrType = None,
-                      film_service: FilmService = Depends(get_film_service)) -> list[FilmListSerializer]:
+                      fields_params: FieldsParams = Depends(get_fields_params),
+                      film_service: FilmService = Depends(get_film_service)) -> FilmListResponse:
     '''Метод для поиска подходящих по названию фильмов
     :param query: строка, по которой производится полнотекстовый поиск
     :param page_number: номер страницы
     :param page_size: размер станицы
-    :param sort: поле, по которому ссортируется список'''
-    page_number = paginated.get_page_number()
+    :param cursor: курсор следующей страницы из заголовка X-Next-Cursor
+    :param with_total: вернуть общее число найденных фильмов в заголовке X-Total-Count
+    :param sort: поле, по которому ссортируется список
+    :param fields: поля фильмов в ответе'''
     page_size = paginated.get_page_size()
-    start_index = (page_number - 1) * page_size
+    fields = fields_params.get_fields(FilmListProjectionSerializer)
     index_model = Indexes.movies.value.get('index_model')
     sort = await validation_index_model_field(sort, index_model)
+    fingerprint = get_query_fingerprint(endpoint='film_search', query=query, sort=sort)
+    cursor = paginated.get_cursor(fingerprint)
 
-    film_list = await film_service.get_list_film(start_index, page_size, sort=sort, query=query)
+    film_page = await film_service.get_page_film(paginated.get_start_index(), page_size, sort=sort, query=query,
+                                                 source=get_source_includes(fields, Film),
+                                                 **get_cursor_search_params(cursor))
 
-    if not film_list:
+    if not film_page:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='films not found')
 
-    return [FilmListSerializer(**dict(film)) for film in film_list]
+    set_next_cursor(response, film_page, fingerprint)
+    if paginated.with_total:
+        set_total_count(response, await film_service.get_total_films(query=query))
+    serializer = fields_params.get_serializer(FilmListSerializer, FilmListProjectionSerializer)
+    return [serializer(**film.model_dump(include=set(fields))) for film in film_page.items]
 
 
 @router.get('/{film_id}',
             response_model=FilmSerializer,
             description="""Выполните запрос на поиск фильма по его id,
             в ответе будет выведен подробная информация о фильме""")
-async def film_details(film_id: str, film_service: FilmService = Depends(get_film_service)) -> FilmSerializer:
+@cache_response(Film, ttl=app_settings.response_cache_film_ttl)
+@request_deadline(app_settings.deadline_detail_ms)
+async def film_details(film_id: str,
+                       response: Response,
+                       film_service: FilmService = Depends(get_film_service)) -> FilmSerializer:
     """
     Метод возвращает сериализованный объект фильма по id.
-    В случае отсутствия фильма с указанным id - возвращает код ответа 404
+    В случае отсутствия фильма с указанным id - возвращает код ответа 404.
+    Если рекомендации получить не удалось (ElasticSearch недоступен), фильм отдается без них,
+    а ответ помечается как неполный и не кэшируется.
     :param film_id: id экземпляра фильма
     """
     try:
@@ -85,12 +132,12 @@ async def film_details(film_id: str, film_service: FilmService = Depends(get_fil
         if not film:
             raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='film not found')
 
-        # TODO add several genres
-
-        # genres = [genre['id'] for genre in film.genre]
-        genres = random.choice([genre['id'] for genre in film.genre])
-        recommended_film_list = await film_service.get_list_film(start_index=0, page_size=3, sort='-imdb_rating',
-                                                                 genre=genres)
+        try:
+            recommended_film_list = await film_service.get_recommended_films(film, RECOMMENDED_FILMS_QTY,
+                                                                             source=FILM_LIST_SOURCE)
+        except ELASTIC_UNAVAILABLE_EXCEPTIONS:
+            recommended_film_list = []
+            response.headers[PARTIAL_RESULTS_HEADER] = 'true'
         return FilmSerializer(
             recommended_films=[FilmListSerializer(**dict(film)) for film in recommended_film_list],
             **dict(film)
@@ -99,38 +146,63 @@ async def film_details(film_id: str, film_service: FilmService = Depends(get_fil
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='index not found')
 
 
-@router.get('', response_model=list[FilmListSerializer],
+@router.get('', response_model=FilmListResponse, response_model_exclude_unset=True,
             description="""Выполните запрос на поиск фильмов, где:
                 query - строка, по которой производится полнотекстовый поиск
                 page_number: номер страницы
                 page_size: размер станицы
+                cursor: курсор следующей страницы из заголовка X-Next-Cursor (вместо page_number)
+                with_total: вернуть общее число найденных фильмов в заголовке X-Total-Count
                 sort: поле, по которому ссортируется список
-                genre: жанр, по которому фильтруется список фильмов
+                genre: жанр, по которому фильтруется список фильмов; можно указать несколько
+                min_rating, max_rating: диапазон рейтинга фильмов
+                fields: поля фильмов в ответе через запятую (по умолчанию - все)
                 В ответе будет выведен сериализованный список фильмов, с опциональной фильтрацией по жанру.
                 В случае отсутствия подходяших фильмов - возвращает код ответа 404
                 """
             )
-async def film_list(paginated: PaginatedParams = Depends(get_paginated_params),
+@cache_response(Film, ttl=app_settings.response_cache_film_ttl)
+@request_deadline(app_settings.deadline_search_ms)
+async def film_list(response: Response,
+                    paginated: PaginatedParams = Depends(get_paginated_params),
                     sort: OptStrType = None,
-                    genre: OptStrType = None,
-                    film_service: FilmService = Depends(get_film_service)) -> list[FilmListSerializer]:
+                    genre: Annotated[list[str] | None, Query()] = None,
+                    min_rating: float | None = None,
+                    max_rating: float | None = None,
+                    fields_params: FieldsParams = Depends(get_fields_params),
+                    film_service: FilmService = Depends(get_film_service)) -> FilmListResponse:
     """
     Метод возвращает сериализованный список фильмов, с опциональной фильтрацией по жанру.
     В случае отсутствия подходяших фильмов - возвращает код ответа 404
     :param page_number: номер страницы
     :param page_size: размер станицы
+    :param cursor: курсор следующей страницы из заголовка X-Next-Cursor
+    :param with_total: вернуть общее число найденных фильмов в заголовке X-Total-Count
     :param sort: поле, по которому ссортируется список
-    :param genre: жанр, по которому фильтруется список фильмов'''
+    :param genre: жанры, по которым фильтруется список фильмов (подходит любой из них)
+    :param min_rating: минимальный рейтинг фильма
+    :param max_rating: максимальный рейтинг фильма
+    :param fields: поля фильмов в ответе'''
     """
     index_model = Indexes.movies.value.get('index_model')
     sort = await validation_index_model_field(sort, index_model)
-    page_number = paginated.get_page_number()
     page_size = paginated.get_page_size()
-    start_index = (page_number - 1) * page_size
+    fields = fields_params.get_fields(FilmListProjectionSerializer)
+    fingerprint = get_query_fingerprint(endpoint='film_list', sort=sort, genre=genre,
+                                        min_rating=min_rating, max_rating=max_rating)
+    cursor = paginated.get_cursor(fingerprint)
 
-    film_list = await film_service.get_list_film(start_index, page_size, sort, genre)
+    film_page = await film_service.get_page_film(paginated.get_start_index(), page_size, sort, genre,
+                                                 min_rating=min_rating, max_rating=max_rating,
+                                                 source=get_source_includes(fields, Film),
+                                                 **get_cursor_search_params(cursor))
 
-    if not film_list:
+    if not film_page:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='films not found')
 
-    return [FilmListSerializer(**dict(film)) for film in film_list]
+    set_next_cursor(response, film_page, fingerprint)
+    if paginated.with_total:
+        set_total_count(response, await film_service.get_total_films(genre, min_rating=min_rating,
+                                                                     max_rating=max_rating))
+    serializer = fields_params.get_serializer(FilmListSerializer, FilmListProjectionSerializer)
+    return [serializer(**film.model_dump(include=set(fields))) for film in film_page.items]
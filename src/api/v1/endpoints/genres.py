@@ -3,10 +3,13 @@ from http import HTTPStatus
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 
+from api.v1.response_cache import CachedRoute, cache_response, request_deadline
+from core.config import app_settings
 from db.elastic import Indexes
+from models.models import Film, Genre
 from services.genre import GenreService, get_genre_service
 
-router = APIRouter()
+router = APIRouter(route_class=CachedRoute)
 
 
 class GenreSerializer(BaseModel):
@@ -16,9 +19,35 @@ class GenreSerializer(BaseModel):
     name: str
 
 
+class GenreStatsSerializer(GenreSerializer):
+    """модель для возврата жанра с числом фильмов и их средним рейтингом"""
+
+    films_count: int
+    avg_rating: float | None = None
+
+
+@router.get('', response_model=list[GenreStatsSerializer],
+            description="""Выполните запрос на получение всех жанров с числом фильмов и их средним рейтингом,
+            жанры отсортированы по убыванию числа фильмов""")
+@cache_response(Genre, ttl=app_settings.response_cache_genre_ttl, depends_on=(Film,))
+@request_deadline(app_settings.deadline_search_ms)
+async def genre_list(genre_service: GenreService = Depends(get_genre_service)) -> list[GenreStatsSerializer]:
+    """
+    Метод возвращает все жанры фильмов с числом фильмов и средним рейтингом.
+    Статистика считается агрегацией в ElasticSearch и кэшируется до изменения индекса фильмов
+    """
+    genres_stats = await genre_service.get_genres_stats()
+    if not genres_stats:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='genres not found')
+
+    return [GenreStatsSerializer(**dict(genre)) for genre in genres_stats]
+
+
 @router.get('/{genre_id}', response_model=GenreSerializer,
             description="""Выполните запрос на поиск жанра по его id,
             В случае отсутствия жанра с указанным id - возвращает код ответа 404""")
+@cache_response(Genre, ttl=app_settings.response_cache_genre_ttl)
+@request_deadline(app_settings.deadline_detail_ms)
 async def genre_details(genre_id: str, genre_service: GenreService = Depends(get_genre_service)) -> GenreSerializer:
     """
     Метод возвращает сериализованный объект жанра по id.
@@ -1,14 +1,19 @@
 from http import HTTPStatus
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from pydantic import BaseModel, Field
 
 from db.elastic import Indexes
+from models.models import Person
 from services.person import PersonService, get_person_service
-from api.v1.paginate_params import PaginatedParams, get_paginated_params
+from api.v1.fields_params import FieldsParams, get_fields_params
+from api.v1.paginate_params import (PaginatedParams, get_cursor_search_params, get_paginated_params,
+                                    get_query_fingerprint, set_next_cursor, set_total_count)
+from api.v1.response_cache import CachedRoute, cache_response, request_deadline
+from core.config import app_settings
 
 
-router = APIRouter()
+router = APIRouter(route_class=CachedRoute)
 
 
 class PersonFilmsRoles(BaseModel):
@@ -34,72 +39,94 @@ class PersonFilmsSerializer(BaseModel):
     imdb_rating: float | None = None
 
 
+class PersonFilmsProjectionSerializer(BaseModel):
+    """
+    Модель для отображения фильмов, в которых принял участие персонаж, с полями из параметра fields.
+    Поля, не запрошенные в параметре fields, в ответ не попадают
+    """
+    id: str
+    title: str | None = None
+    imdb_rating: float | None = None
+
+
+# Ответ списка фильмов персонажа: полный список либо проекция по параметру fields
+PersonFilmsResponse = list[PersonFilmsSerializer] | list[PersonFilmsProjectionSerializer]
+
+
 @router.get('/search', response_model=list[PersonSerializer],
             description="""Выполните запрос на поиск персонажа по имени, где:
             query: строка, по которой производится полнотекстовый поиск
             page_number: номер страницы
             page_size: размер станицы
-            sort: поле, по которому ссортируется список
+            cursor: курсор следующей страницы из заголовка X-Next-Cursor (вместо page_number)
+            with_total: вернуть общее число найденных персонажей в заголовке X-Total-Count
 
             В ответе будет выведен список персонажей"""
             )
+@cache_response(Person, ttl=app_settings.response_cache_person_ttl)
+@request_deadline(app_settings.deadline_search_ms)
 async def persons_search(query: str,
+                         response: Response,
                          paginated: PaginatedParams = Depends(get_paginated_params),
                          person_service: PersonService = Depends(get_person_service)) -> list[PersonSerializer]:
     '''Метод для поиска подходящих по имени персонажей
     :param query: строка, по которой производится полнотекстовый поиск
     :param page_number: номер страницы
     :param page_size: размер станицы
-    :param sort: поле, по которому ссортируется список
+    :param cursor: курсор следующей страницы из заголовка X-Next-Cursor
+    :param with_total: вернуть общее число найденных персонажей в заголовке X-Total-Count
     :param person_service: '''
-    page_number = paginated.get_page_number()
     page_size = paginated.get_page_size()
-    start_index = (page_number - 1) * page_size
-    persons_data = await person_service.get_list_persons(start_index, page_size, query=query)
+    fingerprint = get_query_fingerprint(endpoint='persons_search', query=query)
+    cursor = paginated.get_cursor(fingerprint)
+    persons_page = await person_service.get_page_persons(paginated.get_start_index(), page_size, query=query,
+                                                         **get_cursor_search_params(cursor))
 
-    if not persons_data:
+    if not persons_page:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='persons not found')
 
-    persons_data_with_films = []
-    for person in persons_data:
-        films_data = await person_service.get_person_films_by_id(person)
-        films_by_person = await person_service.filter_films_by_person_with_role(films_data, person)
-        person_data = person.dict()
-        person_data['films'] = films_by_person
-        persons_data_with_films.append(person_data)
-    return [PersonSerializer(**dict(person)) for person in persons_data_with_films]
+    set_next_cursor(response, persons_page, fingerprint)
+    if paginated.with_total:
+        set_total_count(response, await person_service.get_total_persons(query))
+    return [PersonSerializer(**person.model_dump()) for person in persons_page.items]
 
 
 @router.get('/{person_id}', response_model=PersonSerializer,
             description="""Выполните запрос на поиск персонажа по его id,
             в ответе будет выведен подробная информация о персонаже, со списком его фильмов и ролей""")
+@cache_response(Person, ttl=app_settings.response_cache_person_ttl, popularity_param='person_id')
+@request_deadline(app_settings.deadline_detail_ms)
 async def person_detail(
         person_id: str,
         person_service: PersonService = Depends(get_person_service)
 ) -> PersonSerializer:
-    """Получение информации о персонаже, со списком его фильмов и ролей"""
+    """
+    Получение информации о персонаже, со списком его фильмов и ролей.
+    Фильмография хранится в документе персонажа, поэтому нужен только один запрос.
+    """
     try:
         index_dict = Indexes.persons.value
         person = await person_service.get_by_id(person_id, index_dict)
-        films_data = await person_service.get_person_films_by_id(person=person)
     except KeyError:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='index not found')
 
-    films_by_person = await person_service.filter_films_by_person_with_role(films_data, person)
-    person_data = person.dict()
-    person_data['films'] = films_by_person
-    return PersonSerializer(**person_data)
+    return PersonSerializer(**person.model_dump())
 
 
-@router.get('/{person_id}/film', response_model=list[PersonFilmsSerializer],
+@router.get('/{person_id}/film', response_model=PersonFilmsResponse, response_model_exclude_unset=True,
             description="""Выполните запрос на поиск персонажа по его id,
-            в ответе будет выведен информация о фильмах, в которых принял участие персонаж""")
+            в ответе будет выведен информация о фильмах, в которых принял участие персонаж.
+            fields: поля фильмов в ответе через запятую (по умолчанию - все)""")
+@cache_response(Person, ttl=app_settings.response_cache_person_ttl)
+@request_deadline(app_settings.deadline_detail_ms)
 async def person_films_detail(
         person_id: str,
+        fields_params: FieldsParams = Depends(get_fields_params),
         person_service: PersonService = Depends(get_person_service)
-) -> list[PersonFilmsSerializer]:
-    """Получение информации о фильмах, в которых принял участие персонаж"""
+) -> PersonFilmsResponse:
+    """Получение информации о фильмах, в которых принял участие персонаж, из документа персонажа"""
+    fields = fields_params.get_fields(PersonFilmsProjectionSerializer)
     index_dict = Indexes.persons.value
     person = await person_service.get_by_id(person_id, index_dict)
-    persons_films = await person_service.get_person_films_by_id(person)
-    return [PersonFilmsSerializer(**film.dict()) for film in persons_films]
+    serializer = fields_params.get_serializer(PersonFilmsSerializer, PersonFilmsProjectionSerializer)
+    return [serializer(**film.model_dump(include=set(fields))) for film in person.films]
@@ -0,0 +1,45 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Query
+from pydantic import BaseModel
+
+from api.v1.endpoints.films import FilmListSerializer
+from api.v1.endpoints.genres import GenreSerializer
+from api.v1.endpoints.persons import PersonSerializer
+from api.v1.response_cache import CachedRoute, cache_response, request_deadline
+from core.config import app_settings
+from models.models import Film, Genre, Person
+from services.film import FILM_LIST_SOURCE
+from services.multi_search import MultiSearchService, get_multi_search_service
+
+router = APIRouter(route_class=CachedRoute)
+
+
+class SearchSerializer(BaseModel):
+    """Модель для возврата результатов общего поиска, сгруппированных по типам"""
+    films: list[FilmListSerializer]
+    persons: list[PersonSerializer]
+    genres: list[GenreSerializer]
+
+
+@router.get('', response_model=SearchSerializer, response_model_exclude_unset=True,
+            description="""Выполните общий поиск по фильмам, персонажам и жанрам, где:
+            query: строка, по которой производится полнотекстовый поиск
+            size: количество результатов в каждом разделе
+            В ответе будут выведены лучшие результаты каждого типа""")
+@cache_response(Film, ttl=app_settings.response_cache_film_ttl, depends_on=(Person, Genre))
+@request_deadline(app_settings.deadline_search_ms)
+async def search(query: str,
+                 size: Annotated[int, Query(description='Results per section', ge=1, le=100)] = 5,
+                 search_service: MultiSearchService = Depends(get_multi_search_service)) -> SearchSerializer:
+    """
+    Общий поиск: фильмы, персонажи и жанры ищутся одним запросом msearch.
+    :param query: строка, по которой производится полнотекстовый поиск
+    :param size: количество результатов в каждом разделе
+    """
+    results = await search_service.search(query, size, film_source=FILM_LIST_SOURCE)
+    return SearchSerializer(
+        films=[FilmListSerializer(**dict(film)) for film in results['films']],
+        persons=[PersonSerializer(id=person.id, name=person.name) for person in results['persons']],
+        genres=[GenreSerializer(**dict(genre)) for genre in results['genres']],
+    )
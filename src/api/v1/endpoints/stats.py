@@ -0,0 +1,51 @@
+from elasticsearch import AsyncElasticsearch
+from fastapi import APIRouter, Depends
+from redis.asyncio import Redis
+
+from api.v1.response_cache import ResponseCacheStats, get_response_cache_stats
+from db.connections import ConnectionStats, get_connection_stats
+from db.elastic import get_elastic
+from db.redis import get_redis
+from services.resilience import get_resilience_stats
+from services.generations import CacheGenerations, get_cache_generations
+from services.local_cache import LocalCache, get_local_cache
+from services.single_flight import SingleFlight, get_single_flight
+
+router = APIRouter()
+
+
+@router.get('/cache',
+            description="""Статистика кэша текущего воркера:
+            количество записей L1-кэша, попадания, промахи и вытеснения,
+            количество схлопнутых одинаковых запросов при промахах кэша
+            попадания в кэш готовых HTTP-ответов и известные воркеру поколения данных индексов""")
+async def cache_stats(local_cache: LocalCache = Depends(get_local_cache),
+                      single_flight: SingleFlight = Depends(get_single_flight),
+                      response_cache: ResponseCacheStats = Depends(get_response_cache_stats),
+                      generations: CacheGenerations = Depends(get_cache_generations)) -> dict:
+    """Возвращает счетчики кэша воркера, обработавшего запрос"""
+    return {
+        'local_cache': local_cache.stats(),
+        'single_flight': single_flight.stats(),
+        'response_cache': response_cache.stats(),
+        'generations': generations.stats(),
+    }
+
+
+@router.get('/connections',
+            description="""Статистика соединений текущего воркера:
+            занятые и свободные соединения пулов Redis и ElasticSearch, их заполненность
+            и результаты последней проверки соединений""")
+async def connection_stats(redis: Redis = Depends(get_redis),
+                           elastic: AsyncElasticsearch = Depends(get_elastic),
+                           stats: ConnectionStats = Depends(get_connection_stats)) -> dict:
+    """Возвращает заполненность пулов соединений воркера, обработавшего запрос"""
+    return stats.stats(redis, elastic)
+
+
+@router.get('/resilience',
+            description="""Состояние предохранителей Redis и ElasticSearch текущего воркера
+            и расход бюджета повторов запросов""")
+async def resilience_stats() -> dict:
+    """Возвращает состояние предохранителей и бюджета повторов воркера, обработавшего запрос"""
+    return get_resilience_stats()
@@ -0,0 +1,49 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Query
+from pydantic import BaseModel
+
+from api.v1.response_cache import CachedRoute, cache_response
+from core.config import app_settings
+from models.models import Film, Person
+from services.suggest import SuggestService, get_suggest_service
+
+router = APIRouter(route_class=CachedRoute)
+
+
+class FilmSuggestSerializer(BaseModel):
+    """Модель для возврата подсказки-фильма"""
+    id: str
+    title: str
+
+
+class PersonSuggestSerializer(BaseModel):
+    """Модель для возврата подсказки-персонажа"""
+    id: str
+    name: str
+
+
+class SuggestSerializer(BaseModel):
+    """Модель для возврата подсказок автодополнения, сгруппированных по типам"""
+    films: list[FilmSuggestSerializer]
+    persons: list[PersonSuggestSerializer]
+
+
+@router.get('', response_model=SuggestSerializer,
+            description="""Выполните запрос подсказок для поиска по мере ввода, где:
+            prefix: начало названия фильма или имени персонажа
+            size: количество подсказок каждого типа""")
+@cache_response(Film, ttl=app_settings.suggest_cache_ttl, depends_on=(Person,))
+async def suggest(prefix: Annotated[str, Query(description='Beginning of title or name',
+                                               min_length=1, max_length=100)],
+                  size: Annotated[int, Query(description='Suggestions', ge=1, le=20)] = app_settings.suggest_size,
+                  suggest_service: SuggestService = Depends(get_suggest_service)) -> SuggestSerializer:
+    """
+    Подсказки автодополнения: названия фильмов и имена персонажей, начинающиеся с prefix.
+    Ответы на префиксы кэшируются на короткое время.
+    """
+    results = await suggest_service.suggest(prefix, size)
+    return SuggestSerializer(
+        films=[FilmSuggestSerializer(id=film.id, title=film.title) for film in results['films']],
+        persons=[PersonSuggestSerializer(id=person.id, name=person.name) for person in results['persons']],
+    )
@@ -0,0 +1,52 @@
+from functools import lru_cache
+from http import HTTPStatus
+from typing import Annotated
+
+from fastapi import HTTPException, Query
+from pydantic import BaseModel
+
+
+class FieldsParams:
+    def __init__(self, fields):
+        self.fields = fields
+
+    def get_fields(self, serializer: type[BaseModel]) -> list[str]:
+        """
+        Возвращает поля сериализатора, которые нужно отдать клиенту:
+        все поля, либо только запрошенные в параметре fields и обязательные поля сериализатора
+        """
+        serializer_fields = list(serializer.model_fields)
+        if not self.fields:
+            return serializer_fields
+
+        requested = [field.strip() for field in self.fields.split(',') if field.strip()]
+        unknown = [field for field in requested if field not in serializer_fields]
+        if unknown:
+            raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f'unknown fields: {", ".join(unknown)}')
+        return [
+            name for name, field in serializer.model_fields.items()
+            if name in requested or field.is_required()
+        ]
+
+    def get_serializer(self, serializer: type[BaseModel], projection: type[BaseModel]) -> type[BaseModel]:
+        """
+        Возвращает сериализатор ответа: полный serializer со строгой схемой, если параметр fields не задан,
+        либо projection, в которой все поля, кроме обязательных, необязательные
+        """
+        return projection if self.fields else serializer
+
+
+@lru_cache()
+def get_fields_params(
+        fields: Annotated[str | None, Query(description='Comma separated list of fields to return')] = None,
+) -> FieldsParams:
+    return FieldsParams(fields)
+
+
+def get_source_includes(fields: list[str], model: type[BaseModel]) -> list[str]:
+    """
+    Поля документа, которые нужно забрать из ElasticSearch (_source) для отдачи полей fields.
+    К ним добавляются обязательные поля модели, без которых объект нельзя собрать и сохранить в кэш.
+    """
+    required = [name for name, field in model.model_fields.items() if field.is_required()]
+    return [*required, *[field for field in fields if field not in required]]
@@ -1,12 +1,35 @@
+import base64
+import binascii
+import hashlib
 from functools import lru_cache
-from typing import Annotated
-from fastapi import Query
+from http import HTTPStatus
+from typing import Annotated, NamedTuple
+
+import orjson
+from fastapi import HTTPException, Query, Response
+
+from api.v1.response_cache import PARTIAL_RESULTS_HEADER
+from core.config import app_settings
+from models.models import Page, TotalCount
+
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+TOTAL_COUNT_HEADER = 'X-Total-Count'
+# eq - число точное, gte - подсчет остановлен на пороге и найдено не меньше
+TOTAL_COUNT_RELATION_HEADER = 'X-Total-Count-Relation'
+
+
+class Cursor(NamedTuple):
+    """Позиция в выдаче: значения сортировки последней отданной записи и срез индекса, в котором шла выдача"""
+    search_after: list
+    pit_id: str | None = None
 
 
 class PaginatedParams:
-    def __init__(self, page_size, page_number):
+    def __init__(self, page_size, page_number, cursor=None, with_total=False):
         self.page_size = page_size
         self.page_number = page_number
+        self.cursor = cursor
+        self.with_total = with_total
 
     def get_page_size(self):
         return self.page_size
@@ -14,10 +37,83 @@ class PaginatedParams:
     def get_page_number(self):
         return self.page_number
 
+    def get_start_index(self):
+        return 0 if self.cursor else (self.page_number - 1) * self.page_size
+
+    def get_cursor(self, fingerprint: str) -> Cursor | None:
+        """Возвращает позицию из курсора запроса, если он передан"""
+        if not self.cursor:
+            return None
+        return decode_cursor(self.cursor, fingerprint)
+
 
 @lru_cache()
 def get_paginated_params(
-        page_size: Annotated[int, Query(description='Pagination page size', ge=1)] = 100,
+        page_size: Annotated[
+            int, Query(description='Pagination page size', ge=1, le=app_settings.pagination_max_window)
+        ] = 100,
         page_number: Annotated[int, Query(description='Pagination page number', ge=1)] = 1,
+        cursor: Annotated[str | None, Query(description='Pagination cursor from X-Next-Cursor header')] = None,
+        with_total: Annotated[bool, Query(description='Return total count in X-Total-Count header')] = False,
 ) -> PaginatedParams:
-    return PaginatedParams(page_size, page_number)
+    if cursor is None and page_number * page_size > app_settings.pagination_max_window:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail=f'page_number * page_size must not exceed {app_settings.pagination_max_window}, '
+                   f'use cursor from {NEXT_CURSOR_HEADER} header for deeper pages',
+        )
+    return PaginatedParams(page_size, page_number, cursor, with_total)
+
+
+def get_query_fingerprint(**params) -> str:
+    """Отпечаток параметров запроса: курсор действителен только для того запроса, которым он выдан"""
+    data = orjson.dumps(params, option=orjson.OPT_SORT_KEYS)
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+def encode_cursor(cursor: Cursor, fingerprint: str) -> str:
+    data = orjson.dumps({'a': cursor.search_after, 'p': cursor.pit_id, 'f': fingerprint})
+    return base64.urlsafe_b64encode(data).decode()
+
+
+def decode_cursor(token: str, fingerprint: str) -> Cursor:
+    try:
+        data = orjson.loads(base64.urlsafe_b64decode(token.encode()))
+        cursor = Cursor(data['a'], data['p'])
+        valid = data['f'] == fingerprint and isinstance(cursor.search_after, list)
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        valid = False
+
+    if not valid:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail='invalid cursor')
+    return cursor
+
+
+def get_cursor_search_params(cursor: Cursor | None) -> dict:
+    """Параметры сервиса для выдачи страницы, следующей за курсором"""
+    if cursor is None:
+        return {}
+    return {
+        'search_after': cursor.search_after,
+        'pit_id': cursor.pit_id,
+        'use_pit': app_settings.pagination_use_pit,
+    }
+
+
+def set_next_cursor(response: Response, page: Page, fingerprint: str):
+    """
+    Передает курсор следующей страницы в заголовке ответа; у последней страницы заголовка нет.
+    Срез индекса в курсор берется из страницы: если он истек, следующая страница откроет новый.
+    Неполная страница помечается заголовком, такой ответ не кэшируется.
+    """
+    if page.partial:
+        response.headers[PARTIAL_RESULTS_HEADER] = 'true'
+    if page.search_after is None:
+        return
+    response.headers[NEXT_CURSOR_HEADER] = encode_cursor(Cursor(page.search_after, page.pit_id), fingerprint)
+
+
+def set_total_count(response: Response, total_count: TotalCount):
+    """Передает общее число найденных объектов в заголовках ответа"""
+    response.headers[TOTAL_COUNT_HEADER] = str(total_count.value)
+    response.headers[TOTAL_COUNT_RELATION_HEADER] = 'eq' if total_count.exact else 'gte'
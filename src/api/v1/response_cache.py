@@ -0,0 +1,202 @@
+import logging
+import os
+from dataclasses import dataclass
+from typing import Callable
+
+import orjson
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+
+from core.config import app_settings
+from db.redis import get_redis
+from services.cache_keys import CACHE_NAMESPACES, build_response_key
+from services.deadline import DeadlineExceeded, deadline_scope, is_cache_read_allowed, read_cache_within_deadline
+from services.exceptions import CONNECTION_EXCEPTIONS
+from services.last_good import is_served_last_good, reset_served_last_good
+from services.local_cache import get_local_cache
+from services.popularity import get_popularity_tracker
+from services.resilience import REDIS, get_circuit_breaker
+
+logger = logging.getLogger(os.path.basename(__file__))
+
+RESPONSE_CACHE_ATTR = '__response_cache__'
+DEADLINE_ATTR = '__deadline_ms__'
+CACHE_STATUS_HEADER = 'X-Cache'
+# Ответ собран из неполных результатов ElasticSearch (истек бюджет времени) и не кэшируется
+PARTIAL_RESULTS_HEADER = 'X-Partial-Results'
+# Ответ собран из последних удачных значений, пока ElasticSearch недоступен (RFC 7234, 110 Response is Stale)
+STALE_WARNING = '110 - "Response is Stale"'
+SKIPPED_HEADERS = ('content-length', CACHE_STATUS_HEADER.lower())
+
+
+@dataclass(frozen=True)
+class ResponseCachePolicy:
+    model: type[BaseModel]
+    ttl: int
+    popularity_param: str | None = None
+    depends_on: tuple[type[BaseModel], ...] = ()
+
+
+@dataclass
+class ResponseCacheStats:
+    hits: int = 0
+    misses: int = 0
+    # Промахи, на которые отдан ответ из последних удачных значений
+    stale: int = 0
+
+    def stats(self) -> dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'stale': self.stale}
+
+
+response_cache_stats = ResponseCacheStats()
+
+
+def get_response_cache_stats() -> ResponseCacheStats:
+    return response_cache_stats
+
+
+def cache_response(model: type[BaseModel],
+                   ttl: int,
+                   popularity_param: str | None = None,
+                   depends_on: tuple[type[BaseModel], ...] = ()) -> Callable:
+    """
+    Включает кэширование готового ответа эндпоинта (тело и заголовки) на ttl секунд.
+    Работает для роутеров с route_class=CachedRoute. Ответ хранится в пространстве имен
+    ключей сущности model и инвалидируется вместе с ней.
+    :param popularity_param: path-параметр с id объекта, запросы к которому учитываются
+    при выборе самых запрашиваемых объектов для прогрева кэша
+    :param depends_on: другие сущности, данные которых входят в ответ; ответ инвалидируется и при их изменении
+    """
+    def decorator(endpoint: Callable) -> Callable:
+        policy = ResponseCachePolicy(model=model, ttl=ttl, popularity_param=popularity_param, depends_on=depends_on)
+        setattr(endpoint, RESPONSE_CACHE_ATTR, policy)
+        return endpoint
+    return decorator
+
+
+def request_deadline(deadline_ms: int) -> Callable:
+    """
+    Задает бюджет времени обработки запроса эндпоинтом (для роутеров с route_class=CachedRoute).
+    Остаток бюджета ограничивает запросы к ElasticSearch и Redis; если его не хватило и нет
+    даже устаревшего результата из кэша - ответ 504.
+    """
+    def decorator(endpoint: Callable) -> Callable:
+        setattr(endpoint, DEADLINE_ATTR, deadline_ms)
+        return endpoint
+    return decorator
+
+
+def _encode_response(response: Response) -> bytes:
+    meta = {
+        'status_code': response.status_code,
+        'headers': {name: value for name, value in response.headers.items() if name not in SKIPPED_HEADERS},
+    }
+    return orjson.dumps(meta) + b'\n' + response.body
+
+
+def _decode_response(data: bytes) -> Response:
+    meta, body = data.split(b'\n', 1)
+    meta = orjson.loads(meta)
+    response = Response(content=body, status_code=meta['status_code'], headers=meta['headers'])
+    response.headers[CACHE_STATUS_HEADER] = 'HIT'
+    return response
+
+
+class CachedRoute(APIRoute):
+    """
+    Роут, который для GET-эндпоинтов, помеченных cache_response, отдает ответ из кэша
+    (L1-кэш воркера, затем Redis) без вызова сервисов и сериализации через pydantic,
+    а для помеченных request_deadline - ограничивает время обработки запроса.
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = self._get_cached_handler(super().get_route_handler())
+        deadline_ms: int | None = getattr(self.endpoint, DEADLINE_ATTR, None)
+        if deadline_ms is None:
+            return handler
+
+        async def handler_with_deadline(request: Request) -> Response:
+            with deadline_scope(deadline_ms / 1000):
+                return await handler(request)
+
+        return handler_with_deadline
+
+    def _get_cached_handler(self, original_handler: Callable) -> Callable:
+        policy: ResponseCachePolicy | None = getattr(self.endpoint, RESPONSE_CACHE_ATTR, None)
+        if policy is None:
+            return original_handler
+
+        async def cached_handler(request: Request) -> Response:
+            if request.method != 'GET':
+                return await original_handler(request)
+
+            cache_key = build_response_key(
+                policy.model, request.url.path, request.query_params.multi_items(), policy.depends_on,
+            )
+            data = await _read_response(cache_key)
+            if data is not None:
+                response_cache_stats.hits += 1
+                _record_popularity(policy, request)
+                return _decode_response(data)
+
+            response_cache_stats.misses += 1
+            reset_served_last_good()
+            response = await original_handler(request)
+            if response.status_code == 200:
+                _record_popularity(policy, request)
+            if is_served_last_good():
+                # Устаревший ответ не кэшируется, чтобы после восстановления ElasticSearch сразу отдавать свежий
+                response_cache_stats.stale += 1
+                response.headers[CACHE_STATUS_HEADER] = 'stale'
+                response.headers['Warning'] = STALE_WARNING
+                return response
+
+            is_complete = PARTIAL_RESULTS_HEADER not in response.headers
+            if response.status_code == 200 and hasattr(response, 'body') and is_complete:
+                await _write_response(cache_key, _encode_response(response), policy.ttl)
+            response.headers[CACHE_STATUS_HEADER] = 'MISS'
+            return response
+
+        return cached_handler
+
+
+def _record_popularity(policy: ResponseCachePolicy, request: Request):
+    """Считает запрос объекта для прогрева кэша; вызывается только для успешных ответов, чтобы не считать 404"""
+    if policy.popularity_param:
+        get_popularity_tracker().record(CACHE_NAMESPACES[policy.model], request.path_params[policy.popularity_param])
+
+
+async def _read_response(cache_key: str) -> bytes | None:
+    local_cache = get_local_cache()
+    data = local_cache.get(cache_key)
+    if data is not None:
+        return data
+
+    if get_circuit_breaker(REDIS).is_open or not is_cache_read_allowed():
+        return None
+
+    try:
+        redis = await get_redis()
+        data = await read_cache_within_deadline(redis.get(cache_key))
+    except DeadlineExceeded:
+        return None
+    except CONNECTION_EXCEPTIONS:
+        logger.warning(f'Response cache is unavailable, skip reading {cache_key}')
+        return None
+
+    if data is not None:
+        local_cache.set(cache_key, data, app_settings.local_cache_default_ttl)
+    return data
+
+
+async def _write_response(cache_key: str, data: bytes, ttl: int):
+    get_local_cache().set(cache_key, data, min(ttl, app_settings.local_cache_default_ttl))
+    if get_circuit_breaker(REDIS).is_open:
+        return
+
+    try:
+        redis = await get_redis()
+        await redis.set(cache_key, data, ttl)
+    except CONNECTION_EXCEPTIONS:
+        logger.warning(f'Response cache is unavailable, skip writing {cache_key}')
@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from api.v1.endpoints import films_router, persons_router, genres_router
+from api.v1.endpoints import films_router, persons_router, genres_router, search_router, stats_router, suggest_router
 
 main_router = APIRouter()
 
@@ -21,3 +21,21 @@ main_router.include_router(
     prefix='/genres',
     tags=['Genres'],
 )
+
+main_router.include_router(
+    search_router,
+    prefix='/search',
+    tags=['Search'],
+)
+
+main_router.include_router(
+    suggest_router,
+    prefix='/suggest',
+    tags=['Suggest'],
+)
+
+main_router.include_router(
+    stats_router,
+    prefix='/stats',
+    tags=['Stats'],
+)
@@ -0,0 +1,84 @@
+"""
+Микробенчмарк декодирования закэшированных значений фильмов: страницы выдачи (Page[Film])
+и отдельного фильма (Film) - именно эти типы ProtoService хранит в кэше.
+Сравнивает прежний формат (json.loads + json.dumps + parse_raw на каждый объект)
+с кодеками из services.cache_codecs.
+
+Запуск из директории src: python -m benchmarks.cache_codecs [--page-size 100] [--repeat 200]
+"""
+import argparse
+import json
+import random
+import timeit
+
+from faker import Faker
+
+from models.models import Film, Page
+from services.cache_codecs import CACHE_CODECS, decode_entry, encode_entry
+
+fake = Faker()
+
+
+def generate_films(page_size: int) -> list[Film]:
+    def persons(qty):
+        return [{'id': fake.uuid4(), 'name': fake.name()} for _ in range(qty)]
+
+    return [
+        Film(
+            id=fake.uuid4(),
+            title=fake.bs().title(),
+            imdb_rating=round(random.uniform(1, 10), 1),
+            genre=[{'id': fake.uuid4(), 'name': fake.word()} for _ in range(2)],
+            description=fake.text(),
+            directors=persons(1),
+            actors=persons(8),
+            writers=persons(2),
+        )
+        for _ in range(page_size)
+    ]
+
+
+def legacy_decode_page(data: bytes) -> Page[Film]:
+    """Прежняя реализация ProtoService._get_objs_from_cache: объекты страницы разбираются по одному"""
+    return Page[Film](items=[Film.parse_raw(json.dumps(obj)) for obj in json.loads(data.decode())])
+
+
+def legacy_decode_film(data: bytes) -> Film:
+    """Прежняя реализация ProtoService._get_obj_from_cache"""
+    return Film.parse_raw(data)
+
+
+def measure(func, repeat: int) -> float:
+    """Среднее время одного вызова в микросекундах"""
+    return timeit.timeit(func, number=repeat) / repeat * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    films = generate_films(args.page_size)
+    page = Page[Film](items=films, search_after=[films[-1].imdb_rating, films[-1].id])
+    cases = [
+        (f'cached page of {args.page_size} films', Page[Film], page,
+         ('[' + ','.join([film.json() for film in films]) + ']').encode(), legacy_decode_page),
+        ('cached film', Film, films[0], films[0].json().encode(), legacy_decode_film),
+    ]
+
+    for title, value_type, value, legacy_data, legacy_decode in cases:
+        print(f'Decode cost per {title}:')  # noqa: T201
+        legacy_time = measure(lambda: legacy_decode(legacy_data), args.repeat)
+        print(f'{"legacy json":>12}: {legacy_time:10.1f} us, {len(legacy_data)} bytes')  # noqa: T201
+
+        for name, codec_class in CACHE_CODECS.items():
+            codec = codec_class()
+            data = encode_entry(value_type, value, 0, codec)
+            assert decode_entry(value_type, data)[0] == value
+            print(f'{name:>12}: {measure(lambda: decode_entry(value_type, data), args.repeat):10.1f} us, '  # noqa: T201
+                  f'{len(data)} bytes')
+
+
+if __name__ == '__main__':
+    main()
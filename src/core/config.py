@@ -1,4 +1,5 @@
 import os
+from typing import Literal
 from logging import config as logging_config
 
 from dotenv import load_dotenv
@@ -22,6 +23,134 @@ class AppSettings(BaseSettings):
     elastic_host: str = Field(default='elasticsearch')
     elastic_port: int = Field(default=9200)
 
+    # Настройки соединений воркера с Redis и ElasticSearch.
+    # Пул Redis ограничен: при его исчерпании запрос ждет свободное соединение не дольше redis_pool_timeout
+    redis_max_connections: int = Field(default=50)
+    redis_pool_timeout: float = Field(default=2.0)
+    redis_connect_timeout: float = Field(default=1.0)
+    redis_socket_timeout: float = Field(default=2.0)
+    redis_socket_keepalive: bool = Field(default=True)
+    redis_health_check_interval: int = Field(default=30)
+    elastic_max_connections: int = Field(default=20)
+    elastic_timeout: float = Field(default=10.0)
+    elastic_keepalive_timeout: float = Field(default=60.0)
+    elastic_http_compress: bool = Field(default=True)
+    # Узлы кластера ElasticSearch, например ["es01:9200","es02:9200"]; если не заданы - elastic_host:elastic_port.
+    # Запросы распределяются по живым узлам с учетом времени их ответа, пул соединений - у каждого узла свой.
+    # Недоступный узел исключается на elastic_dead_timeout секунд, при повторных сбоях - вдвое дольше
+    elastic_hosts: list[str] = Field(default=[])
+    elastic_dead_timeout: float = Field(default=30.0)
+    # Сколько раз клиент сразу повторяет на другом узле запрос, не дошедший до узла. Повторы с задержкой
+    # и бюджетом выполняет декоратор resilient, поэтому здесь - не больше одного перехода на другой узел
+    elastic_max_retries: int = Field(default=1)
+    # Вес нового замера в сглаженном времени ответа узла и через сколько секунд без замеров оно забывается,
+    # чтобы медленный в прошлом узел снова получил запросы
+    elastic_latency_decay: float = Field(default=0.3)
+    elastic_latency_ttl: float = Field(default=30.0)
+    # Обнаружение узлов кластера (sniffing): при старте, при сбое соединения и раз в elastic_sniffer_timeout секунд.
+    # Узлы должны быть доступны по адресам, которые они публикуют (http.publish_address)
+    elastic_sniff_on_start: bool = Field(default=False)
+    elastic_sniff_on_connection_fail: bool = Field(default=False)
+    elastic_sniffer_timeout: float | None = Field(default=None)
+    # Сколько соединений открывается заранее при старте воркера и как часто проверяются соединения
+    connections_warm_up: int = Field(default=4)
+    connections_ping_interval: float = Field(default=15.0)
+
+    # Настройки кэша в Redis: через soft_ttl запись обновляется в фоне,
+    # а еще grace секунд после этого может отдаваться устаревшей.
+    # Изменения данных инвалидируют кэш через поколения индексов, поэтому ttl могут быть длинными
+    cache_default_soft_ttl: int = Field(default=60 * 60)
+    cache_default_grace: int = Field(default=60 * 60)
+    cache_film_soft_ttl: int = Field(default=60 * 60)
+    cache_film_grace: int = Field(default=60 * 60)
+    cache_genre_soft_ttl: int = Field(default=60 * 60)
+    cache_genre_grace: int = Field(default=60 * 60)
+    cache_person_soft_ttl: int = Field(default=60 * 60)
+    cache_person_grace: int = Field(default=60 * 60)
+
+    # Формат хранения значений в Redis: orjson или msgpack
+    cache_codec: Literal['orjson', 'msgpack'] = Field(default='orjson')
+
+    # Время жизни отметки об отсутствии результата (пустой поиск, неизвестный id)
+    cache_negative_ttl: int = Field(default=30)
+
+    # Последние удачные значения хранятся рядом с кэшем намного дольше его и отдаются
+    # с заголовком X-Cache: stale, если ElasticSearch недоступен
+    cache_last_good_enabled: bool = Field(default=True)
+    cache_last_good_ttl: int = Field(default=60 * 60 * 24 * 7)
+
+    # Время жизни закэшированных HTTP-ответов
+    response_cache_film_ttl: int = Field(default=60)
+    response_cache_genre_ttl: int = Field(default=300)
+    response_cache_person_ttl: int = Field(default=60)
+
+    # Настройки L1-кэша в памяти воркера
+    local_cache_max_entries: int = Field(default=10000)
+    local_cache_default_ttl: int = Field(default=30)
+    local_cache_film_ttl: int = Field(default=30)
+    local_cache_genre_ttl: int = Field(default=300)
+    local_cache_person_ttl: int = Field(default=60)
+
+    # Настройки схлопывания одинаковых запросов при промахе кэша
+    single_flight_lock_ttl_ms: int = Field(default=3000)
+    single_flight_wait_timeout: float = Field(default=2.0)
+    single_flight_poll_interval: float = Field(default=0.05)
+
+    # Настройки прогрева кэша
+    cache_warmer_on_startup: bool = Field(default=True)
+    cache_warmer_film_pages: int = Field(default=3)
+    cache_warmer_page_size: int = Field(default=100)
+    cache_warmer_top_persons: int = Field(default=100)
+    cache_warmer_concurrency: int = Field(default=4)
+    cache_warmer_lock_ttl: int = Field(default=300)
+
+    # Настройки учета самых запрашиваемых объектов
+    popularity_max_tracked: int = Field(default=1000)
+    popularity_retention: int = Field(default=60 * 60 * 24)
+    popularity_flush_interval: float = Field(default=10.0)
+
+    # Настройки пагинации
+    # Постраничная выдача (page_number) ограничена окном index.max_result_window,
+    # дальше - только по курсору
+    pagination_max_window: int = Field(default=10000)
+    pagination_use_pit: bool = Field(default=True)
+    pagination_pit_keep_alive: str = Field(default='1m')
+    # Порог, до которого считается общее число найденных объектов (заголовок X-Total-Count)
+    total_count_threshold: int = Field(default=10000)
+
+    # Сколько похожих фильмов сохраняет офлайн-расчет рекомендаций для каждого фильма
+    similar_films_top_k: int = Field(default=10)
+
+    # Настройки запросов к ElasticSearch
+    elastic_request_cache: bool = Field(default=True)
+
+    # Настройки автодополнения: число подсказок каждого типа, бюджет времени запроса к ElasticSearch
+    # и время жизни закэшированных ответов на префиксы
+    suggest_size: int = Field(default=5)
+    suggest_timeout_ms: int = Field(default=150)
+    suggest_cache_ttl: int = Field(default=30)
+
+    # Бюджеты времени на обработку запросов, мс. Остаток бюджета передается в таймауты запросов
+    # к ElasticSearch и Redis. Чтение кэша занимает не больше deadline_cache_read_share остатка,
+    # чтобы при медленном Redis осталось время на ElasticSearch, а при остатке меньше
+    # deadline_cache_min_ms пропускается
+    deadline_detail_ms: int = Field(default=150)
+    deadline_search_ms: int = Field(default=400)
+    deadline_cache_min_ms: int = Field(default=10)
+    deadline_cache_read_share: float = Field(default=0.3)
+
+    # Настройки устойчивости к сбоям Redis и ElasticSearch.
+    # После circuit_failure_threshold сбоев подряд обращения к хранилищу прекращаются на circuit_recovery_timeout
+    # секунд; повторы запросов ограничены числом попыток и бюджетом - долей от всех запросов за retry_budget_window
+    circuit_failure_threshold: int = Field(default=5)
+    circuit_recovery_timeout: float = Field(default=10.0)
+    retry_max_tries: int = Field(default=3)
+    retry_base_delay: float = Field(default=0.05)
+    retry_max_delay: float = Field(default=0.5)
+    retry_budget_ratio: float = Field(default=0.1)
+    retry_budget_min_retries: int = Field(default=10)
+    retry_budget_window: int = Field(default=10)
+
     # Настройки для локального дебага приложения (без контейнера)
     # redis_host: str = Field(default='127.0.0.1')
     # redis_port: int = Field(default=6379)
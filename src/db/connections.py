@@ -0,0 +1,329 @@
+"""
+Создание и сопровождение соединений воркера с Redis и ElasticSearch:
+ограниченные пулы, таймауты, keep-alive и сжатие настраиваются через AppSettings,
+соединения открываются заранее при старте и периодически проверяются.
+Запросы к ElasticSearch распределяются по узлам кластера с учетом времени их ответа.
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+
+import aiohttp
+from elasticsearch import AIOHttpConnection, AsyncElasticsearch, ConnectionTimeout
+from elasticsearch import ConnectionError as ElasticsearchConnectionError
+from elasticsearch._async.http_aiohttp import ESClientResponse
+from elasticsearch.connection_pool import ConnectionSelector
+from redis.asyncio import BlockingConnectionPool, Redis
+
+from core.config import app_settings
+logger = logging.getLogger(os.path.basename(__file__))
+
+
+class NodeStats:
+    """
+    Сглаженное (экспоненциальное скользящее среднее) время ответа узла ElasticSearch
+    и счетчики запросов к нему. Таймаут тоже считается ответом - очень медленным.
+    """
+
+    def __init__(self,
+                 decay: float = app_settings.elastic_latency_decay,
+                 ttl: float = app_settings.elastic_latency_ttl):
+        self.decay = decay
+        self.ttl = ttl
+        self.latency: float | None = None
+        self.measured_at = 0.0
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+
+    def record_latency(self, latency: float):
+        self.requests += 1
+        self.measured_at = time.monotonic()
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += self.decay * (latency - self.latency)
+
+    def record_failure(self):
+        self.failures += 1
+
+    def get_score(self) -> float:
+        """
+        Ожидаемое время ответа с учетом уже выполняемых на узле запросов; чем меньше, тем лучше.
+        Узел без свежих замеров получает 0, чтобы запросы снова пошли на него и обновили замер.
+        """
+        if self.latency is None or time.monotonic() - self.measured_at > self.ttl:
+            return 0.0
+        return self.latency * (self.in_flight + 1)
+
+    def stats(self) -> dict:
+        return {
+            'latency_ms': round(self.latency * 1000, 2) if self.latency is not None else None,
+            'in_flight': self.in_flight,
+            'requests': self.requests,
+            'failures': self.failures,
+        }
+
+
+class LatencyAwareSelector(ConnectionSelector):
+    """
+    Выбор узла ElasticSearch для запроса: из двух случайных живых узлов берется тот,
+    у которого меньше ожидаемое время ответа (power of two choices). В отличие от выбора
+    самого быстрого узла, нагрузка не перетекает вся разом на один узел, а медленный
+    или перегруженный узел получает заметно меньше запросов.
+    Недоступные узлы в выборе не участвуют: пул соединений исключает их на время dead_timeout.
+    """
+
+    def select(self, connections: list['KeepAliveAIOHttpConnection']) -> 'KeepAliveAIOHttpConnection':
+        if len(connections) == 1:
+            return connections[0]
+        first, second = random.sample(connections, 2)
+        return first if first.node_stats.get_score() <= second.node_stats.get_score() else second
+
+
+class KeepAliveAIOHttpConnection(AIOHttpConnection):
+    """
+    Соединение с узлом ElasticSearch, пул которого держит простаивающие TCP-соединения
+    открытыми elastic_keepalive_timeout секунд (в aiohttp по умолчанию - 15 секунд).
+    Замеряет время ответа узла для LatencyAwareSelector и статистики.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.node_stats = NodeStats()
+
+    async def perform_request(self, *args, **kwargs):
+        self.node_stats.in_flight += 1
+        started = time.monotonic()
+        try:
+            result = await super().perform_request(*args, **kwargs)
+        except ConnectionTimeout:
+            self.node_stats.record_failure()
+            self.node_stats.record_latency(time.monotonic() - started)
+            raise
+        except ElasticsearchConnectionError:
+            self.node_stats.record_failure()
+            raise
+        except Exception:
+            # Узел ответил ошибкой (например, "не найдено") - время ответа все равно показательно
+            self.node_stats.record_latency(time.monotonic() - started)
+            raise
+        finally:
+            self.node_stats.in_flight -= 1
+        self.node_stats.record_latency(time.monotonic() - started)
+        return result
+
+    async def _create_aiohttp_session(self):
+        if self.loop is None:
+            self.loop = asyncio.get_running_loop()
+        self.session = aiohttp.ClientSession(
+            headers=self.headers,
+            auto_decompress=True,
+            loop=self.loop,
+            cookie_jar=aiohttp.DummyCookieJar(),
+            response_class=ESClientResponse,
+            connector=aiohttp.TCPConnector(
+                limit=self._limit,
+                use_dns_cache=True,
+                ssl=self._ssl_context,
+                keepalive_timeout=app_settings.elastic_keepalive_timeout,
+            ),
+        )
+
+
+def create_redis(socket_timeout: float | None = app_settings.redis_socket_timeout,
+                 max_connections: int = app_settings.redis_max_connections) -> Redis:
+    """
+    Клиент Redis с ограниченным пулом соединений.
+    Для подписок и блокирующего чтения потоков нужен отдельный клиент с socket_timeout=None:
+    иначе ожидание сообщения дольше таймаута считается обрывом соединения.
+    """
+    pool = BlockingConnectionPool(
+        host=app_settings.redis_host,
+        port=app_settings.redis_port,
+        max_connections=max_connections,
+        timeout=app_settings.redis_pool_timeout,
+        socket_connect_timeout=app_settings.redis_connect_timeout,
+        socket_timeout=socket_timeout,
+        socket_keepalive=app_settings.redis_socket_keepalive,
+        health_check_interval=app_settings.redis_health_check_interval,
+    )
+    return Redis.from_pool(pool)
+
+
+def get_elastic_hosts() -> list[str]:
+    """Узлы ElasticSearch: elastic_hosts, а если список не задан - единственный узел elastic_host:elastic_port"""
+    return app_settings.elastic_hosts or [f'{app_settings.elastic_host}:{app_settings.elastic_port}']
+
+
+def create_elastic() -> AsyncElasticsearch:
+    """
+    Клиент ElasticSearch с ограниченным пулом соединений к каждому узлу, таймаутом запросов и gzip-сжатием.
+    Запрос, не дошедший до узла, повторяется клиентом на другом узле не больше elastic_max_retries раз
+    (остальные повторы - в resilient, с задержкой и из бюджета), а узел исключается на dead_timeout
+    """
+    return AsyncElasticsearch(
+        hosts=get_elastic_hosts(),
+        connection_class=KeepAliveAIOHttpConnection,
+        selector_class=LatencyAwareSelector,
+        dead_timeout=app_settings.elastic_dead_timeout,
+        max_retries=app_settings.elastic_max_retries,
+        sniff_on_start=app_settings.elastic_sniff_on_start,
+        sniff_on_connection_fail=app_settings.elastic_sniff_on_connection_fail,
+        sniffer_timeout=app_settings.elastic_sniffer_timeout,
+        maxsize=app_settings.elastic_max_connections,
+        timeout=app_settings.elastic_timeout,
+        http_compress=app_settings.elastic_http_compress,
+    )
+
+
+class ConnectionStats:
+    """Результаты последних проверок соединений и заполненность пулов"""
+
+    def __init__(self):
+        self.pings: dict[str, dict] = {}
+
+    def record_ping(self, name: str, ok: bool, latency: float):
+        self.pings[name] = {'ok': ok, 'latency_ms': round(latency * 1000, 2), 'checked_at': time.time()}
+
+    def stats(self, redis: Redis | None, elastic: AsyncElasticsearch | None) -> dict:
+        return {
+            'redis': {**get_redis_pool_stats(redis), 'last_ping': self.pings.get('redis')},
+            'elastic': {
+                **get_elastic_pool_stats(elastic),
+                'last_ping': self.pings.get('elastic'),
+                'nodes': get_elastic_nodes_stats(elastic),
+            },
+        }
+
+
+def _get_saturation(in_use: int, max_connections: int) -> float:
+    return round(in_use / max_connections, 4) if max_connections else 0.0
+
+
+def get_redis_pool_stats(redis: Redis | None) -> dict:
+    """Занятые, свободные и максимальное число соединений пула Redis"""
+    if redis is None:
+        return {}
+    pool = redis.connection_pool
+    in_use, idle = len(pool._in_use_connections), len(pool._available_connections)
+    return {
+        'in_use': in_use,
+        'idle': idle,
+        'max_connections': pool.max_connections,
+        'saturation': _get_saturation(in_use, pool.max_connections),
+    }
+
+
+def _get_elastic_connections(elastic: AsyncElasticsearch) -> tuple[KeepAliveAIOHttpConnection, ...]:
+    """Соединения со всеми узлами ElasticSearch, в том числе исключенными как недоступные"""
+    pool = elastic.transport.connection_pool
+    return getattr(pool, 'orig_connections', None) or tuple(pool.connections)
+
+
+def get_elastic_pool_stats(elastic: AsyncElasticsearch | None) -> dict:
+    """
+    Занятые, свободные и максимальное число соединений пулов ElasticSearch (по всем узлам).
+    Сессия aiohttp создается при первом запросе, до этого пул пуст.
+    """
+    if elastic is None:
+        return {}
+    in_use = idle = max_connections = 0
+    for connection in _get_elastic_connections(elastic):
+        max_connections += connection._limit
+        connector = connection.session.connector if connection.session else None
+        if connector is not None:
+            in_use += len(connector._acquired)
+            idle += sum(len(protocols) for protocols in connector._conns.values())
+    return {
+        'in_use': in_use,
+        'idle': idle,
+        'max_connections': max_connections,
+        'saturation': _get_saturation(in_use, max_connections),
+    }
+
+
+def get_elastic_nodes_stats(elastic: AsyncElasticsearch | None) -> list[dict]:
+    """Доступность, число сбоев подряд и время ответа каждого узла ElasticSearch"""
+    if elastic is None:
+        return []
+    pool = elastic.transport.connection_pool
+    dead_count = getattr(pool, 'dead_count', {})
+    return [
+        {
+            'host': connection.host,
+            'alive': connection in pool.connections,
+            'dead_count': dead_count.get(connection, 0),
+            **connection.node_stats.stats(),
+        }
+        for connection in _get_elastic_connections(elastic)
+    ]
+
+
+async def check_elastic_nodes(elastic: AsyncElasticsearch):
+    """
+    Проверяет каждый живой узел ElasticSearch напрямую, минуя выбор узла: не ответивший узел
+    исключается заранее, до того как на нем упадут запросы пользователей, а ответившие
+    обновляют замер времени ответа.
+    """
+    pool = elastic.transport.connection_pool
+
+    async def check(connection: KeepAliveAIOHttpConnection):
+        try:
+            await connection.perform_request('HEAD', '/', timeout=app_settings.elastic_timeout)
+        except Exception:
+            logger.warning(f'ElasticSearch node {connection.host} is unavailable')
+            pool.mark_dead(connection)
+
+    await asyncio.gather(*[check(connection) for connection in list(pool.connections)])
+
+
+async def _ping(name: str, ping, stats: ConnectionStats) -> bool:
+    started = time.monotonic()
+    try:
+        ok = bool(await ping())
+    except Exception:
+        ok = False
+    stats.record_ping(name, ok, time.monotonic() - started)
+    if not ok:
+        logger.warning(f'{name} ping failed')
+    return ok
+
+
+async def warm_up_connections(redis: Redis, elastic: AsyncElasticsearch, size: int, stats: ConnectionStats):
+    """
+    Открывает заранее size соединений к каждому хранилищу: одновременные ping-запросы
+    не могут использовать одно соединение, поэтому каждый открывает свое и возвращает его в пул.
+    Первые запросы пользователей не тратят время на установку TCP-соединений.
+    """
+    await asyncio.gather(*[
+        _ping(name, ping, stats)
+        for name, ping in [('redis', redis.ping), ('elastic', elastic.ping)]
+        for _ in range(size)
+    ])
+
+
+async def ping_connections_periodically(redis: Redis,
+                                        elastic: AsyncElasticsearch,
+                                        interval: float,
+                                        stats: ConnectionStats):
+    """
+    Фоновая задача воркера: раз в interval секунд проверяет соединения и запоминает время ответа,
+    а также проверяет каждый узел ElasticSearch
+    """
+    while True:
+        await asyncio.sleep(interval)
+        await asyncio.gather(
+            _ping('redis', redis.ping, stats),
+            _ping('elastic', elastic.ping, stats),
+            check_elastic_nodes(elastic),
+        )
+
+
+connection_stats = ConnectionStats()
+
+
+def get_connection_stats() -> ConnectionStats:
+    return connection_stats
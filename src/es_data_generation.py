@@ -1,3 +1,4 @@
+import argparse
 import logging
 import os
 from time import sleep
@@ -8,9 +9,12 @@ from elasticsearch import Elasticsearch, helpers
 import random
 
 from pydantic import BaseModel, Field
+from redis import Redis
 
 from schemas.es_schemas import elastic_film_index_schema, elastic_genre_index_schema, elastic_person_index_schema
 from core.config import app_settings
+from db.connections import get_elastic_hosts
+from services.invalidation import publish_data_change
 
 
 FILMS_QTY = 100
@@ -24,14 +28,29 @@ ROLES = {
     'writers': 'writer'
 }
 
+# Заменяет записи об обновленных фильмах в фильмографии персонажа
+PERSON_FILMS_UPDATE_SCRIPT = """
+if (ctx._source.films == null) { ctx._source.films = []; }
+ctx._source.films.removeIf(film -> params.film_ids.contains(film.id));
+ctx._source.films.addAll(params.films);
+"""
+
 logger = logging.getLogger(os.path.basename(__file__))
 logger.setLevel(logging.INFO)
 
 
+class PersonFilmSchema(BaseModel):
+    id: str
+    title: str
+    imdb_rating: float | None = None
+    roles: list[str] = []
+
+
 class PersonSchema(BaseModel):
     id: str
     name: str
     role: str | None = None
+    films: list[PersonFilmSchema] = []
 
     def dict(self, **kwargs):
         """"""
@@ -75,6 +94,21 @@ class FilmWorkSchema(BaseModel):
         return obj_dict
 
 
+def get_film_participants(film: dict) -> list[tuple[dict, PersonFilmSchema]]:
+    """
+    Возвращает участников фильма вместе с записью об этом фильме для их фильмографии:
+    [({id, name}, {id, title, imdb_rating, roles})]. Роли одного участника собираются в одну запись.
+    """
+    participants: dict[str, tuple[dict, PersonFilmSchema]] = {}
+    for roles, role in ROLES.items():
+        for person in film.get(roles) or []:
+            if person['id'] not in participants:
+                person_film = PersonFilmSchema(id=film['id'], title=film['title'], imdb_rating=film.get('imdb_rating'))
+                participants[person['id']] = ({'id': person['id'], 'name': person['name']}, person_film)
+            participants[person['id']][1].roles.append(role)
+    return list(participants.values())
+
+
 class ElasticDataGenerator:
     """Класс для генерации и загрузки данных в ElasticSearch"""
     persons: list[PersonSchema] = None
@@ -84,7 +118,8 @@ class ElasticDataGenerator:
     def __init__(self, es_index_name: str, es_index_schema: dict):
         self.es_index_name = es_index_name
         self.es_index_schema = es_index_schema
-        self.elastic = Elasticsearch(host=app_settings.elastic_host, port=app_settings.elastic_port)
+        self.elastic = Elasticsearch(hosts=get_elastic_hosts())
+        self.redis = Redis(host=app_settings.redis_host, port=app_settings.redis_port)
         self.fake = Faker()
 
     def exec(self):
@@ -99,9 +134,10 @@ class ElasticDataGenerator:
         elif self.es_index_name == 'persons':
             self._get_persons_from_movies()
         self._load_data_to_elastic()
+        publish_data_change(self.redis, self.es_index_name)
 
     def _create_elastic_index(self):
-        """Создает индекс в эластике если он еще не создан"""
+        """Создает индекс в эластике если он еще не создан, а уже созданный приводит к схеме"""
         logger.info(f'Check if index "{self.es_index_name}" exists...')
 
         if not self.elastic.indices.exists(index=self.es_index_name):
@@ -112,6 +148,59 @@ class ElasticDataGenerator:
             logger.info(f'Elasticsearch index "{self.es_index_name}" created successfully')
         else:
             logger.info(f'Elasticsearch index "{self.es_index_name}" already exists')
+            self._migrate_elastic_index(self.es_index_name, self.es_index_schema)
+
+    def _migrate_elastic_index(self, index_name: str, index_schema: dict):
+        """
+        Приводит существующий индекс к схеме: добавляет недостающие анализаторы, новые поля (например,
+        фильмографию персонажа) и подполя (например, suggest для автодополнения). Mapping в режиме strict,
+        и без этого документы с новыми полями не загрузятся. Новые подполя уже загруженных документов
+        заполняются их переиндексацией на месте.
+        """
+        self._add_missing_analysis(index_name, index_schema['settings'].get('analysis', {}))
+
+        properties = next(iter(self.elastic.indices.get_mapping(index=index_name).values()))['mappings'].get(
+            'properties', {})
+        missing_fields = {}
+        fields_with_new_subfields = []
+        for name, field in index_schema['mappings']['properties'].items():
+            if name not in properties:
+                missing_fields[name] = field
+            elif set(field.get('fields', {})) - set(properties[name].get('fields', {})):
+                missing_fields[name] = field
+                fields_with_new_subfields.append(name)
+        if not missing_fields:
+            return
+
+        self.elastic.indices.put_mapping(index=index_name, body={'properties': missing_fields})
+        logger.info(f'Fields {", ".join(missing_fields)} of index "{index_name}" were updated')
+
+        if fields_with_new_subfields:
+            task = self.elastic.update_by_query(index=index_name, conflicts='proceed', wait_for_completion=False)
+            logger.info(f'Documents of index "{index_name}" are reindexed in task {task["task"]} '
+                        f'to fill subfields of {", ".join(fields_with_new_subfields)}')
+
+    def _add_missing_analysis(self, index_name: str, analysis: dict):
+        """
+        Добавляет в индекс недостающие фильтры и анализаторы: настройки анализа меняются только
+        у закрытого индекса, поэтому на это время индекс закрывается
+        """
+        index_settings = next(iter(self.elastic.indices.get_settings(index=index_name).values()))['settings']['index']
+        current_analysis = index_settings.get('analysis', {})
+        missing_analysis = {
+            section: {name: value for name, value in items.items() if name not in current_analysis.get(section, {})}
+            for section, items in analysis.items()
+        }
+        missing_analysis = {section: items for section, items in missing_analysis.items() if items}
+        if not missing_analysis:
+            return
+
+        self.elastic.indices.close(index=index_name)
+        try:
+            self.elastic.indices.put_settings(index=index_name, body={'analysis': missing_analysis})
+        finally:
+            self.elastic.indices.open(index=index_name)
+        logger.info(f'Analysis settings {", ".join(missing_analysis)} of index "{index_name}" were updated')
 
     def _generate_persons(self):
         """Генерация персоналий"""
@@ -157,16 +246,85 @@ class ElasticDataGenerator:
         self.items = items
 
     def _get_persons_from_movies(self):
-        """"""
-        items = []
+        """Собирает персоналий из всех фильмов вместе с их фильмографией и ролями"""
+        persons: dict[str, PersonSchema] = {}
         film_data = scan(self.elastic, index='movies', query={"query": {"match_all": {}}})
         for film in film_data:
-            for roles, role in ROLES.items():
-                for person in film['_source'][roles]:
-                    person_obj = PersonSchema(**person)
-                    if person_obj not in items:
-                        items.append(person_obj)
-        self.items = items
+            for person, person_film in get_film_participants(film['_source']):
+                persons.setdefault(person['id'], PersonSchema(**person)).films.append(person_film)
+        self.items = list(persons.values())
+
+    def update_random_films(self, films_qty: int):
+        """
+        Имитация инкрементальной загрузки: меняет рейтинг и состав участников films_qty случайных
+        фильмов (участники выбираются среди уже существующих персонажей) и загружает их через update_films
+        """
+        films = [hit['_source'] for hit in scan(self.elastic, index='movies', query={'query': {'match_all': {}}})]
+        persons = {
+            person['id']: PersonSchema(**person, role=role)
+            for film in films for roles, role in ROLES.items() for person in film.get(roles) or []
+        }
+        if not films or not persons:
+            logger.info('No films found, nothing to update')
+            return
+
+        self.update_films([
+            FilmWorkSchema(**{
+                **film,
+                'imdb_rating': round(random.uniform(RATING_MIN, RATING_MAX), NUMBER_OF_DECIMALS),
+                'persons': random.sample(list(persons.values()), k=min(len(persons), random.randint(5, 15))),
+            })
+            for film in random.sample(films, k=min(films_qty, len(films)))
+        ])
+
+    def update_films(self, films: list[FilmWorkSchema]):
+        """
+        Инкрементальная загрузка измененных фильмов: обновляет документы фильмов
+        (рассчитанные похожие фильмы сохраняются) и фильмографии их участников в индексе persons
+        """
+        helpers.bulk(self.elastic, [
+            {'_op_type': 'update', '_index': 'movies', '_id': film.id, 'doc': film.dict(), 'doc_as_upsert': True}
+            for film in films
+        ], refresh=True)
+        publish_data_change(self.redis, 'movies', [film.id for film in films])
+        self._refresh_persons_films([film.dict() for film in films])
+
+    def _refresh_persons_films(self, films: list[dict]):
+        """
+        Обновляет записи об указанных фильмах в документах персонажей: удаляет их у всех,
+        у кого они были (в том числе у тех, кто больше не участвует в фильме), и добавляет
+        текущим участникам с их ролями.
+        """
+        self._migrate_elastic_index('persons', elastic_person_index_schema)
+        film_ids = [film['id'] for film in films]
+        films_by_person: dict[str, list[dict]] = {}
+        names = {}
+        for film in films:
+            for person, person_film in get_film_participants(film):
+                films_by_person.setdefault(person['id'], []).append(person_film.dict())
+                names[person['id']] = person['name']
+
+        former_persons = scan(self.elastic, index='persons', _source=False, query={
+            'query': {'nested': {'path': 'films', 'query': {'terms': {'films.id': film_ids}}}}
+        })
+        person_ids = {hit['_id'] for hit in former_persons} | set(films_by_person)
+
+        helpers.bulk(self.elastic, [
+            {
+                '_op_type': 'update',
+                '_index': 'persons',
+                '_id': person_id,
+                'script': {
+                    'source': PERSON_FILMS_UPDATE_SCRIPT,
+                    'params': {'film_ids': film_ids, 'films': films_by_person.get(person_id, [])},
+                },
+                **({'upsert': {'id': person_id, 'name': names[person_id], 'films': films_by_person[person_id]}}
+                   if person_id in films_by_person else {}),
+            }
+            for person_id in person_ids
+        ])
+        publish_data_change(self.redis, 'persons', list(person_ids))
+        logger.info(f'Filmographies of {len(person_ids)} persons were updated')
 
     def _load_data_to_elastic(self):
         """Загрузка данных в эластик"""
@@ -189,11 +347,20 @@ class ElasticDataGenerator:
 
 
 if __name__ == '__main__':
-    indexes = {
-        'movies': elastic_film_index_schema,
-        'genres': elastic_genre_index_schema,
-        'persons': elastic_person_index_schema,
-    }
-    for index_name, index_schema in indexes.items():
-        fake_data_generator = ElasticDataGenerator(index_name, index_schema)
-        fake_data_generator.exec()
+    parser = argparse.ArgumentParser(description='Генерация и загрузка тестовых данных в ElasticSearch')
+    parser.add_argument('--update-films', type=int, metavar='N',
+                        help='изменить N случайных фильмов и обновить фильмографии их участников '
+                             'вместо полной загрузки')
+    args = parser.parse_args()
+
+    if args.update_films:
+        ElasticDataGenerator('movies', elastic_film_index_schema).update_random_films(args.update_films)
+    else:
+        indexes = {
+            'movies': elastic_film_index_schema,
+            'genres': elastic_genre_index_schema,
+            'persons': elastic_person_index_schema,
+        }
+        for index_name, index_schema in indexes.items():
+            fake_data_generator = ElasticDataGenerator(index_name, index_schema)
+            fake_data_generator.exec()
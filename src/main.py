@@ -1,23 +1,57 @@
+import asyncio
 import logging
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
+from http import HTTPStatus
 
 import uvicorn
-from elasticsearch import AsyncElasticsearch
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.responses import ORJSONResponse
-from redis.asyncio import Redis
 
 from core.config import app_settings
 from core.logger import LOGGING
 from db import redis, elastic
+from db.connections import (create_elastic, create_redis, get_connection_stats, ping_connections_periodically,
+                            warm_up_connections)
 from api.v1.routers import main_router
+from services.cache_warmer import warm_cache
+from services.deadline import DeadlineExceeded
+from services.exceptions import CONNECTION_EXCEPTIONS
+from services.generations import get_cache_generations
+from services.invalidation import listen_data_events, load_generations
+from services.local_cache import get_local_cache
+from services.popularity import flush_popularity_periodically, get_popularity_tracker
+from services.resilience import CircuitOpenError
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    redis.redis = Redis(host=app_settings.redis_host, port=app_settings.redis_port)
-    elastic.es = AsyncElasticsearch(hosts=[f'{app_settings.elastic_host}:{app_settings.elastic_port}'])
+    redis.redis = create_redis()
+    elastic.es = create_elastic()
+    # Чтение потока событий держит соединение постоянно и ждет событий без таймаута, поэтому у него свой клиент
+    listener_redis = create_redis(socket_timeout=None, max_connections=1)
+    await warm_up_connections(redis.redis, elastic.es, app_settings.connections_warm_up, get_connection_stats())
+    with suppress(*CONNECTION_EXCEPTIONS):
+        await load_generations(redis.redis, get_cache_generations())
+    background_tasks = [
+        asyncio.create_task(listen_data_events(listener_redis, get_cache_generations(), get_local_cache())),
+        asyncio.create_task(flush_popularity_periodically(
+            redis.redis, get_popularity_tracker(), app_settings.popularity_flush_interval,
+        )),
+        asyncio.create_task(ping_connections_periodically(
+            redis.redis, elastic.es, app_settings.connections_ping_interval, get_connection_stats(),
+        )),
+    ]
+    if app_settings.cache_warmer_on_startup:
+        background_tasks.append(asyncio.create_task(warm_cache(redis.redis, elastic.es)))
     yield
+    for task in background_tasks:
+        task.cancel()
+    for task in background_tasks:
+        with suppress(asyncio.CancelledError):
+            await task
+    with suppress(*CONNECTION_EXCEPTIONS):
+        await get_popularity_tracker().flush(redis.redis)
+    await listener_redis.close()
     await redis.redis.close()
     await elastic.es.close()
 
@@ -32,6 +66,25 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+
+async def dependency_unavailable_handler(request: Request, exc: Exception) -> ORJSONResponse:
+    """Хранилище недоступно, а повторы исчерпаны или не выполнялись - быстро отвечаем 503"""
+    return ORJSONResponse(
+        status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+        content={'detail': 'service temporarily unavailable'},
+        headers={'Retry-After': str(int(app_settings.circuit_recovery_timeout))},
+    )
+
+
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded) -> ORJSONResponse:
+    """Бюджет времени запроса исчерпан, а подходящего результата в кэше нет"""
+    return ORJSONResponse(status_code=HTTPStatus.GATEWAY_TIMEOUT, content={'detail': 'request deadline exceeded'})
+
+
+for exception_class in (CircuitOpenError, *CONNECTION_EXCEPTIONS):
+    app.add_exception_handler(exception_class, dependency_unavailable_handler)
+app.add_exception_handler(DeadlineExceeded, deadline_exceeded_handler)
+
 app.include_router(main_router, prefix='/api/v1')
 
 if __name__ == '__main__':
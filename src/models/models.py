@@ -1,10 +1,13 @@
 from datetime import datetime
+from typing import ClassVar, Generic, TypeVar
 
 import orjson
 from pydantic import BaseModel
 
 from constants import OptStrType, ListDictType
 
+ModelType = TypeVar('ModelType', bound=BaseModel)
+
 
 def orjson_dumps(v, *, default):
     return orjson.dumps(v, default=default).decode()
@@ -13,6 +16,10 @@ def orjson_dumps(v, *, default):
 class BaseCommonModel(BaseModel):
     id: str
 
+    # Версия схемы модели, входит в ключ кэша.
+    # Увеличивайте при изменении набора или типов полей модели.
+    schema_version: ClassVar[int] = 1
+
     class Config:
         json_loads = orjson.loads
         json_dumps = orjson_dumps
@@ -37,10 +44,52 @@ class Film(BaseModel):
     file_path: OptStrType = None
     creation_date: datetime | None = None
 
+    # id похожих фильмов по убыванию похожести, рассчитываются офлайн (services.similar_films)
+    similar_films: list[str] = []
+
+    schema_version: ClassVar[int] = 2
+
+
+class Page(BaseModel, Generic[ModelType]):
+    """
+    Страница выдачи из ElasticSearch.
+    search_after - значения сортировки последнего объекта, по ним запрашивается следующая страница;
+    None, если страница последняя. pit_id - срез индекса (point in time), в котором читалась страница.
+    partial - ElasticSearch не успел опросить все шарды за отведенное время, страница неполная
+    и в кэш не сохраняется.
+    """
+    items: list[ModelType]
+    search_after: list | None = None
+    pit_id: OptStrType = None
+    partial: bool = False
+
+
+class TotalCount(BaseModel):
+    """Число найденных объектов. exact=False - подсчет остановлен на пороге и найдено не меньше value"""
+    value: int
+    exact: bool = True
+
+
+class PersonFilm(BaseModel):
+    """Фильм в фильмографии персонажа с его ролями в этом фильме"""
+    id: str
+    title: str
+    imdb_rating: float | None = None
+    roles: list[str] = []
+
 
 class Person(BaseNameModel):
-    pass
+    # Фильмография хранится прямо в документе персонажа и собирается при загрузке данных
+    films: list[PersonFilm] = []
+
+    schema_version: ClassVar[int] = 2
 
 
 class Genre(BaseNameModel):
     pass
+
+
+class GenreStats(BaseNameModel):
+    """Жанр вместе с числом фильмов и их средним рейтингом"""
+    films_count: int
+    avg_rating: float | None = None
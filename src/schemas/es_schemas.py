@@ -7,7 +7,8 @@ elastic_film_index_schema = {
                 "english_stemmer": {"type": "stemmer", "language": "english"},
                 "english_possessive_stemmer": {"type": "stemmer", "language": "possessive_english"},
                 "russian_stop": {"type": "stop", "stopwords": "_russian_"},
-                "russian_stemmer": {"type": "stemmer", "language": "russian"}
+                "russian_stemmer": {"type": "stemmer", "language": "russian"},
+                "autocomplete_filter": {"type": "edge_ngram", "min_gram": 1, "max_gram": 20}
             },
             "analyzer": {
                 "ru_en": {
@@ -20,6 +21,14 @@ elastic_film_index_schema = {
                         "russian_stop",
                         "russian_stemmer"
                     ]
+                },
+                "autocomplete": {
+                    "tokenizer": "standard",
+                    "filter": ["lowercase", "autocomplete_filter"]
+                },
+                "autocomplete_search": {
+                    "tokenizer": "standard",
+                    "filter": ["lowercase"]
                 }
             }
         }
@@ -32,7 +41,10 @@ elastic_film_index_schema = {
             "title": {
                 "type": "text",
                 "analyzer": "ru_en",
-                "fields": {"raw": {"type": "keyword"}}
+                "fields": {
+                    "raw": {"type": "keyword"},
+                    "suggest": {"type": "text", "analyzer": "autocomplete", "search_analyzer": "autocomplete_search"}
+                }
             },
             "description": {"type": "text", "analyzer": "ru_en"},
             "genre": {
@@ -65,7 +77,8 @@ elastic_film_index_schema = {
                 "properties": {"id": {"type": "keyword"},
                                "name": {"type": "text", "analyzer": "ru_en"}
                                }
-            }
+            },
+            "similar_films": {"type": "keyword"}
         }
     }
 }
@@ -120,7 +133,8 @@ elastic_person_index_schema = {
                 "english_stemmer": {"type": "stemmer", "language": "english"},
                 "english_possessive_stemmer": {"type": "stemmer", "language": "possessive_english"},
                 "russian_stop": {"type": "stop", "stopwords": "_russian_"},
-                "russian_stemmer": {"type": "stemmer", "language": "russian"}
+                "russian_stemmer": {"type": "stemmer", "language": "russian"},
+                "autocomplete_filter": {"type": "edge_ngram", "min_gram": 1, "max_gram": 20}
             },
             "analyzer": {
                 "ru_en": {
@@ -133,6 +147,14 @@ elastic_person_index_schema = {
                         "russian_stop",
                         "russian_stemmer"
                     ]
+                },
+                "autocomplete": {
+                    "tokenizer": "standard",
+                    "filter": ["lowercase", "autocomplete_filter"]
+                },
+                "autocomplete_search": {
+                    "tokenizer": "standard",
+                    "filter": ["lowercase"]
                 }
             }
         }
@@ -144,7 +166,20 @@ elastic_person_index_schema = {
             "name": {
                 "type": "text",
                 "analyzer": "ru_en",
-                "fields": {"raw": {"type": "keyword"}}
+                "fields": {
+                    "raw": {"type": "keyword"},
+                    "suggest": {"type": "text", "analyzer": "autocomplete", "search_analyzer": "autocomplete_search"}
+                }
+            },
+            "films": {
+                "type": "nested",
+                "dynamic": "strict",
+                "properties": {
+                    "id": {"type": "keyword"},
+                    "title": {"type": "text", "analyzer": "ru_en"},
+                    "imdb_rating": {"type": "float"},
+                    "roles": {"type": "keyword"}
+                }
             },
          }
     }
@@ -0,0 +1,111 @@
+import struct
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Any
+
+from pydantic import TypeAdapter
+
+from core.config import app_settings
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+# Заголовок записи в кэше: id кодека и момент истечения soft_ttl
+ENTRY_HEADER = struct.Struct('>Bd')
+
+
+class CacheCodec(ABC):
+    """Формат, в котором значения хранятся в Redis"""
+    codec_id: int
+    name: str
+
+    @abstractmethod
+    def dumps(self, adapter: TypeAdapter, value: Any) -> bytes:
+        pass
+
+    @abstractmethod
+    def loads(self, adapter: TypeAdapter, data: bytes) -> Any:
+        pass
+
+
+class OrjsonCodec(CacheCodec):
+    """
+    JSON. Сериализация и чтение выполняются pydantic-core за один проход по всему значению:
+    validate_json разбирает и валидирует данные без промежуточных python-объектов.
+    """
+    codec_id = 1
+    name = 'orjson'
+
+    def dumps(self, adapter: TypeAdapter, value: Any) -> bytes:
+        return adapter.dump_json(value)
+
+    def loads(self, adapter: TypeAdapter, data: bytes) -> Any:
+        return adapter.validate_json(data)
+
+
+class MsgpackCodec(CacheCodec):
+    """Бинарный формат msgpack: компактнее JSON на длинных списках"""
+    codec_id = 2
+    name = 'msgpack'
+
+    def __init__(self):
+        if msgpack is None:
+            raise RuntimeError('msgpack cache codec requires the "msgpack" package')
+
+    def dumps(self, adapter: TypeAdapter, value: Any) -> bytes:
+        return msgpack.packb(adapter.dump_python(value, mode='json'))
+
+    def loads(self, adapter: TypeAdapter, data: bytes) -> Any:
+        return adapter.validate_python(msgpack.unpackb(data))
+
+
+CACHE_CODECS: dict[str, type[CacheCodec]] = {
+    OrjsonCodec.name: OrjsonCodec,
+    MsgpackCodec.name: MsgpackCodec,
+}
+
+
+@lru_cache()
+def get_codec_by_id(codec_id: int) -> CacheCodec | None:
+    for codec_class in CACHE_CODECS.values():
+        if codec_class.codec_id == codec_id:
+            return codec_class()
+    return None
+
+
+@lru_cache()
+def get_cache_codec() -> CacheCodec:
+    """Кодек для записи в кэш, выбирается настройкой cache_codec"""
+    return CACHE_CODECS[app_settings.cache_codec]()
+
+
+@lru_cache()
+def get_type_adapter(value_type: Any) -> TypeAdapter:
+    """TypeAdapter создается один раз на тип, например на Film или list[Film]"""
+    return TypeAdapter(value_type)
+
+
+def encode_entry(value_type: Any, value: Any, soft_expires_at: float, codec: CacheCodec | None = None) -> bytes:
+    """Кодирует значение в запись кэша: заголовок (id кодека, soft_expires_at) и тело"""
+    codec = codec or get_cache_codec()
+    body = codec.dumps(get_type_adapter(value_type), value)
+    return ENTRY_HEADER.pack(codec.codec_id, soft_expires_at) + body
+
+
+def decode_entry(value_type: Any, data: bytes) -> tuple[Any, float] | None:
+    """
+    Декодирует запись кэша в значение и момент истечения soft_ttl.
+    Запись читается тем кодеком, которым была записана, поэтому смена кодека не требует очистки кэша.
+    Записи неизвестного формата считаются промахом.
+    """
+    if len(data) < ENTRY_HEADER.size:
+        return None
+
+    codec_id, soft_expires_at = ENTRY_HEADER.unpack_from(data)
+    codec = get_codec_by_id(codec_id)
+    if codec is None:
+        return None
+
+    return codec.loads(get_type_adapter(value_type), data[ENTRY_HEADER.size:]), soft_expires_at
@@ -0,0 +1,95 @@
+import hashlib
+import re
+
+import orjson
+from pydantic import BaseModel
+
+from db.elastic import Indexes
+from models.models import Film, Genre, Person
+from services.generations import get_cache_generations
+
+CACHE_NAMESPACES: dict[type[BaseModel], str] = {
+    Film: 'film',
+    Genre: 'genre',
+    Person: 'person',
+}
+
+MODEL_INDEXES: dict[type[BaseModel], str] = {index.value['index_model']: index.value['index_name'] for index in Indexes}
+
+NEGATIVE_KEY_PREFIX = 'neg:'
+LAST_GOOD_KEY_PREFIX = 'lkg:'
+
+# Сегмент поколения в ключе кэша: `film:v1:o3:...` или `person:v1:g2.7:...`
+_GENERATION_SEGMENT = re.compile(r'^([^:]+:v\d+):[og][\d.]+:')
+
+
+def get_cache_namespace(model: type[BaseModel]) -> str:
+    """Возвращает префикс ключей кэша для модели вместе с версией её схемы, например `film:v1`"""
+    namespace = CACHE_NAMESPACES.get(model, model.__name__.lower())
+    version = getattr(model, 'schema_version', 1)
+    return f'{namespace}:v{version}'
+
+
+def get_objects_namespace(model: type[BaseModel], generation: int | None = None) -> str:
+    """
+    Префикс ключей объектов по id с поколением объектов индекса: `film:v1:o3`.
+    По умолчанию используется текущее поколение, известное воркеру.
+    """
+    if generation is None:
+        generation = get_cache_generations().get_objects(MODEL_INDEXES.get(model, ''))
+    return f'{get_cache_namespace(model)}:o{generation}'
+
+
+def get_lists_namespace(model: type[BaseModel], depends_on: tuple[type[BaseModel], ...] = ()) -> str:
+    """
+    Префикс ключей списков и готовых ответов с поколениями индексов, от данных которых они зависят:
+    `film:v1:g7` или, например, `person:v1:g2.7` для ответов о персонажах с их фильмами.
+    """
+    generations = get_cache_generations()
+    models = (model, *[dependency for dependency in depends_on if dependency is not model])
+    generation = '.'.join([str(generations.get(MODEL_INDEXES.get(item, ''))) for item in models])
+    return f'{get_cache_namespace(model)}:g{generation}'
+
+
+def build_obj_key(model: type[BaseModel], obj_id: str) -> str:
+    """Ключ кэша для объекта по id: `film:v1:o3:<id>`"""
+    return f'{get_objects_namespace(model)}:{obj_id}'
+
+
+def build_list_key(model: type[BaseModel], **params) -> str:
+    """
+    Ключ кэша для списка объектов: `film:v1:g7:list:<hash>`.
+    Параметры запроса сериализуются с сортировкой ключей, поэтому порядок аргументов не влияет на ключ.
+    """
+    raw_params = orjson.dumps(params, option=orjson.OPT_SORT_KEYS, default=str)
+    digest = hashlib.blake2b(raw_params, digest_size=16).hexdigest()
+    return f'{get_lists_namespace(model)}:list:{digest}'
+
+
+def build_response_key(model: type[BaseModel],
+                       path: str,
+                       query_items: list[tuple[str, str]],
+                       depends_on: tuple[type[BaseModel], ...] = ()) -> str:
+    """
+    Ключ кэша готового HTTP-ответа: `film:v1:g7:resp:<hash>`.
+    Ответ хранится в пространстве имен сущности, поэтому инвалидируется вместе с ней,
+    а также при изменении данных сущностей depends_on.
+    Параметры запроса сортируются, поэтому их порядок в URL не влияет на ключ.
+    """
+    raw_request = orjson.dumps([path, sorted(query_items)])
+    digest = hashlib.blake2b(raw_request, digest_size=16).hexdigest()
+    return f'{get_lists_namespace(model, depends_on)}:resp:{digest}'
+
+
+def build_negative_key(cache_key: str) -> str:
+    """Ключ отметки об отсутствии результата для ключа кэша: `neg:film:v1:o3:<id>`"""
+    return f'{NEGATIVE_KEY_PREFIX}{cache_key}'
+
+
+def build_last_good_key(cache_key: str) -> str:
+    """
+    Ключ последнего удачного значения для ключа кэша: `lkg:film:v1:<id>`.
+    Поколение в него не входит, поэтому значение переживает изменения и переиндексацию данных
+    и может быть отдано, пока ElasticSearch недоступен.
+    """
+    return LAST_GOOD_KEY_PREFIX + _GENERATION_SEGMENT.sub(r'\1:', cache_key, count=1)
@@ -0,0 +1,64 @@
+import time
+from dataclasses import dataclass
+from typing import Any, NamedTuple
+
+from pydantic import BaseModel
+
+from core.config import app_settings
+from models.models import Film, Genre, Person
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """
+    Политика кэширования сущности.
+    soft_ttl - время, после которого запись считается устаревшей и обновляется в фоне;
+    grace - сколько еще после soft_ttl можно отдавать устаревшую запись;
+    local_ttl - время жизни записи в L1-кэше воркера.
+    """
+    soft_ttl: int
+    grace: int
+    local_ttl: int
+
+    @property
+    def hard_ttl(self) -> int:
+        """Время жизни записи в Redis - страховка на случай, если запись никто не обновил"""
+        return self.soft_ttl + self.grace
+
+    def soft_expires_at(self) -> float:
+        return time.time() + self.soft_ttl
+
+
+class CacheEntry(NamedTuple):
+    """Значение из кэша вместе с признаком того, что истек его soft_ttl"""
+    value: Any
+    is_stale: bool = False
+
+
+CACHE_POLICIES: dict[type[BaseModel], CachePolicy] = {
+    Film: CachePolicy(
+        soft_ttl=app_settings.cache_film_soft_ttl,
+        grace=app_settings.cache_film_grace,
+        local_ttl=app_settings.local_cache_film_ttl,
+    ),
+    Genre: CachePolicy(
+        soft_ttl=app_settings.cache_genre_soft_ttl,
+        grace=app_settings.cache_genre_grace,
+        local_ttl=app_settings.local_cache_genre_ttl,
+    ),
+    Person: CachePolicy(
+        soft_ttl=app_settings.cache_person_soft_ttl,
+        grace=app_settings.cache_person_grace,
+        local_ttl=app_settings.local_cache_person_ttl,
+    ),
+}
+
+DEFAULT_CACHE_POLICY = CachePolicy(
+    soft_ttl=app_settings.cache_default_soft_ttl,
+    grace=app_settings.cache_default_grace,
+    local_ttl=app_settings.local_cache_default_ttl,
+)
+
+
+def get_cache_policy(model: type[BaseModel]) -> CachePolicy:
+    return CACHE_POLICIES.get(model, DEFAULT_CACHE_POLICY)
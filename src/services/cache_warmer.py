@@ -0,0 +1,137 @@
+"""
+Прогрев кэша предсказуемо популярными данными после деплоя или очистки Redis:
+первые страницы списка фильмов для каждой сортировки, все жанры и самые запрашиваемые персонажи.
+
+Запускается в lifespan приложения (одним воркером из всех, под блокировкой в Redis)
+и вручную из директории src: python -m services.cache_warmer [--force]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable
+
+from elasticsearch import AsyncElasticsearch, NotFoundError
+from redis.asyncio import Redis
+
+from core.config import app_settings
+from db.connections import get_elastic_hosts
+from db.elastic import Indexes
+from models.models import Film, Person
+from services.cache_keys import CACHE_NAMESPACES
+from services.film import FILM_LIST_SOURCE, FilmService
+from services.genre import GenreService
+from services.person import PersonService
+from services.popularity import PopularityTracker
+from services.utils import validation_index_model_field
+
+logger = logging.getLogger(os.path.basename(__file__))
+
+WARMER_LOCK_KEY = 'lock:cache_warmer'
+# Сортировки списка фильмов, которые предлагает API
+FILM_SORTS = (None, 'imdb_rating', '-imdb_rating')
+MAX_GENRES = 1000
+
+
+class CacheWarmer:
+    def __init__(self, redis: Redis, elastic: AsyncElasticsearch):
+        self.redis = redis
+        self.elastic = elastic
+        self.film_service = FilmService(redis, elastic)
+        self.genre_service = GenreService(redis, elastic)
+        self.person_service = PersonService(redis, elastic)
+        self._semaphore = asyncio.Semaphore(app_settings.cache_warmer_concurrency)
+        self.warmed = 0
+        self.failed = 0
+
+    async def run(self, force: bool = False) -> dict | None:
+        """
+        Прогревает кэш. Если прогрев уже выполнил другой воркер (блокировка в Redis еще жива),
+        ничего не делает и возвращает None. Иначе возвращает статистику прогрева.
+        """
+        if not force:
+            acquired = await self.redis.set(
+                WARMER_LOCK_KEY, os.getpid(), nx=True, ex=app_settings.cache_warmer_lock_ttl,
+            )
+            if not acquired:
+                logger.info('Cache is already being warmed by another worker, skipping')
+                return None
+
+        started_at = time.monotonic()
+        genre_ids = await self._get_genre_ids()
+        await asyncio.gather(
+            self._warm_film_pages(),
+            self._bounded(self.genre_service.get_many(genre_ids, Indexes.genres.value)),
+            self._warm_popular_persons(),
+        )
+        stats = {
+            'warmed': self.warmed,
+            'failed': self.failed,
+            'duration_seconds': round(time.monotonic() - started_at, 3),
+        }
+        logger.info(f'Cache warming finished: {stats}')
+        return stats
+
+    async def _bounded(self, coro: Awaitable) -> None:
+        """Выполняет шаг прогрева, ограничивая число одновременных запросов к ElasticSearch"""
+        async with self._semaphore:
+            try:
+                await coro
+                self.warmed += 1
+            except Exception:
+                self.failed += 1
+                logger.exception('Cache warming step failed')
+
+    async def _warm_film_pages(self):
+        page_size = app_settings.cache_warmer_page_size
+        sorts = {await validation_index_model_field(sort, Film) for sort in FILM_SORTS}
+        await asyncio.gather(*[
+            self._bounded(self.film_service.get_list_film(
+                page * page_size, page_size, sort, None, source=FILM_LIST_SOURCE,
+            ))
+            for sort in sorts
+            for page in range(app_settings.cache_warmer_film_pages)
+        ])
+
+    async def _warm_popular_persons(self):
+        person_ids = await PopularityTracker.top(
+            self.redis, CACHE_NAMESPACES[Person], app_settings.cache_warmer_top_persons,
+        )
+        if person_ids:
+            await self._bounded(self.person_service.get_many(person_ids, Indexes.persons.value))
+
+    async def _get_genre_ids(self) -> list[str]:
+        try:
+            search = await self.elastic.search(
+                index=Indexes.genres.value['index_name'], body={'size': MAX_GENRES, '_source': False},
+            )
+        except NotFoundError:
+            return []
+        return [hit['_id'] for hit in search['hits']['hits']]
+
+
+async def warm_cache(redis: Redis, elastic: AsyncElasticsearch, force: bool = False) -> dict | None:
+    try:
+        return await CacheWarmer(redis, elastic).run(force=force)
+    except Exception:
+        logger.exception('Cache warming failed')
+        return None
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='Прогрев кэша API')
+    parser.add_argument('--force', action='store_true', help='прогреть, даже если прогрев недавно выполнялся')
+    args = parser.parse_args()
+
+    redis = Redis(host=app_settings.redis_host, port=app_settings.redis_port)
+    elastic = AsyncElasticsearch(hosts=get_elastic_hosts())
+    try:
+        await warm_cache(redis, elastic, force=args.force)
+    finally:
+        await redis.close()
+        await elastic.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
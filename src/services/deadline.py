@@ -0,0 +1,103 @@
+"""
+Бюджет времени (дедлайн) обработки запроса.
+Дедлайн задается для роута и хранится в contextvar, поэтому доступен всем корутинам запроса
+без передачи через параметры. Остаток бюджета передается в таймауты запросов к ElasticSearch и Redis.
+"""
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Iterator, TypeVar
+
+from core.config import app_settings
+
+T = TypeVar('T')
+
+# Доля остатка бюджета, которая отводится ElasticSearch на поиск по шардам:
+# остальное - на сборку ответа, чтобы частичный результат успел вернуться до request_timeout
+SHARD_TIMEOUT_SHARE = 0.8
+
+_deadline: ContextVar[float | None] = ContextVar('deadline', default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Бюджет времени запроса исчерпан"""
+
+
+@contextmanager
+def deadline_scope(seconds: float) -> Iterator[None]:
+    """Устанавливает дедлайн для кода внутри блока; вложенный дедлайн не может быть позже внешнего"""
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def clear_deadline():
+    """Снимает дедлайн в текущем контексте: нужно фоновым задачам, которые запущены из запроса"""
+    _deadline.set(None)
+
+
+def get_remaining() -> float | None:
+    """Остаток бюджета в секундах; None - дедлайн не задан"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def is_expired() -> bool:
+    remaining = get_remaining()
+    return remaining is not None and remaining <= 0
+
+
+def has_time_for(seconds: float) -> bool:
+    """Хватит ли остатка бюджета на ожидание seconds секунд"""
+    remaining = get_remaining()
+    return remaining is None or remaining > seconds
+
+
+def get_elastic_timeout_params(shard_timeout: bool = True) -> dict:
+    """
+    Параметры запроса к ElasticSearch, ограничивающие его остатком бюджета:
+    request_timeout - сколько клиент ждет ответа, timeout - сколько шарды ищут, после чего
+    ElasticSearch возвращает найденное к этому моменту (ответ с timed_out: true).
+    """
+    remaining = get_remaining()
+    if remaining is None:
+        return {}
+    if remaining <= 0:
+        raise DeadlineExceeded()
+
+    params = {'request_timeout': remaining}
+    if shard_timeout:
+        params['timeout'] = f'{max(1, int(remaining * 1000 * SHARD_TIMEOUT_SHARE))}ms'
+    return params
+
+
+def is_cache_read_allowed() -> bool:
+    """Чтение кэша пропускается, если остаток бюджета меньше deadline_cache_min_ms"""
+    return has_time_for(app_settings.deadline_cache_min_ms / 1000)
+
+
+async def run_within_deadline(awaitable: Awaitable[T], share: float = 1.0) -> T:
+    """
+    Ждет результат не дольше доли share от остатка бюджета, по ее исчерпании - DeadlineExceeded
+    (запрос при этом отменяется).
+    """
+    remaining = get_remaining()
+    if remaining is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, max(remaining * share, 0))
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded()
+
+
+async def read_cache_within_deadline(awaitable: Awaitable[T]) -> T:
+    """
+    Обращение к кэшу (чтение, блокировки single flight) занимает не больше
+    deadline_cache_read_share остатка бюджета
+    """
+    return await run_within_deadline(awaitable, app_settings.deadline_cache_read_share)
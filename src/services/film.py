@@ -1,78 +1,130 @@
 from functools import lru_cache
 
-import backoff
-from elasticsearch import AsyncElasticsearch, NotFoundError
+from elasticsearch import AsyncElasticsearch
 from fastapi import Depends
 from redis.asyncio import Redis
 
 from constants import OptStrType
-from db.elastic import get_elastic
+from db.elastic import Indexes, get_elastic
 from db.redis import get_redis
-from models.models import Film
-from services.exceptions import CONNECTION_EXCEPTIONS
+from models.models import Film, Page, TotalCount
+from services.cache_keys import build_list_key
 from services.proto_service import ProtoService
 from services.utils import _get_query_body
 
+# Поля фильмов, которые забираются из ElasticSearch для списков (поля FilmListSerializer)
+FILM_LIST_SOURCE = ['id', 'title', 'imdb_rating']
+
 
 class FilmService(ProtoService):
     async def get_list_film(self,
                             start_index: int,
                             page_size: int,
                             sort: str = None,
-                            genre: [str | list[str]] = None,
+                            genre: str | list[str] | None = None,
                             query: str = None,
+                            source: list[str] | None = None,
                             ) -> list[Film] | None:
         """
         Метод возвращает список фильмов подходящих под указанные параметры.
         В случае отсутствия подходящих фильмов - возвращает None.
         """
+        page = await self.get_page_film(start_index, page_size, sort, genre, query, source=source)
+        return page.items if page else None
 
-        model = Film
-        parameters = self.get_params_to_cache(
-            start_index=start_index,
-            page_size=page_size,
-            sort=sort,
-            genre=genre,
-            query=query,
-            model=model
-        )
-        film_list = await self._get_objs_from_cache(parameters, model)
-
-        if not film_list:
-            film_list = await self._get_list_film_from_elastic(start_index, page_size, sort, genre, query)
-
-            if not film_list:
-                return None
+    async def get_recommended_films(self,
+                                    film: Film,
+                                    count: int,
+                                    source: list[str] | None = None) -> list[Film]:
+        """
+        Возвращает фильмы, рекомендуемые к указанному: заранее рассчитанные похожие фильмы
+        (одним пакетным запросом через кэш), а если их еще не рассчитали - самые рейтинговые фильмы
+        тех же жанров. Результат детерминирован и кэшируется вместе с ответом.
+        """
+        if film.similar_films:
+            # Берем весь сохраненный top-K: удаленные с момента расчета фильмы пропускаются
+            similar_films = await self.get_many(film.similar_films, Indexes.movies.value)
+            return similar_films[:count]
 
-            await self._put_objs_to_cache(parameters, film_list)
-        return film_list
+        genres = [genre['id'] for genre in film.genre or []]
+        films = await self.get_list_film(0, count + 1, sort='-imdb_rating', genre=genres or None, source=source)
+        return [recommended for recommended in films or [] if recommended.id != film.id][:count]
 
-    @backoff.on_exception(backoff.expo, CONNECTION_EXCEPTIONS)
-    async def _get_list_film_from_elastic(self,
-                                          start_index: int,
-                                          page_size: int,
-                                          sort: OptStrType = None,
-                                          genre: OptStrType = None,
-                                          query: OptStrType = None) -> list[Film] | None:
+    async def get_page_film(self,
+                            start_index: int,
+                            page_size: int,
+                            sort: OptStrType = None,
+                            genre: str | list[str] | None = None,
+                            query: OptStrType = None,
+                            search_after: list | None = None,
+                            pit_id: OptStrType = None,
+                            use_pit: bool = False,
+                            min_rating: float | None = None,
+                            max_rating: float | None = None,
+                            source: list[str] | None = None,
+                            ) -> Page[Film] | None:
         """
-        Вспомогательный метод для получения списка фильмов из ElasticSearch,
-        соответствующих указанным параметрам.
+        Метод возвращает страницу фильмов подходящих под указанные параметры
+        вместе со значениями сортировки для запроса следующей страницы.
+        Страница начинается либо с позиции start_index, либо после записи со значениями search_after.
+        source ограничивает поля фильмов, которые забираются из ElasticSearch;
+        остальные поля в объектах страницы остаются пустыми.
         В случае отсутствия подходящих фильмов - возвращает None.
         """
 
-        query_body = await _get_query_body(start_index=start_index, page_size=page_size, sort=sort, genre=genre,
-                                           query=query)
-
-        try:
-            search = await self.elastic.search(index='movies', body=query_body)
-        except NotFoundError:
-            return None
+        cache_key, query_body = await self.build_page_request(
+            start_index, page_size, sort, genre, query, search_after, min_rating, max_rating, source,
+        )
+        return await self._get_list_with_cache(
+            cache_key,
+            Film,
+            lambda: self._search_page('movies', query_body, Film, pit_id, use_pit),
+            keep_last_good=(start_index == 0 and not (query or search_after)
+                            and min_rating is None and max_rating is None),
+        )
 
-        list_film = [
-            Film(**hit['_source']) for hit in search['hits']['hits']
-        ]
+    async def get_total_films(self,
+                              genre: str | list[str] | None = None,
+                              query: OptStrType = None,
+                              min_rating: float | None = None,
+                              max_rating: float | None = None) -> TotalCount:
+        """Метод возвращает число фильмов, подходящих под указанные параметры"""
+        query_body = await _get_query_body(0, 0, genre=genre, query=query,
+                                           min_rating=min_rating, max_rating=max_rating)
+        return await self._get_total_count(
+            Indexes.movies.value, query_body, keep_last_good=not query and min_rating is None and max_rating is None,
+        )
 
-        return list_film
+    @staticmethod
+    async def build_page_request(start_index: int,
+                                 page_size: int,
+                                 sort: OptStrType = None,
+                                 genre: str | list[str] | None = None,
+                                 query: OptStrType = None,
+                                 search_after: list | None = None,
+                                 min_rating: float | None = None,
+                                 max_rating: float | None = None,
+                                 source: list[str] | None = None) -> tuple[str, dict]:
+        """
+        Возвращает ключ кэша и запрос в ElasticSearch для страницы фильмов.
+        Используется и для запросов в составе msearch, чтобы их результаты попадали в тот же кэш.
+        """
+        cache_key = build_list_key(
+            Film,
+            start_index=start_index,
+            page_size=page_size,
+            sort=sort,
+            genre=genre,
+            query=query,
+            search_after=search_after,
+            min_rating=min_rating,
+            max_rating=max_rating,
+            source=source,
+        )
+        query_body = await _get_query_body(start_index=start_index, page_size=page_size, sort=sort, genre=genre,
+                                           query=query, search_after=search_after, tiebreaker=True,
+                                           min_rating=min_rating, max_rating=max_rating, source=source)
+        return cache_key, query_body
 
 
 @lru_cache()
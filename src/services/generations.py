@@ -0,0 +1,37 @@
+GENERATIONS_KEY = 'cache:generations'
+OBJECTS_SUFFIX = ':objects'
+
+
+class CacheGenerations:
+    """
+    Локальная копия поколений данных индексов ElasticSearch.
+    Поколение индекса увеличивается при любом изменении данных в нем и входит в ключи списков
+    и готовых ответов. Поколение объектов индекса увеличивается только при полной перезагрузке
+    индекса и входит в ключи объектов по id. Старые записи после смены поколения не читаются
+    и истекают по ttl.
+    """
+
+    def __init__(self):
+        self._generations: dict[str, int] = {}
+
+    def get(self, index_name: str) -> int:
+        return self._generations.get(index_name, 0)
+
+    def get_objects(self, index_name: str) -> int:
+        return self._generations.get(index_name + OBJECTS_SUFFIX, 0)
+
+    def update(self, generations: dict[str, int]) -> None:
+        """Обновляет поколения, не позволяя им уменьшиться из-за устаревших данных"""
+        for name, generation in generations.items():
+            if generation > self._generations.get(name, 0):
+                self._generations[name] = generation
+
+    def stats(self) -> dict[str, int]:
+        return dict(self._generations)
+
+
+cache_generations = CacheGenerations()
+
+
+def get_cache_generations() -> CacheGenerations:
+    return cache_generations
@@ -1,16 +1,100 @@
 from functools import lru_cache
 
-from elasticsearch import AsyncElasticsearch
+from elasticsearch import AsyncElasticsearch, NotFoundError
 from fastapi import Depends
 from redis.asyncio import Redis
 
-from db.elastic import get_elastic
+from constants import OptStrType
+from db.elastic import Indexes, get_elastic
 from db.redis import get_redis
+from models.models import Film, Genre, GenreStats
+from services.cache_keys import build_list_key
+from services.deadline import get_elastic_timeout_params
 from services.proto_service import ProtoService
+from services.resilience import ELASTIC, resilient
+from services.utils import _get_query_body, _get_search_params
+
+# Верхняя граница числа жанров в агрегации
+GENRES_STATS_MAX_SIZE = 1000
 
 
 class GenreService(ProtoService):
-    pass
+    async def get_genres_stats(self) -> list[GenreStats] | None:
+        """
+        Возвращает все жанры фильмов с числом фильмов и средним рейтингом, по убыванию числа фильмов.
+        Результат хранится в кэше в пространстве списков фильмов, поэтому пересчитывается
+        только после изменения индекса фильмов (или по истечении ttl).
+        В случае отсутствия фильмов - возвращает None.
+        """
+        cache_key = build_list_key(Film, aggregation='genres_stats')
+        return await self._get_with_cache(
+            cache_key,
+            read_cache=lambda: self._read_cache(cache_key, Film, list[GenreStats]),
+            load=lambda: self._load_genres_stats_to_cache(cache_key),
+            read_last_good=lambda: self._read_last_good(cache_key, list[GenreStats]),
+        )
+
+    async def _load_genres_stats_to_cache(self, cache_key: str) -> list[GenreStats] | None:
+        """Считает статистику жанров в ElasticSearch и сохраняет её в кэш"""
+        genres_stats = await self._get_genres_stats_from_elastic()
+        if not genres_stats:
+            return None
+        await self._write_cache(cache_key, Film, list[GenreStats], genres_stats, keep_last_good=True)
+        return genres_stats
+
+    @resilient(ELASTIC)
+    async def _get_genres_stats_from_elastic(self) -> list[GenreStats]:
+        """
+        Статистика жанров одной агрегацией без выборки документов (size: 0):
+        nested terms по id жанра, название - из первого вложенного документа корзины,
+        средний рейтинг - по самим фильмам (reverse_nested). Такой запрос попадает в request cache ElasticSearch.
+        """
+        query_body = {
+            'size': 0,
+            'aggs': {
+                'genres': {
+                    'nested': {'path': 'genre'},
+                    'aggs': {
+                        'ids': {
+                            'terms': {'field': 'genre.id', 'size': GENRES_STATS_MAX_SIZE},
+                            'aggs': {
+                                'name': {'top_hits': {'size': 1, '_source': ['genre.name']}},
+                                'films': {
+                                    'reverse_nested': {},
+                                    'aggs': {'avg_rating': {'avg': {'field': 'imdb_rating'}}},
+                                },
+                            },
+                        },
+                    },
+                },
+            },
+        }
+        try:
+            response = await self.elastic.search(
+                index=Indexes.movies.value['index_name'], body=query_body, **_get_search_params(query_body),
+                **get_elastic_timeout_params(shard_timeout=False),
+            )
+        except NotFoundError:
+            return []
+
+        return [
+            GenreStats(
+                id=bucket['key'],
+                name=bucket['name']['hits']['hits'][0]['_source']['name'],
+                films_count=bucket['films']['doc_count'],
+                avg_rating=bucket['films']['avg_rating']['value'],
+            )
+            for bucket in response['aggregations']['genres']['ids']['buckets']
+        ]
+
+    @staticmethod
+    async def build_page_request(start_index: int,
+                                 page_size: int,
+                                 query: OptStrType = None) -> tuple[str, dict]:
+        """Возвращает ключ кэша и запрос в ElasticSearch для страницы жанров, найденных по названию"""
+        cache_key = build_list_key(Genre, start_index=start_index, page_size=page_size, query=query)
+        query_body = await _get_query_body(start_index, page_size, query=query, model=Genre, tiebreaker=True)
+        return cache_key, query_body
 
 
 @lru_cache()
@@ -0,0 +1,136 @@
+"""
+Инвалидация кэша по изменениям данных.
+
+Загрузчики данных после записи в индекс вызывают publish_data_change: увеличивается поколение
+индекса (а при полной перезагрузке - и поколение его объектов), из Redis удаляются записи
+измененных объектов, а в поток Redis Streams `cache:events` пишется событие.
+Через тот же поток воркер API просит остальных удалить из L1-кэша записи, которые он заменил
+в Redis без изменения данных (например, объект больше не находится) - publish_cache_invalidation.
+Каждый воркер API читает поток и обновляет свою копию поколений и L1-кэш.
+"""
+import asyncio
+import logging
+import os
+
+import orjson
+from redis import Redis as SyncRedis
+from redis.asyncio import Redis
+
+from db.elastic import Indexes
+from services.cache_keys import build_negative_key, get_objects_namespace
+from services.exceptions import CONNECTION_EXCEPTIONS
+from services.generations import GENERATIONS_KEY, OBJECTS_SUFFIX, CacheGenerations
+from services.local_cache import LocalCache
+
+logger = logging.getLogger(os.path.basename(__file__))
+
+DATA_EVENTS_STREAM = 'cache:events'
+DATA_EVENTS_MAXLEN = 10000
+DATA_EVENTS_BLOCK_MS = 5000
+
+
+def _build_obj_keys(index_name: str, objects_generation: int, obj_ids: list[str]) -> list[str]:
+    namespace = get_objects_namespace(Indexes[index_name].value['index_model'], objects_generation)
+    keys = [f'{namespace}:{obj_id}' for obj_id in obj_ids]
+    return keys + [build_negative_key(key) for key in keys]
+
+
+def publish_data_change(redis: SyncRedis, index_name: str, obj_ids: list[str] | None = None) -> dict:
+    """
+    Сообщает API об изменении данных индекса. Вызывается загрузчиками данных.
+    :param obj_ids: id измененных документов; None - индекс перезагружен целиком
+    """
+    pipe = redis.pipeline()
+    pipe.hincrby(GENERATIONS_KEY, index_name, 1)
+    if obj_ids is None:
+        pipe.hincrby(GENERATIONS_KEY, index_name + OBJECTS_SUFFIX, 1)
+    else:
+        pipe.hget(GENERATIONS_KEY, index_name + OBJECTS_SUFFIX)
+    generation, objects_generation = pipe.execute()
+    objects_generation = int(objects_generation or 0)
+
+    if obj_ids:
+        redis.delete(*_build_obj_keys(index_name, objects_generation, obj_ids))
+
+    event = {
+        'index': index_name,
+        'generation': generation,
+        'objects_generation': objects_generation,
+        'ids': orjson.dumps(obj_ids),
+    }
+    redis.xadd(DATA_EVENTS_STREAM, event, maxlen=DATA_EVENTS_MAXLEN, approximate=True)
+    logger.info(f'Published data change of index "{index_name}": generation {generation}, '
+                f'{"full reload" if obj_ids is None else f"{len(obj_ids)} changed objects"}')
+    return event
+
+
+async def publish_cache_invalidation(redis: Redis, keys: list[str]) -> None:
+    """Просит все воркеры удалить записи из L1-кэша"""
+    await redis.xadd(DATA_EVENTS_STREAM, {'keys': orjson.dumps(keys)},
+                     maxlen=DATA_EVENTS_MAXLEN, approximate=True)
+
+
+async def load_generations(redis: Redis, generations: CacheGenerations) -> None:
+    """Загружает текущие поколения индексов из Redis"""
+    data = await redis.hgetall(GENERATIONS_KEY)
+    generations.update({name.decode(): int(generation) for name, generation in data.items()})
+
+
+def apply_data_event(event: dict[bytes, bytes], generations: CacheGenerations, cache: LocalCache) -> None:
+    """Применяет событие об изменении данных к поколениям и L1-кэшу воркера"""
+    if b'keys' in event:
+        cache.delete(*orjson.loads(event[b'keys']))
+        return
+
+    index_name = event[b'index'].decode()
+    objects_generation = int(event[b'objects_generation'])
+    generations.update({
+        index_name: int(event[b'generation']),
+        index_name + OBJECTS_SUFFIX: objects_generation,
+    })
+
+    obj_ids = orjson.loads(event[b'ids'])
+    if obj_ids:
+        cache.delete(*_build_obj_keys(index_name, objects_generation, obj_ids))
+
+
+async def get_last_event_id(redis: Redis) -> str:
+    """Id последнего события в потоке; '0-0', если событий еще не было"""
+    events = await redis.xrevrange(DATA_EVENTS_STREAM, count=1)
+    return events[0][0] if events else '0-0'
+
+
+async def listen_data_events(redis: Redis,
+                             generations: CacheGenerations,
+                             cache: LocalCache,
+                             reconnect_delay: float = 1.0):
+    """
+    Фоновая задача воркера: читает поток событий об изменении данных.
+    Позиция в потоке запоминается до загрузки поколений, поэтому события, опубликованные
+    во время загрузки, не теряются. После переподключения чтение продолжается с последнего
+    обработанного события, а поколения перечитываются из Redis. Событие, которое не удалось
+    применить, пропускается, а чтение потока продолжается.
+    """
+    last_event_id = None
+    while True:
+        try:
+            if last_event_id is None:
+                last_event_id = await get_last_event_id(redis)
+            await load_generations(redis, generations)
+            while True:
+                response = await redis.xread({DATA_EVENTS_STREAM: last_event_id}, block=DATA_EVENTS_BLOCK_MS)
+                for _stream, events in response:
+                    for event_id, event in events:
+                        try:
+                            apply_data_event(event, generations, cache)
+                        except Exception:
+                            logger.exception(f'Data change event {event_id} is skipped')
+                        last_event_id = event_id
+        except asyncio.CancelledError:
+            raise
+        except CONNECTION_EXCEPTIONS:
+            logger.warning('Lost connection to data change events stream, reconnecting...')
+            await asyncio.sleep(reconnect_delay)
+        except Exception:
+            logger.exception('Reading of data change events stream failed, restarting...')
+            await asyncio.sleep(reconnect_delay)
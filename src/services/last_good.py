@@ -0,0 +1,20 @@
+"""
+Признак того, что ответ собран из последних удачных значений (last known good),
+потому что ElasticSearch недоступен. Хранится в contextvar запроса: сервисы его выставляют,
+а роут по нему помечает ответ как устаревший и не кэширует его.
+"""
+from contextvars import ContextVar
+
+_served_last_good: ContextVar[bool] = ContextVar('served_last_good', default=False)
+
+
+def mark_served_last_good():
+    _served_last_good.set(True)
+
+
+def reset_served_last_good():
+    _served_last_good.set(False)
+
+
+def is_served_last_good() -> bool:
+    return _served_last_good.get()
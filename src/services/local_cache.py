@@ -0,0 +1,83 @@
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any
+
+from core.config import app_settings
+
+logger = logging.getLogger(os.path.basename(__file__))
+
+
+class LocalCache:
+    """
+    Кэш первого уровня (L1) в памяти процесса воркера.
+    Хранит уже провалидированные pydantic-объекты, ограничен по количеству записей
+    и вытесняет давно не использованные записи (LRU). Каждая запись живет не дольше своего ttl.
+    """
+
+    def __init__(self, max_entries: int, default_ttl: float):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Any | None:
+        """Возвращает значение по ключу или None, если записи нет или она устарела"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        """Сохраняет значение, при переполнении вытесняя самые давние по использованию записи"""
+        if self.max_entries <= 0:
+            return
+
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.default_ttl)
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict[str, int | float]:
+        requests = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': round(self.hits / requests, 4) if requests else 0.0,
+        }
+
+
+local_cache = LocalCache(
+    max_entries=app_settings.local_cache_max_entries,
+    default_ttl=app_settings.local_cache_default_ttl,
+)
+
+
+def get_local_cache() -> LocalCache:
+    return local_cache
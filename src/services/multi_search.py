@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import os
+from functools import lru_cache
+
+from elasticsearch import AsyncElasticsearch
+from fastapi import Depends
+from redis.asyncio import Redis
+
+from db.elastic import Indexes, get_elastic
+from db.redis import get_redis
+from models.models import Film, Genre, Page, Person
+from services.deadline import get_elastic_timeout_params
+from services.film import FilmService
+from services.genre import GenreService
+from services.person import PersonService
+from services.proto_service import ProtoService
+from services.resilience import ELASTIC, resilient
+from services.utils import _get_search_params
+
+logger = logging.getLogger(os.path.basename(__file__))
+
+# Разделы выдачи общего поиска и индексы, в которых они ищутся
+SEARCH_SECTIONS = {
+    'films': Indexes.movies.value,
+    'persons': Indexes.persons.value,
+    'genres': Indexes.genres.value,
+}
+
+
+class MultiSearchService(ProtoService):
+    async def search(self,
+                     query: str,
+                     size: int,
+                     film_source: list[str] | None = None) -> dict[str, list[Film | Person | Genre]]:
+        """
+        Ищет фильмы, персонажей и жанры одним запросом msearch и возвращает лучшие size объектов каждого типа.
+        Каждый раздел кэшируется под тем же ключом, что и первая страница поиска этого типа
+        (/films/search, /persons/search), поэтому общий и отдельные поиски используют общий кэш.
+        В msearch попадают только разделы, которых нет в кэше.
+        """
+        requests = {
+            'films': await FilmService.build_page_request(0, size, query=query, source=film_source),
+            'persons': await PersonService.build_page_request(0, size, query=query),
+            'genres': await GenreService.build_page_request(0, size, query=query),
+        }
+
+        entries = await asyncio.gather(*[
+            self._get_objs_from_cache(cache_key, SEARCH_SECTIONS[section]['index_model'])
+            for section, (cache_key, _) in requests.items()
+        ])
+
+        results, missing = {}, {}
+        for (section, request), entry in zip(requests.items(), entries):
+            if entry is not None and not entry.is_stale:
+                results[section] = entry.value.items
+            else:
+                missing[section] = request
+
+        if missing:
+            pages = await self._msearch_pages({section: query_body for section, (_, query_body) in missing.items()})
+            for section, page in pages.items():
+                results[section] = page.items
+                if page.items and not page.partial:
+                    await self._put_objs_to_cache(missing[section][0], SEARCH_SECTIONS[section]['index_model'], page)
+
+        return results
+
+    @resilient(ELASTIC)
+    async def _msearch_pages(self, query_bodies: dict[str, dict]) -> dict[str, Page]:
+        """
+        Выполняет поисковые запросы разделов одним msearch. ElasticSearch выполняет их параллельно,
+        поэтому время ответа определяется самым медленным из них, а не их суммой.
+        Раздел, запрос которого завершился ошибкой (например, нет индекса), возвращается пустым.
+        """
+        timeout_params = get_elastic_timeout_params()
+        shard_timeout = {'timeout': timeout_params.pop('timeout')} if timeout_params else {}
+
+        body = []
+        for section, query_body in query_bodies.items():
+            body.append({'index': SEARCH_SECTIONS[section]['index_name'], **_get_search_params(query_body)})
+            body.append({**query_body, **shard_timeout})
+
+        response = await self.elastic.msearch(body=body, max_concurrent_searches=len(query_bodies), **timeout_params)
+
+        pages = {}
+        for (section, query_body), search in zip(query_bodies.items(), response['responses']):
+            if 'error' in search:
+                logger.warning(f'Search in {section} failed: {search["error"]}')
+                pages[section] = Page(items=[])
+                continue
+            pages[section] = self._build_page(search, query_body, SEARCH_SECTIONS[section]['index_model'])
+        return pages
+
+
+@lru_cache()
+def get_multi_search_service(
+        redis: Redis = Depends(get_redis),
+        elastic: AsyncElasticsearch = Depends(get_elastic),
+) -> MultiSearchService:
+    """
+    Провайдер MultiSearchService
+    Используем lru_cache-декоратор, чтобы создать объект сервиса в едином экземпляре (синглтона)
+    """
+    return MultiSearchService(redis, elastic)
@@ -1,125 +1,66 @@
 from functools import lru_cache
 
-import backoff
-from elasticsearch import AsyncElasticsearch, NotFoundError
+from elasticsearch import AsyncElasticsearch
 from fastapi import Depends
 from redis.asyncio import Redis
 
 from constants import OptStrType
-from db.elastic import get_elastic
+from db.elastic import Indexes, get_elastic
 from db.redis import get_redis
-from models.models import Film, BaseNameModel
-from models.models import Person
-from services.exceptions import CONNECTION_EXCEPTIONS
+from models.models import Page, Person, TotalCount
+from services.cache_keys import build_list_key
 from services.proto_service import ProtoService
 from services.utils import _get_query_body
 
-ROLES = {
-    'directors': 'director',
-    'actors': 'actor',
-    'writers': 'writer'
-}
-
 
 class PersonService(ProtoService):
-    async def get_person_films_by_id(self, person: Person):
-        """Сервис для получения информации о фильмах, в которых персонаж принимал участие"""
-        films_data = await self.get_person_films_from_elastic(start_index=1, page_size=100, person=person)
-        return films_data
-
-    @backoff.on_exception(backoff.expo, CONNECTION_EXCEPTIONS)
-    async def get_person_films_from_elastic(self,
-                                            start_index: int,
-                                            page_size: int,
-                                            sort: OptStrType = None,
-                                            person: OptStrType = None,
-                                            query: OptStrType = None) -> list[Film] | None:
-        """Получаем список фильмов персонажа из ElasticSearch"""
-        query_body = await _get_query_body(
-            start_index=start_index,
-            page_size=page_size,
-            sort=sort,
-            person_id=person.id,
-            query=query)
+    async def get_page_persons(self,
+                               start_index: int,
+                               page_size: int,
+                               sort: OptStrType = None,
+                               query: OptStrType = None,
+                               search_after: list | None = None,
+                               pit_id: OptStrType = None,
+                               use_pit: bool = False) -> Page[Person] | None:
+        """
+        Поиск персонажей по имени с учетом возможных опечаток.
+        Возвращает страницу персонажей вместе со значениями сортировки для запроса следующей страницы.
+        """
 
-        try:
-            search = await self.elastic.search(index='movies', body=query_body)
-        except NotFoundError:
-            return None
+        cache_key, query_body = await self.build_page_request(start_index, page_size, sort, query, search_after)
+        return await self._get_list_with_cache(
+            cache_key,
+            Person,
+            lambda: self._search_page('persons', query_body, Person, pit_id, use_pit),
+            keep_last_good=start_index == 0 and not (query or search_after),
+        )
 
-        films_data = [
-            Film(**hit['_source']) for hit in search['hits']['hits']
-        ]
-        return films_data
+    async def get_total_persons(self, query: OptStrType = None) -> TotalCount:
+        """Число персонажей, найденных по имени"""
+        query_body = await _get_query_body(0, 0, query=query, model=Person)
+        return await self._get_total_count(Indexes.persons.value, query_body, keep_last_good=not query)
 
     @staticmethod
-    async def filter_films_by_person_with_role(films: list[Film] | list, person: Person) -> list[dict[str, str]]:
+    async def build_page_request(start_index: int,
+                                 page_size: int,
+                                 sort: OptStrType = None,
+                                 query: OptStrType = None,
+                                 search_after: list | None = None) -> tuple[str, dict]:
         """
-        Фильтрует список фильмов в которых персонаж принимал участие,
-        с указанием его ролей. Возвращает пустой список, если персонаж еще не принимал участие в фильмах.
+        Возвращает ключ кэша и запрос в ElasticSearch для страницы персонажей.
+        Используется и для запросов в составе msearch, чтобы их результаты попадали в тот же кэш.
         """
-        films_by_person = []
-        if films:
-            for film in films:
-                film_with_roles = {'id': film.id, 'roles': []}
-
-                for roles, role in ROLES.items():
-
-                    for role_obj in getattr(film, roles):
-
-                        if role_obj['id'] == person.id:
-                            film_with_roles['roles'].append(role)
-                            break
-
-                films_by_person.append(film_with_roles)
-        return films_by_person
-
-    async def get_list_persons(self,
-                               start_index: int,
-                               page_size: int,
-                               sort: OptStrType = None,
-                               query: OptStrType = None) -> list[Person] | None:
-        """Поиск персонажей по имени с учетом возможных опечаток"""
-
-        model = Person
-        parameters = self.get_params_to_cache(
+        cache_key = build_list_key(
+            Person,
             start_index=start_index,
             page_size=page_size,
             sort=sort,
             query=query,
-            model=model
+            search_after=search_after,
         )
-        persons_data = await self._get_objs_from_cache(parameters, model)
-
-        if not persons_data:
-            persons_data = await self._get_list_persons_from_elastic(start_index, page_size, sort, query, model)
-
-            if not persons_data:
-                return None
-
-            await self._put_objs_to_cache(parameters, persons_data)
-        return persons_data
-
-    @backoff.on_exception(backoff.expo, CONNECTION_EXCEPTIONS)
-    async def _get_list_persons_from_elastic(self,
-                                             start_index: int,
-                                             page_size: int,
-                                             sort: OptStrType = None,
-                                             query: OptStrType = None,
-                                             model: BaseNameModel | None = None) -> list[Person] | None:
-        """"""
-        query_body = await _get_query_body(start_index, page_size, sort, query=query, model=model)
-
-        try:
-            search = await self.elastic.search(index='persons', body=query_body)
-        except NotFoundError:
-            return None
-
-        persons_data = [
-            Person(**hit['_source']) for hit in search['hits']['hits']
-        ]
-
-        return persons_data
+        query_body = await _get_query_body(start_index, page_size, sort, query=query, model=Person,
+                                           search_after=search_after, tiebreaker=True)
+        return cache_key, query_body
 
 
 @lru_cache()
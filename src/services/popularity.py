@@ -0,0 +1,78 @@
+import asyncio
+import logging
+import os
+from collections import Counter
+
+from redis.asyncio import Redis
+
+from core.config import app_settings
+from services.exceptions import CONNECTION_EXCEPTIONS
+
+logger = logging.getLogger(os.path.basename(__file__))
+
+POPULARITY_KEY_PREFIX = 'popular:'
+
+
+class PopularityTracker:
+    """
+    Счетчик запросов к объектам. Запросы считаются в памяти воркера
+    и периодически сбрасываются одним pipeline в sorted set Redis `popular:<сущность>`,
+    общий для всех воркеров. Используется прогревом кэша для выбора самых запрашиваемых объектов.
+    Между сбросами в памяти хранится не больше max_tracked объектов каждой сущности.
+    """
+
+    def __init__(self, max_tracked: int, retention: int):
+        self.max_tracked = max_tracked
+        self.retention = retention
+        self._counts: dict[str, Counter] = {}
+
+    def record(self, namespace: str, obj_id: str) -> None:
+        counter = self._counts.setdefault(namespace, Counter())
+        if obj_id not in counter and len(counter) >= self.max_tracked:
+            # Счетчик заполнен: вытесняем объекты, запрошенные один раз, а если таких нет - новый не считаем
+            for rare_id in [rare_id for rare_id, count in counter.items() if count == 1]:
+                del counter[rare_id]
+            if len(counter) >= self.max_tracked:
+                return
+        counter[obj_id] += 1
+
+    async def flush(self, redis: Redis) -> None:
+        """Переносит накопленные счетчики в Redis и оставляет в sorted set только max_tracked лидеров"""
+        counts, self._counts = self._counts, {}
+        if not counts:
+            return
+
+        async with redis.pipeline(transaction=False) as pipe:
+            for namespace, counter in counts.items():
+                key = POPULARITY_KEY_PREFIX + namespace
+                for obj_id, count in counter.items():
+                    pipe.zincrby(key, count, obj_id)
+                pipe.zremrangebyrank(key, 0, -self.max_tracked - 1)
+                pipe.expire(key, self.retention)
+            await pipe.execute()
+
+    @staticmethod
+    async def top(redis: Redis, namespace: str, limit: int) -> list[str]:
+        """Возвращает id самых запрашиваемых объектов сущности"""
+        obj_ids = await redis.zrevrange(POPULARITY_KEY_PREFIX + namespace, 0, limit - 1)
+        return [obj_id.decode() for obj_id in obj_ids]
+
+
+popularity_tracker = PopularityTracker(
+    max_tracked=app_settings.popularity_max_tracked,
+    retention=app_settings.popularity_retention,
+)
+
+
+def get_popularity_tracker() -> PopularityTracker:
+    return popularity_tracker
+
+
+async def flush_popularity_periodically(redis: Redis, tracker: PopularityTracker, interval: float):
+    """Фоновая задача воркера: раз в interval секунд сбрасывает счетчики запросов в Redis"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await tracker.flush(redis)
+        except CONNECTION_EXCEPTIONS:
+            logger.warning('Failed to flush popularity counters to Redis')
@@ -1,24 +1,66 @@
-import json
+import asyncio
+import hashlib
+import logging
+import os
+import time
 from http import HTTPStatus
+from typing import Any, Awaitable, Callable
 
-import backoff
-from elasticsearch import AsyncElasticsearch, NotFoundError
+from elasticsearch import AsyncElasticsearch, NotFoundError, RequestError
 from fastapi import HTTPException
 from pydantic import BaseModel
 from redis.asyncio import Redis
 
-from models.models import Film, Genre, Person
+from models.models import Film, Genre, Page, Person, TotalCount
+from core.config import app_settings
+from services.cache_codecs import decode_entry, encode_entry
+from services.cache_keys import build_last_good_key, build_list_key, build_negative_key, build_obj_key
+from services.cache_policy import CacheEntry, get_cache_policy
+from services.deadline import (DeadlineExceeded, clear_deadline, get_elastic_timeout_params, is_cache_read_allowed,
+                               read_cache_within_deadline)
 from services.exceptions import CONNECTION_EXCEPTIONS
+from services.invalidation import publish_cache_invalidation
+from services.last_good import mark_served_last_good
+from services.local_cache import LocalCache, get_local_cache
+from services.resilience import ELASTIC, REDIS, CircuitOpenError, resilient
+from services.single_flight import SingleFlight, get_single_flight
+from services.utils import _get_count_query_body, _get_search_params
 
-CACHE_EXPIRE_IN_SECONDS = 60 * 5  # 5 минут
+logger = logging.getLogger(os.path.basename(__file__))
+
+# Сбои ElasticSearch, при которых вместо ошибки отдается последнее удачное значение
+ELASTIC_UNAVAILABLE_EXCEPTIONS = (CircuitOpenError, DeadlineExceeded, *CONNECTION_EXCEPTIONS)
+
+# Ссылки на фоновые задачи обновления кэша, чтобы их не удалил сборщик мусора
+_background_tasks: set[asyncio.Task] = set()
+
+
+def run_in_background(coro: Awaitable, description: str):
+    """Запускает фоновую задачу; ошибки задачи логируются и не влияют на обработку запроса"""
+    async def wrapper():
+        # Фоновая задача не ограничена дедлайном запроса, из которого запущена
+        clear_deadline()
+        try:
+            await coro
+        except Exception:
+            logger.exception(f'Background {description} failed')
+
+    task = asyncio.create_task(wrapper())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
 
 
 class ProtoService:
-    def __init__(self, redis: Redis, elastic: AsyncElasticsearch):
+    def __init__(self,
+                 redis: Redis,
+                 elastic: AsyncElasticsearch,
+                 local_cache: LocalCache | None = None,
+                 single_flight: SingleFlight | None = None):
         self.redis = redis
         self.elastic = elastic
+        self.local_cache = local_cache or get_local_cache()
+        self.single_flight = single_flight or get_single_flight()
 
-    # @backoff.on_exception(backoff.expo, CONNECTION_EXCEPTIONS)
     async def get_by_id(
             self, obj_id: str,
             index_dict: dict[str, BaseModel | str]
@@ -30,19 +72,248 @@ class ProtoService:
         index_name = index_dict.get('index_name')
         index_model = index_dict.get('index_model')
 
-        instance = await self._get_obj_from_cache(obj_id, index_model)
+        cache_key = build_obj_key(index_model, obj_id)
+        instance = await self._get_with_cache(
+            cache_key,
+            read_cache=lambda: self._get_obj_from_cache(cache_key, index_model),
+            load=lambda: self._load_obj_to_cache(cache_key, obj_id, index_name, index_model),
+            read_last_good=lambda: self._read_last_good(cache_key, index_model),
+        )
 
         if not instance:
-            instance = await self._get_instance_from_elastic(obj_id, index_name, index_model)
-
-            if not instance:
-                raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=f'Object {obj_id} not found')
+            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=f'Object {obj_id} not found')
 
-            await self._put_obj_to_cache(instance)
+        return instance
 
+    async def _load_obj_to_cache(
+            self, cache_key: str,
+            obj_id: str,
+            index_name: str,
+            index_model: BaseModel
+    ) -> Film | Genre | Person | None:
+        """Получает объект из ElasticSearch и сохраняет его в кэш"""
+        instance = await self._get_instance_from_elastic(obj_id, index_name, index_model)
+        if instance:
+            await self._put_obj_to_cache(cache_key, instance)
         return instance
 
-    @backoff.on_exception(backoff.expo, CONNECTION_EXCEPTIONS)
+    async def get_many(
+            self, obj_ids: list[str],
+            index_dict: dict[str, BaseModel | str]
+    ) -> list[Film | Genre | Person]:
+        """
+        Метод возвращает объекты по списку id в исходном порядке, отсутствующие объекты пропускаются.
+        Кэш читается одним MGET, а из ElasticSearch одним mget запрашиваются только недостающие объекты.
+        Устаревшие записи отдаются сразу и обновляются в фоне.
+        Если ElasticSearch недоступен, недостающие объекты берутся из последних удачных значений.
+        """
+        index_name = index_dict.get('index_name')
+        index_model = index_dict.get('index_model')
+
+        cache_keys = {obj_id: build_obj_key(index_model, obj_id) for obj_id in dict.fromkeys(obj_ids)}
+        found, stale_ids, missing_ids = await self._get_many_from_cache(cache_keys, index_model)
+
+        if missing_ids:
+            try:
+                found.update(await self._load_many_to_cache(missing_ids, cache_keys, index_name, index_model))
+            except ELASTIC_UNAVAILABLE_EXCEPTIONS:
+                last_good = await self._read_many_last_good(missing_ids, cache_keys, index_model)
+                if not last_good:
+                    raise
+                logger.warning(f'{index_name} is unavailable, {len(last_good)} objects served from last known good')
+                mark_served_last_good()
+                found.update(last_good)
+
+        if stale_ids:
+            self._refresh_many_in_background(stale_ids, cache_keys, index_name, index_model)
+
+        return [found[obj_id] for obj_id in obj_ids if obj_id in found]
+
+    async def _get_many_from_cache(
+            self, cache_keys: dict[str, str],
+            index_model: BaseModel
+    ) -> tuple[dict[str, Film | Genre | Person], list[str], list[str]]:
+        """
+        Читает объекты из L1-кэша, а остальные - одним MGET из Redis вместе с отметками об их отсутствии.
+        Возвращает найденные объекты, id устаревших объектов и id объектов, которых нет в кэше.
+        """
+        found, stale_ids, to_fetch = {}, [], []
+        for obj_id, cache_key in cache_keys.items():
+            value = self.local_cache.get(cache_key)
+            if value is not None:
+                found[obj_id] = value
+            elif not self.local_cache.get(build_negative_key(cache_key)):
+                to_fetch.append(obj_id)
+
+        if not to_fetch or not is_cache_read_allowed():
+            return found, stale_ids, to_fetch
+
+        keys = [cache_keys[obj_id] for obj_id in to_fetch]
+        data = await self._mget_from_redis(keys + [build_negative_key(key) for key in keys])
+        values, negative_markers = data[:len(keys)], data[len(keys):]
+
+        missing_ids = []
+        for obj_id, value, negative_marker in zip(to_fetch, values, negative_markers):
+            entry = self._decode_cache_data(cache_keys[obj_id], index_model, index_model, value) if value else None
+            if entry is not None:
+                found[obj_id] = entry.value
+                if entry.is_stale:
+                    stale_ids.append(obj_id)
+            elif not negative_marker:
+                missing_ids.append(obj_id)
+        return found, stale_ids, missing_ids
+
+    async def _load_many_to_cache(
+            self, obj_ids: list[str],
+            cache_keys: dict[str, str],
+            index_name: str,
+            index_model: BaseModel
+    ) -> dict[str, Film | Genre | Person]:
+        """Получает объекты из ElasticSearch одним mget и сохраняет в кэш их и отметки об отсутствующих"""
+        instances = await self._get_instances_from_elastic(obj_ids, index_name, index_model)
+        await self.put_many(
+            {cache_keys[obj_id]: instance for obj_id, instance in instances.items()},
+            negative_keys=[cache_keys[obj_id] for obj_id in obj_ids if obj_id not in instances],
+        )
+        return instances
+
+    def _refresh_many_in_background(
+            self, obj_ids: list[str],
+            cache_keys: dict[str, str],
+            index_name: str,
+            index_model: BaseModel
+    ):
+        """
+        Запускает фоновое обновление устаревших объектов одним mget. Объекты, которые уже обновляются
+        поодиночке, пропускаются, а обновление того же набора объектов запускается воркером один раз.
+        """
+        obj_ids = sorted(obj_id for obj_id in obj_ids if not self.single_flight.is_in_flight(cache_keys[obj_id]))
+        refresh_key = f'{index_name}:mget:{hashlib.blake2b(",".join(obj_ids).encode(), digest_size=8).hexdigest()}'
+        if not obj_ids or self.single_flight.is_in_flight(refresh_key):
+            return
+
+        run_in_background(
+            self.single_flight.do(
+                refresh_key, lambda: self._load_many_to_cache(obj_ids, cache_keys, index_name, index_model),
+            ),
+            description=f'refresh of {len(obj_ids)} {index_name} objects',
+        )
+
+    async def _get_list_with_cache(
+            self, cache_key: str,
+            model: Film | Genre | Person,
+            load_from_elastic: Callable[[], Awaitable[Page | None]],
+            keep_last_good: bool = False
+    ) -> Page | None:
+        """
+        Возвращает страницу объектов из кэша, а при промахе - загружает её из ElasticSearch и сохраняет в кэш.
+        В случае отсутствия подходящих объектов - возвращает None.
+        :param keep_last_good: хранить последнее удачное значение страницы. Только для страниц,
+        число которых ограничено (первые страницы без поиска и курсора), иначе Redis растет с числом запросов
+        """
+        return await self._get_with_cache(
+            cache_key,
+            read_cache=lambda: self._get_objs_from_cache(cache_key, model),
+            load=lambda: self._load_objs_to_cache(cache_key, model, load_from_elastic, keep_last_good),
+            read_last_good=(lambda: self._read_last_good(cache_key, Page[model])) if keep_last_good else None,
+        )
+
+    async def _load_objs_to_cache(
+            self, cache_key: str,
+            model: Film | Genre | Person,
+            load_from_elastic: Callable[[], Awaitable[Page | None]],
+            keep_last_good: bool = False
+    ) -> Page | None:
+        """
+        Загружает страницу объектов из ElasticSearch и сохраняет её в кэш.
+        Неполная страница не кэшируется, а пустая неполная страница - не признак отсутствия объектов:
+        отметка об отсутствии не ставится, запрос завершается как исчерпавший бюджет времени.
+        """
+        page = await load_from_elastic()
+        if page and page.partial:
+            if not page.items:
+                raise DeadlineExceeded()
+            return page
+        if not page or not page.items:
+            return None
+        await self._put_objs_to_cache(cache_key, model, page, keep_last_good)
+        return page
+
+    async def _get_with_cache(
+            self, cache_key: str,
+            read_cache: Callable[[], Awaitable[CacheEntry | None]],
+            load: Callable[[], Awaitable[Any]],
+            read_last_good: Callable[[], Awaitable[CacheEntry | None]] | None = None
+    ) -> Any:
+        """
+        Общая логика чтения через кэш.
+        Свежее значение отдается сразу. Устаревшее (истек soft_ttl) тоже отдается сразу,
+        а обновление запускается в фоне. При промахе значение загружается один раз на ключ
+        для всех одновременных запросов всех воркеров.
+        Пустой результат запоминается на короткое время, и до его истечения сразу возвращается None.
+        Если загрузить значение не удалось из-за недоступности ElasticSearch, отдается последнее
+        удачное значение (read_last_good), а ответ помечается как устаревший.
+        """
+        entry = await read_cache()
+        if entry is not None:
+            if entry.is_stale:
+                self._refresh_in_background(cache_key, read_cache, load)
+            return entry.value
+
+        if await self._is_negative_cached(cache_key):
+            return None
+
+        try:
+            return await self.single_flight.do_with_lock(
+                self.redis,
+                cache_key,
+                read_cache=lambda: self._read_fresh_value(read_cache),
+                compute=lambda: self._load_or_mark_missing(cache_key, load),
+                is_missing=lambda: self._is_negative_cached(cache_key),
+            )
+        except ELASTIC_UNAVAILABLE_EXCEPTIONS:
+            entry = await read_last_good() if read_last_good else None
+            if entry is None:
+                raise
+            logger.warning(f'ElasticSearch is unavailable, {cache_key} served from last known good')
+            mark_served_last_good()
+            return entry.value
+
+    async def _load_or_mark_missing(self, cache_key: str, load: Callable[[], Awaitable[Any]]) -> Any:
+        """Загружает значение, а если его нет - сохраняет в кэш отметку об отсутствии результата"""
+        value = await load()
+        if not value:
+            await self._put_negative_to_cache(cache_key)
+        return value
+
+    @staticmethod
+    async def _read_fresh_value(read_cache: Callable[[], Awaitable[CacheEntry | None]]) -> Any:
+        entry = await read_cache()
+        if entry is None or entry.is_stale:
+            return None
+        return entry.value
+
+    def _refresh_in_background(
+            self, cache_key: str,
+            read_cache: Callable[[], Awaitable[CacheEntry | None]],
+            load: Callable[[], Awaitable[Any]]
+    ):
+        """Запускает фоновое обновление устаревшей записи, если оно еще не запущено этим воркером"""
+        if self.single_flight.is_in_flight(cache_key):
+            return
+
+        run_in_background(
+            self.single_flight.do_with_lock(
+                self.redis,
+                cache_key,
+                read_cache=lambda: self._read_fresh_value(read_cache),
+                compute=lambda: self._load_or_mark_missing(cache_key, load),
+                is_missing=lambda: self._is_negative_cached(cache_key),
+            ),
+            description=f'refresh of {cache_key}',
+        )
+
+    @resilient(ELASTIC)
     async def _get_instance_from_elastic(
             self, obj_id: str,
             index_name: str,
@@ -53,62 +324,375 @@ class ProtoService:
         В случае отсутствия подходящего объекта - возвращает None.
         """
         try:
-            doc = await self.elastic.get(index=index_name, id=obj_id)
+            doc = await self.elastic.get(index=index_name, id=obj_id, **get_elastic_timeout_params(shard_timeout=False))
         except NotFoundError:
             return None
 
         return index_model(**doc['_source'])  # noqa
 
+    @resilient(ELASTIC)
+    async def _get_instances_from_elastic(
+            self, obj_ids: list[str],
+            index_name: str,
+            index_model: BaseModel
+    ) -> dict[str, Film | Genre | Person]:
+        """Вспомогательный метод для получения объектов из ElasticSearch по списку id одним запросом"""
+        try:
+            response = await self.elastic.mget(
+                index=index_name, body={'ids': obj_ids}, **get_elastic_timeout_params(shard_timeout=False),
+            )
+        except NotFoundError:
+            return {}
+
+        return {doc['_id']: index_model(**doc['_source']) for doc in response['docs'] if doc.get('found')}
+
+    @resilient(ELASTIC)
+    async def _search_page(
+            self, index_name: str,
+            query_body: dict,
+            model: Film | Genre | Person,
+            pit_id: str | None = None,
+            use_pit: bool = False
+    ) -> Page | None:
+        """
+        Выполняет поиск и возвращает страницу объектов вместе со значениями сортировки последнего из них.
+        При use_pit поиск идет в срезе индекса (point in time): при переходе по курсору выдача
+        не сдвигается от изменений индекса. Если срез истек, поиск продолжается по текущему индексу.
+        На последней странице срез закрывается, не дожидаясь истечения keep_alive.
+        В случае отсутствия индекса - возвращает None, при недопустимых значениях курсора - ошибку 400.
+        """
+        is_pit_opened = use_pit and not pit_id
+        if is_pit_opened:
+            pit_id = await self._open_point_in_time(index_name)
+
+        search = None
+        if pit_id:
+            body = {**query_body, 'pit': {'id': pit_id, 'keep_alive': app_settings.pagination_pit_keep_alive}}
+            try:
+                search = await self.elastic.search(body=body, **get_elastic_timeout_params())
+            except (NotFoundError, RequestError):
+                logger.info(f'Point in time for {index_name} expired, searching the live index')
+            except BaseException:
+                # Курсор с этим срезом клиент не получит, и срез остался бы открытым до истечения keep_alive
+                if is_pit_opened:
+                    self._close_point_in_time_in_background(pit_id)
+                raise
+
+        if search is None:
+            try:
+                search = await self.elastic.search(
+                    index=index_name, body=query_body, **_get_search_params(query_body), **get_elastic_timeout_params(),
+                )
+            except NotFoundError:
+                return None
+            except RequestError:
+                # Значения search_after берутся из курсора клиента и могут не подходить к сортировке
+                if 'search_after' in query_body:
+                    raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail='invalid cursor')
+                raise
+
+        page = self._build_page(search, query_body, model)
+        if page.pit_id and page.search_after is None:
+            self._close_point_in_time_in_background(page.pit_id)
+            page.pit_id = None
+        return page
+
     @staticmethod
-    def get_params_to_cache(**kwargs):
-        return str(kwargs)
+    def _build_page(search: dict, query_body: dict, model: Film | Genre | Person) -> Page:
+        """Собирает страницу из ответа ElasticSearch на поисковый запрос query_body"""
+        hits = search['hits']['hits']
+        partial = search.get('timed_out', False)
+        search_after = None
+        # У неполной страницы курсора нет: записи с не успевших ответить шардов были бы пропущены
+        if hits and len(hits) == query_body['size'] and 'sort' in hits[-1] and not partial:
+            # Неявную досортировку по _shard_doc, которую добавляет срез, в курсор не берем:
+            # порядок и так однозначен благодаря досортировке по id
+            search_after = hits[-1]['sort'][:len(query_body['sort'])]
+
+        return Page(
+            items=[model(**hit['_source']) for hit in hits],
+            search_after=search_after,
+            pit_id=search.get('pit_id'),
+            partial=partial,
+        )
+
+    async def _open_point_in_time(self, index_name: str) -> str | None:
+        """Открывает срез индекса (point in time). Если ElasticSearch его не поддерживает - возвращает None"""
+        try:
+            response = await self.elastic.transport.perform_request(
+                'POST', f'/{index_name}/_pit',
+                params={'keep_alive': app_settings.pagination_pit_keep_alive,
+                        **get_elastic_timeout_params(shard_timeout=False)},
+            )
+        except (NotFoundError, RequestError):
+            return None
+        return response.get('id')
+
+    def _close_point_in_time_in_background(self, pit_id: str):
+        """Закрывает срез индекса в фоне, чтобы не задерживать ответ"""
+        run_in_background(self._close_point_in_time(pit_id), description='closing of point in time')
+
+    async def _close_point_in_time(self, pit_id: str):
+        """Закрывает срез индекса; истекший срез ElasticSearch уже закрыл сам"""
+        try:
+            await self.elastic.transport.perform_request('DELETE', '/_pit', body={'id': pit_id})
+        except NotFoundError:
+            pass
+
+    async def _get_total_count(
+            self, index_dict: dict[str, BaseModel | str],
+            query_body: dict,
+            keep_last_good: bool = False
+    ) -> TotalCount:
+        """
+        Возвращает число объектов, подходящих под условие отбора запроса query_body.
+        Значение кэшируется по самому условию отбора, поэтому общее для всех страниц, сортировок и полей.
+        :param keep_last_good: хранить последнее удачное значение (только для условий без поиска)
+        """
+        index_name = index_dict.get('index_name')
+        index_model = index_dict.get('index_model')
+
+        count_body = _get_count_query_body(query_body)
+        cache_key = build_list_key(index_model, count=count_body)
+        return await self._get_with_cache(
+            cache_key,
+            read_cache=lambda: self._read_cache(cache_key, index_model, TotalCount),
+            load=lambda: self._load_total_count_to_cache(
+                cache_key, index_name, index_model, count_body, keep_last_good,
+            ),
+            read_last_good=(lambda: self._read_last_good(cache_key, TotalCount)) if keep_last_good else None,
+        )
+
+    async def _load_total_count_to_cache(
+            self, cache_key: str,
+            index_name: str,
+            index_model: BaseModel,
+            count_body: dict,
+            keep_last_good: bool = False
+    ) -> TotalCount:
+        """Считает объекты в ElasticSearch и сохраняет число в кэш"""
+        total_count = await self._count_in_elastic(index_name, count_body)
+        await self._write_cache(cache_key, index_model, TotalCount, total_count, keep_last_good)
+        return total_count
+
+    @resilient(ELASTIC)
+    async def _count_in_elastic(self, index_name: str, count_body: dict) -> TotalCount:
+        """
+        Вместо _count, который всегда досчитывает до конца, используется поиск size: 0
+        с track_total_hits: ElasticSearch прекращает подсчет на пороге и сообщает, что найдено не меньше.
+        """
+        try:
+            search = await self.elastic.search(
+                index=index_name, body=count_body, **_get_search_params(count_body),
+                **get_elastic_timeout_params(shard_timeout=False),
+            )
+        except NotFoundError:
+            return TotalCount(value=0)
+
+        total = search['hits']['total']
+        return TotalCount(value=total['value'], exact=total['relation'] == 'eq')
 
-    @backoff.on_exception(backoff.expo, CONNECTION_EXCEPTIONS)
     async def _get_obj_from_cache(
-            self, obj_id: str,
+            self, cache_key: str,
             index_model: BaseModel
-    ) -> BaseModel | None:
+    ) -> CacheEntry | None:
         """
         Получаем данные об объекте из кэша. Если объекта в кэше нет - возвращаем None
         """
+        return await self._read_cache(cache_key, index_model, index_model)
+
+    async def _put_obj_to_cache(self, cache_key: str, obj: Film | Genre | Person):
+        """
+        Сохраняем данные об объекте в кэш вместе с последним удачным значением.
+        """
+        await self._write_cache(cache_key, obj.__class__, obj.__class__, obj, keep_last_good=True)
+
+    async def _get_objs_from_cache(
+            self, cache_key: str,
+            model: Film | Genre | Person
+    ) -> CacheEntry | None:
+        """Получаем страницу объектов из кэша. Если страницы в кэше нет - возвращаем None"""
+        return await self._read_cache(cache_key, model, Page[model])
+
+    async def _put_objs_to_cache(
+            self, cache_key: str,
+            model: Film | Genre | Person,
+            page: Page,
+            keep_last_good: bool = False
+    ):
+        """
+        Сохраняем страницу объектов в кэш одной записью.
+        """
+        await self._write_cache(cache_key, model, Page[model], page, keep_last_good)
 
-        data = await self.redis.get(obj_id)
+    async def _read_cache(
+            self, cache_key: str,
+            model: type[BaseModel],
+            value_type: Any
+    ) -> CacheEntry | None:
+        """
+        Читает запись сначала из L1-кэша воркера, затем из Redis.
+        Запись в Redis хранится вместе с моментом истечения soft_ttl; свежие записи из Redis
+        дополнительно кладутся в L1-кэш, устаревшие - нет.
+        :param model: модель, по которой выбирается политика кэширования
+        :param value_type: тип хранимого значения, например Film или list[Film]
+        """
+        value = self.local_cache.get(cache_key)
+        if value is not None:
+            return CacheEntry(value)
+
+        if not is_cache_read_allowed():
+            return None
 
+        data = await self._get_from_redis(cache_key)
         if not data:
             return None
 
-        obj = index_model.parse_raw(data)
-        return obj
+        return self._decode_cache_data(cache_key, model, value_type, data)
 
-    @backoff.on_exception(backoff.expo, CONNECTION_EXCEPTIONS)
-    async def _put_obj_to_cache(self, obj: Film | Genre | Person):
+    # Если Redis недоступен, чтение из него пропускается как промах, а L1-кэш продолжает работать
+    @resilient(REDIS, fallback=None)
+    async def _get_from_redis(self, cache_key: str) -> bytes | None:
+        return await read_cache_within_deadline(self.redis.get(cache_key))
+
+    @resilient(REDIS, fallback=lambda self, keys: [None] * len(keys))
+    async def _mget_from_redis(self, keys: list[str]) -> list[bytes | None]:
+        return await read_cache_within_deadline(self.redis.mget(keys))
+
+    def _decode_cache_data(
+            self, cache_key: str,
+            model: type[BaseModel],
+            value_type: Any,
+            data: bytes
+    ) -> CacheEntry | None:
+        """Декодирует запись, полученную из Redis, и кладет её в L1-кэш, если она еще свежая"""
+        decoded = decode_entry(value_type, data)
+        if decoded is None:
+            return None
+
+        value, soft_expires_at = decoded
+        fresh_for = soft_expires_at - time.time()
+        if fresh_for > 0:
+            self.local_cache.set(cache_key, value, min(get_cache_policy(model).local_ttl, fresh_for))
+        return CacheEntry(value, is_stale=fresh_for <= 0)
+
+    async def _read_last_good(self, cache_key: str, value_type: Any) -> CacheEntry | None:
         """
-        Сохраняем данные об объекте в кэш, сериализуя модель через pydantic в формат json.
+        Читает последнее удачное значение для ключа кэша. Оно всегда считается устаревшим
+        и в L1-кэш не кладется. Бюджет времени запроса на чтение не действует: ElasticSearch
+        уже не ответил, и это последняя возможность ответить клиенту без ошибки.
         """
-        key_for_redis = str(dict(name="Returning one object", id=obj.id, class_name=obj.__class__))
-        await self.redis.set(key_for_redis, obj.json(), CACHE_EXPIRE_IN_SECONDS)
+        if not app_settings.cache_last_good_enabled:
+            return None
 
-    @backoff.on_exception(backoff.expo, CONNECTION_EXCEPTIONS)
-    async def _get_objs_from_cache(
-            self, parameters: str,
-            model: Film | Genre | Person
-    ) -> list[Film | Genre | Person] | None:
-        """Получаем объекты из кэша. Если объектов в кэше нет - возвращаем None"""
-        data = await self.redis.get(parameters)
-        if not data:
+        data = await self._get_last_good_from_redis(build_last_good_key(cache_key))
+        decoded = decode_entry(value_type, data) if data else None
+        if decoded is None:
             return None
-        data = data.decode()
-        objs = [model.parse_raw(json.dumps(obj)) for obj in json.loads(data)]
-        return objs
+        return CacheEntry(decoded[0], is_stale=True)
+
+    async def _read_many_last_good(
+            self, obj_ids: list[str],
+            cache_keys: dict[str, str],
+            index_model: BaseModel
+    ) -> dict[str, Film | Genre | Person]:
+        """Читает последние удачные значения объектов одним MGET"""
+        if not app_settings.cache_last_good_enabled:
+            return {}
+
+        data = await self._mget_last_good_from_redis([build_last_good_key(cache_keys[obj_id]) for obj_id in obj_ids])
+        found = {}
+        for obj_id, value in zip(obj_ids, data):
+            decoded = decode_entry(index_model, value) if value else None
+            if decoded is not None:
+                found[obj_id] = decoded[0]
+        return found
+
+    @resilient(REDIS, fallback=None)
+    async def _get_last_good_from_redis(self, last_good_key: str) -> bytes | None:
+        return await self.redis.get(last_good_key)
+
+    @resilient(REDIS, fallback=lambda self, keys: [None] * len(keys))
+    async def _mget_last_good_from_redis(self, keys: list[str]) -> list[bytes | None]:
+        return await self.redis.mget(keys)
+
+    @resilient(REDIS, fallback=None)
+    async def _write_cache(
+            self, cache_key: str,
+            model: type[BaseModel],
+            value_type: Any,
+            value: Any,
+            keep_last_good: bool = False
+    ):
+        """
+        Сохраняет запись в Redis вместе с моментом истечения soft_ttl и в L1-кэш воркера.
+        Ttl записи в Redis (hard_ttl) - лишь страховка, обычно запись обновляется раньше.
+        При keep_last_good рядом сохраняется последнее удачное значение, которое живет намного дольше
+        (cache_last_good_ttl); только для записей, число которых не растет с числом разных запросов.
+        """
+        policy = get_cache_policy(model)
+        data = encode_entry(value_type, value, policy.soft_expires_at())
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.set(cache_key, data, policy.hard_ttl)
+            if keep_last_good and app_settings.cache_last_good_enabled:
+                pipe.set(build_last_good_key(cache_key), data, app_settings.cache_last_good_ttl)
+            await pipe.execute()
+        self.local_cache.set(cache_key, value, min(policy.local_ttl, policy.soft_ttl))
+
+    @resilient(REDIS, fallback=None)
+    async def put_many(self, objs: dict[str, Film | Genre | Person], negative_keys: list[str] | None = None):
+        """
+        Сохраняет в кэш несколько объектов (ключ кэша -> объект), их последние удачные значения
+        и отметки об отсутствии объектов за один проход по сети, через pipeline.
+        """
+        negative_keys = negative_keys or []
+        if not objs and not negative_keys:
+            return
 
-    @backoff.on_exception(backoff.expo, CONNECTION_EXCEPTIONS)
-    async def _put_objs_to_cache(self, parameters: str, objs: list[Film | Genre | Person]):
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for cache_key, obj in objs.items():
+                policy = get_cache_policy(obj.__class__)
+                data = encode_entry(obj.__class__, obj, policy.soft_expires_at())
+                pipe.set(cache_key, data, policy.hard_ttl)
+                if app_settings.cache_last_good_enabled:
+                    pipe.set(build_last_good_key(cache_key), data, app_settings.cache_last_good_ttl)
+            for cache_key in negative_keys:
+                pipe.set(build_negative_key(cache_key), 1, app_settings.cache_negative_ttl)
+            await pipe.execute()
+
+        for cache_key, obj in objs.items():
+            policy = get_cache_policy(obj.__class__)
+            self.local_cache.set(cache_key, obj, min(policy.local_ttl, policy.soft_ttl))
+        for cache_key in negative_keys:
+            self.local_cache.set(build_negative_key(cache_key), True, app_settings.cache_negative_ttl)
+
+    @resilient(REDIS, fallback=False)
+    async def _is_negative_cached(self, cache_key: str) -> bool:
         """
-        Сохраняем данные об объектах в кэш, сериализуя модель через pydantic в формат json.
+        Проверяет, есть ли в кэше отметка о том, что по ключу ничего не найдено.
+        Отметки хранятся отдельно от обычных записей, под ключами с префиксом `neg:`.
         """
-        value = '[' + ','.join([obj.json() for obj in objs]) + ']'
-        key_for_redis = str(dict(name="Returning a list of objects",
-                                 class_name=objs[0].__class__,
-                                 parameters=parameters))
+        negative_key = build_negative_key(cache_key)
+        if self.local_cache.get(negative_key):
+            return True
+
+        ttl = await read_cache_within_deadline(self.redis.ttl(negative_key))
+        if ttl <= 0:
+            return False
+
+        self.local_cache.set(negative_key, True, ttl)
+        return True
 
-        await self.redis.set(key_for_redis, value, CACHE_EXPIRE_IN_SECONDS)
+    @resilient(REDIS, fallback=None)
+    async def _put_negative_to_cache(self, cache_key: str):
+        """Сохраняет отметку об отсутствии результата и удаляет устаревшую запись по этому ключу, если она была"""
+        negative_key = build_negative_key(cache_key)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.set(negative_key, 1, app_settings.cache_negative_ttl)
+            pipe.delete(cache_key)
+            _, deleted = await pipe.execute()
+        self.local_cache.delete(cache_key)
+        self.local_cache.set(negative_key, True, app_settings.cache_negative_ttl)
+        if deleted:
+            # Удаленная из Redis запись может оставаться в L1-кэше других воркеров
+            await publish_cache_invalidation(self.redis, [cache_key])
@@ -0,0 +1,250 @@
+import asyncio
+import functools
+import logging
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Callable
+
+from core.config import app_settings
+from services.deadline import DeadlineExceeded, has_time_for, is_expired
+from services.exceptions import CONNECTION_EXCEPTIONS
+
+logger = logging.getLogger(os.path.basename(__file__))
+
+REDIS = 'redis'
+ELASTIC = 'elastic'
+
+
+class CircuitOpenError(Exception):
+    """Обращение к хранилищу не выполнялось: его предохранитель разомкнут после серии сбоев"""
+
+    def __init__(self, dependency: str):
+        super().__init__(f'{dependency} is unavailable')
+        self.dependency = dependency
+
+
+class CircuitBreaker:
+    """
+    Предохранитель для обращений к одному хранилищу.
+    closed - запросы идут как обычно; после failure_threshold сбоев подряд переходит в open
+    и recovery_timeout секунд сразу отказывает. Затем half_open - пропускается один пробный запрос:
+    его успех замыкает предохранитель, сбой снова размыкает.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int, recovery_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self.rejected = 0
+
+    @property
+    def is_open(self) -> bool:
+        """Разомкнут ли предохранитель сейчас (без пробных запросов)"""
+        return self.state == self.OPEN and time.monotonic() - self.opened_at < self.recovery_timeout
+
+    def allow(self) -> bool:
+        """Можно ли выполнить запрос. В состоянии half_open разрешает только один пробный запрос"""
+        if self.state == self.OPEN:
+            if self.is_open:
+                self.rejected += 1
+                return False
+            self.state = self.HALF_OPEN
+
+        if self.state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                self.rejected += 1
+                return False
+            self._probe_in_flight = True
+        return True
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            logger.info(f'Circuit of {self.name} is closed')
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(f'Circuit of {self.name} is open for {self.recovery_timeout} s')
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """Запрос прерван без результата: пробный запрос можно повторить"""
+        self._probe_in_flight = False
+
+    def stats(self) -> dict:
+        return {'state': self.state, 'failures': self.failures, 'rejected': self.rejected}
+
+
+class RetryBudget:
+    """
+    Общий для всех хранилищ бюджет повторов: за последние window секунд повторов может быть
+    не больше ratio от числа запросов (но не меньше min_retries). Во время сбоя повторы
+    не умножают нагрузку на хранилище и не копят в воркере ожидающие корутины.
+    """
+
+    def __init__(self, ratio: float, min_retries: int, window: int):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        # Посекундные счетчики: [секунда, запросы, повторы]
+        self._buckets: deque[list[int]] = deque()
+        self.rejected = 0
+
+    def _current_bucket(self) -> list[int]:
+        now = int(time.monotonic())
+        while self._buckets and self._buckets[0][0] <= now - self.window:
+            self._buckets.popleft()
+        if not self._buckets or self._buckets[-1][0] != now:
+            self._buckets.append([now, 0, 0])
+        return self._buckets[-1]
+
+    def record_request(self):
+        self._current_bucket()[1] += 1
+
+    def try_spend(self) -> bool:
+        """Расходует один повтор из бюджета; False - бюджет исчерпан"""
+        bucket = self._current_bucket()
+        requests = sum(bucket[1] for bucket in self._buckets)
+        retries = sum(bucket[2] for bucket in self._buckets)
+        if retries >= max(self.min_retries, self.ratio * requests):
+            self.rejected += 1
+            return False
+        bucket[2] += 1
+        return True
+
+    def stats(self) -> dict:
+        self._current_bucket()
+        return {
+            'requests': sum(bucket[1] for bucket in self._buckets),
+            'retries': sum(bucket[2] for bucket in self._buckets),
+            'rejected': self.rejected,
+        }
+
+
+def get_retry_delay(attempt: int) -> float:
+    """Задержка перед повтором: экспоненциальная с ограничением и полным случайным разбросом (full jitter)"""
+    return random.uniform(0, min(app_settings.retry_max_delay, app_settings.retry_base_delay * 2 ** attempt))
+
+
+_missing = object()
+
+
+def _get_fallback(fallback: Any, args: tuple, kwargs: dict) -> Any:
+    return fallback(*args, **kwargs) if callable(fallback) else fallback
+
+
+def resilient(dependency: str, fallback: Any = _missing, max_tries: int | None = None) -> Callable:
+    """
+    Декоратор обращений к хранилищу dependency: при сбоях соединения запрос повторяется
+    с задержкой, пока не исчерпаны попытки, бюджет повторов или время запроса; при разомкнутом
+    предохранителе хранилище не вызывается. Предохранитель учитывает один сбой на вызов - после
+    последней попытки. Исчерпание бюджета времени запроса (DeadlineExceeded, в том числе таймаут,
+    вызванный дедлайном) сбоем хранилища не считается.
+    :param fallback: значение (или функция от аргументов вызова, которая его возвращает), которое
+    возвращается вместо ошибки, если хранилище недоступно - так обращения к кэшу просто пропускаются.
+    Без него - CircuitOpenError или исходная ошибка соединения
+    :param max_tries: число попыток, по умолчанию retry_max_tries
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            breaker = get_circuit_breaker(dependency)
+            retry_budget = get_retry_budget()
+            tries = max_tries or app_settings.retry_max_tries
+            retry_budget.record_request()
+
+            if not breaker.allow():
+                if fallback is not _missing:
+                    return _get_fallback(fallback, args, kwargs)
+                raise CircuitOpenError(dependency)
+
+            attempt = 0
+            while True:
+                try:
+                    result = await func(*args, **kwargs)
+                except DeadlineExceeded:
+                    breaker.release()
+                    if fallback is not _missing:
+                        return _get_fallback(fallback, args, kwargs)
+                    raise
+                except CONNECTION_EXCEPTIONS as error:
+                    if is_expired():
+                        breaker.release()
+                        if fallback is not _missing:
+                            return _get_fallback(fallback, args, kwargs)
+                        raise DeadlineExceeded() from error
+
+                    attempt += 1
+                    delay = get_retry_delay(attempt)
+                    if (attempt < tries and not breaker.is_open and has_time_for(delay)
+                            and retry_budget.try_spend()):
+                        try:
+                            await asyncio.sleep(delay)
+                        except BaseException:
+                            breaker.release()
+                            raise
+                        continue
+
+                    breaker.record_failure()
+                    if fallback is not _missing:
+                        logger.warning(f'{dependency} is unavailable, {func.__name__} skipped')
+                        return _get_fallback(fallback, args, kwargs)
+                    raise
+                except Exception:
+                    # Хранилище ответило (например, "не найдено") - соединение исправно
+                    breaker.record_success()
+                    raise
+                except BaseException:
+                    breaker.release()
+                    raise
+
+                breaker.record_success()
+                return result
+        return wrapper
+    return decorator
+
+
+circuit_breakers = {
+    dependency: CircuitBreaker(
+        dependency,
+        failure_threshold=app_settings.circuit_failure_threshold,
+        recovery_timeout=app_settings.circuit_recovery_timeout,
+    )
+    for dependency in (REDIS, ELASTIC)
+}
+
+retry_budget = RetryBudget(
+    ratio=app_settings.retry_budget_ratio,
+    min_retries=app_settings.retry_budget_min_retries,
+    window=app_settings.retry_budget_window,
+)
+
+
+def get_circuit_breaker(dependency: str) -> CircuitBreaker:
+    return circuit_breakers[dependency]
+
+
+def get_retry_budget() -> RetryBudget:
+    return retry_budget
+
+
+def get_resilience_stats() -> dict:
+    return {
+        'circuit_breakers': {dependency: breaker.stats() for dependency, breaker in circuit_breakers.items()},
+        'retry_budget': retry_budget.stats(),
+    }
@@ -0,0 +1,155 @@
+"""
+Офлайн-расчет похожих фильмов для рекомендаций в film_details.
+
+Похожесть двух фильмов - взвешенная сумма косинусных близостей по трем признакам:
+общие жанры, общие участники (режиссеры, актеры, сценаристы) и TF-IDF названия и описания.
+Для каждого фильма top-K самых похожих id сохраняются в его документе (поле similar_films).
+Матрица похожести считается векторно блоками строк, поэтому память ограничена block_size x число фильмов.
+
+Запускается после загрузки данных из директории src: python -m services.similar_films [--top-k K]
+"""
+import argparse
+import logging
+import math
+import os
+import re
+from collections import Counter
+
+import numpy as np
+from elasticsearch import Elasticsearch, helpers
+from redis import Redis
+
+from core.config import app_settings
+from db.connections import get_elastic_hosts
+from services.invalidation import publish_data_change
+
+logger = logging.getLogger(os.path.basename(__file__))
+
+MOVIES_INDEX = 'movies'
+PERSON_FIELDS = ('directors', 'actors', 'writers')
+# Веса признаков в итоговой похожести
+GENRE_WEIGHT = 1.0
+PERSON_WEIGHT = 1.0
+TEXT_WEIGHT = 1.0
+# Ограничение словаря TF-IDF: самые частые по числу документов слова
+TEXT_MAX_FEATURES = 5000
+BLOCK_SIZE = 1024
+TOKEN_RE = re.compile(r'\w{2,}')
+
+
+def build_binary_matrix(values: list[list[str]]) -> np.ndarray:
+    """Матрица вхождений (фильм x значение) с нормированными строками: произведение строк - косинусная близость"""
+    vocabulary = {value: i for i, value in enumerate(sorted({value for row in values for value in row}))}
+    matrix = np.zeros((len(values), len(vocabulary)), dtype=np.float32)
+    for i, row in enumerate(values):
+        matrix[i, [vocabulary[value] for value in row]] = 1.0
+    return _normalize_rows(matrix)
+
+
+def build_tfidf_matrix(texts: list[str], max_features: int = TEXT_MAX_FEATURES) -> np.ndarray:
+    """TF-IDF матрица (фильм x слово) с нормированными строками"""
+    tokens = [TOKEN_RE.findall(text.lower()) for text in texts]
+    document_frequency = Counter(token for row in tokens for token in set(row))
+    words = sorted(document_frequency, key=lambda word: (-document_frequency[word], word))[:max_features]
+    vocabulary = {word: i for i, word in enumerate(words)}
+
+    matrix = np.zeros((len(texts), len(vocabulary)), dtype=np.float32)
+    for i, row in enumerate(tokens):
+        for word, count in Counter(row).items():
+            if word in vocabulary:
+                matrix[i, vocabulary[word]] = count
+
+    idf = np.array([math.log((1 + len(texts)) / (1 + document_frequency[word])) + 1 for word in words],
+                   dtype=np.float32)
+    return _normalize_rows(matrix * idf)
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k_similar(features: list[tuple[np.ndarray, float]],
+                  top_k: int,
+                  block_size: int = BLOCK_SIZE) -> list[list[int]]:
+    """
+    Для каждой строки возвращает индексы top_k самых похожих строк (без нее самой), по убыванию похожести.
+    Строки без общих признаков в результат не попадают. При равной похожести порядок - по индексу,
+    поэтому результат детерминирован.
+    :param features: матрицы признаков с нормированными строками и их веса
+    """
+    size = features[0][0].shape[0]
+    result = []
+    for start in range(0, size, block_size):
+        stop = min(start + block_size, size)
+        scores = sum(weight * (matrix[start:stop] @ matrix.T) for matrix, weight in features)
+        scores[np.arange(stop - start), np.arange(start, stop)] = 0.0
+
+        k = min(top_k, size - 1)
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k] if k > 0 else np.empty((stop - start, 0), int)
+        for row, row_candidates in enumerate(candidates):
+            row_scores = scores[row, row_candidates]
+            order = np.lexsort((row_candidates, -row_scores))
+            result.append([int(row_candidates[i]) for i in order if row_scores[i] > 0])
+    return result
+
+
+class SimilarFilmsJob:
+    def __init__(self, elastic: Elasticsearch, redis: Redis, top_k: int):
+        self.elastic = elastic
+        self.redis = redis
+        self.top_k = top_k
+
+    def run(self) -> int:
+        """Считает похожие фильмы и сохраняет их в документы фильмов. Возвращает число обновленных фильмов"""
+        films = [
+            hit['_source'] for hit in helpers.scan(
+                self.elastic, index=MOVIES_INDEX, query={'query': {'match_all': {}}},
+                _source=['id', 'title', 'description', 'genre.id', *[f'{field}.id' for field in PERSON_FIELDS]],
+            )
+        ]
+        if not films:
+            logger.info('No films found, nothing to compute')
+            return 0
+        films.sort(key=lambda film: film['id'])
+
+        features = [
+            (build_binary_matrix([[genre['id'] for genre in film.get('genre') or []] for film in films]),
+             GENRE_WEIGHT),
+            (build_binary_matrix([
+                [person['id'] for field in PERSON_FIELDS for person in film.get(field) or []] for film in films
+            ]), PERSON_WEIGHT),
+            (build_tfidf_matrix([f'{film["title"]} {film.get("description") or ""}' for film in films]),
+             TEXT_WEIGHT),
+        ]
+        similar = top_k_similar(features, self.top_k)
+
+        # Индексы, созданные до появления поля, получают его в маппинг (mapping в режиме strict)
+        self.elastic.indices.put_mapping(
+            index=MOVIES_INDEX, body={'properties': {'similar_films': {'type': 'keyword'}}},
+        )
+        helpers.bulk(self.elastic, [
+            {
+                '_op_type': 'update',
+                '_index': MOVIES_INDEX,
+                '_id': film['id'],
+                'doc': {'similar_films': [films[i]['id'] for i in similar_indexes]},
+            }
+            for film, similar_indexes in zip(films, similar)
+        ])
+        publish_data_change(self.redis, MOVIES_INDEX)
+        logger.info(f'Similar films were computed for {len(films)} films')
+        return len(films)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Расчет похожих фильмов')
+    parser.add_argument('--top-k', type=int, default=app_settings.similar_films_top_k,
+                        help='сколько похожих фильмов сохранять для каждого фильма')
+    args = parser.parse_args()
+    SimilarFilmsJob(
+        Elasticsearch(hosts=get_elastic_hosts()),
+        Redis(host=app_settings.redis_host, port=app_settings.redis_port),
+        args.top_k,
+    ).run()
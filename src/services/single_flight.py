@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import Any, Awaitable, Callable
+
+from redis.asyncio import Redis
+
+from core.config import app_settings
+from services.deadline import (DeadlineExceeded, has_time_for, is_cache_read_allowed, read_cache_within_deadline,
+                               run_within_deadline)
+from services.exceptions import CONNECTION_EXCEPTIONS
+from services.resilience import REDIS, get_circuit_breaker
+
+logger = logging.getLogger(os.path.basename(__file__))
+
+LOCK_KEY_PREFIX = 'lock:'
+
+# Удаляет блокировку, только если она все еще принадлежит нам
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Ожидание значения, которое вычисляет другой воркер, не дало результата: значение нужно вычислить самим
+_NOT_COMPUTED = object()
+
+
+class SingleFlight:
+    """
+    Схлопывание одинаковых запросов при промахе кэша.
+    Внутри воркера по каждому ключу выполняется только одна корутина, остальные ждут её результат.
+    Между воркерами пересчет координируется короткой блокировкой в Redis:
+    воркер, не получивший блокировку, ждет появления значения в кэше.
+    """
+
+    def __init__(self, lock_ttl_ms: int, wait_timeout: float, poll_interval: float):
+        self.lock_ttl_ms = lock_ttl_ms
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._calls: dict[str, asyncio.Future] = {}
+        self.leaders = 0
+        self.collapsed_local = 0
+        self.collapsed_remote = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Выполняет func один раз на ключ для всех одновременно ожидающих корутин воркера"""
+        future = self._calls.get(key)
+        if future is not None:
+            self.collapsed_local += 1
+            return await run_within_deadline(asyncio.shield(future))
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        self.leaders += 1
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as error:
+            future.set_exception(error)
+            # Исключение получат ожидающие корутины, если они есть
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._calls.pop(key, None)
+
+    async def do_with_lock(self,
+                           redis: Redis,
+                           key: str,
+                           read_cache: Callable[[], Awaitable[Any]],
+                           compute: Callable[[], Awaitable[Any]],
+                           is_missing: Callable[[], Awaitable[bool]] | None = None) -> Any:
+        """
+        Выполняет compute под распределенной блокировкой.
+        Если блокировку держит другой воркер - ждет, пока он положит значение в кэш,
+        и возвращает результат read_cache. По истечении wait_timeout вычисляет значение сам.
+        Обращения к Redis за блокировкой ограничены бюджетом времени запроса так же, как чтение кэша.
+        :param is_missing: проверка отметки об отсутствии значения: если другой воркер ее сохранил,
+        ожидание завершается результатом None без повторного вычисления
+        """
+        return await self.do(key, lambda: self._compute_with_lock(redis, key, read_cache, compute, is_missing))
+
+    async def _compute_with_lock(self, redis, key, read_cache, compute, is_missing):
+        lock_key = LOCK_KEY_PREFIX + key
+        token = uuid.uuid4().hex
+
+        if get_circuit_breaker(REDIS).is_open or not is_cache_read_allowed():
+            # Redis недоступен или на обращение к нему не хватает бюджета времени:
+            # пересчеты схлопываются только внутри воркера
+            return await compute()
+
+        try:
+            acquired = await read_cache_within_deadline(redis.set(lock_key, token, nx=True, px=self.lock_ttl_ms))
+        except (DeadlineExceeded, *CONNECTION_EXCEPTIONS):
+            return await compute()
+
+        if not acquired:
+            result = await self._wait_for_other_worker(redis, lock_key, read_cache, is_missing)
+            if result is _NOT_COMPUTED:
+                return await compute()
+            self.collapsed_remote += 1
+            return result
+
+        try:
+            return await compute()
+        finally:
+            try:
+                await read_cache_within_deadline(redis.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token))
+            except (DeadlineExceeded, *CONNECTION_EXCEPTIONS):
+                logger.warning(f'Failed to release lock {lock_key}, it will expire in {self.lock_ttl_ms} ms')
+
+    async def _wait_for_other_worker(self, redis, lock_key, read_cache, is_missing):
+        """
+        Ждем, пока другой воркер пересчитает значение (или отметит его отсутствие),
+        либо пока не освободится блокировка
+        """
+        deadline = time.monotonic() + self.wait_timeout
+        try:
+            while time.monotonic() < deadline and has_time_for(self.poll_interval):
+                await asyncio.sleep(self.poll_interval)
+                result = await self._read_computed(read_cache, is_missing)
+                if result is not _NOT_COMPUTED:
+                    return result
+                if not await read_cache_within_deadline(redis.exists(lock_key)):
+                    return await self._read_computed(read_cache, is_missing)
+        except (DeadlineExceeded, *CONNECTION_EXCEPTIONS):
+            return _NOT_COMPUTED
+        return _NOT_COMPUTED
+
+    @staticmethod
+    async def _read_computed(read_cache, is_missing):
+        """Значение, вычисленное другим воркером: None - он отметил отсутствие значения"""
+        result = await read_cache()
+        if result is not None:
+            return result
+        if is_missing is not None and await is_missing():
+            return None
+        return _NOT_COMPUTED
+
+    def is_in_flight(self, key: str) -> bool:
+        return key in self._calls
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'in_flight': len(self._calls),
+            'leaders': self.leaders,
+            'collapsed_local': self.collapsed_local,
+            'collapsed_remote': self.collapsed_remote,
+        }
+
+
+single_flight = SingleFlight(
+    lock_ttl_ms=app_settings.single_flight_lock_ttl_ms,
+    wait_timeout=app_settings.single_flight_wait_timeout,
+    poll_interval=app_settings.single_flight_poll_interval,
+)
+
+
+def get_single_flight() -> SingleFlight:
+    return single_flight
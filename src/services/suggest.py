@@ -0,0 +1,86 @@
+import logging
+import os
+from functools import lru_cache
+from http import HTTPStatus
+
+from elasticsearch import AsyncElasticsearch
+from fastapi import Depends, HTTPException
+from redis.asyncio import Redis
+
+from core.config import app_settings
+from db.elastic import Indexes, get_elastic
+from db.redis import get_redis
+from models.models import Film, Person
+from services.exceptions import CONNECTION_EXCEPTIONS
+from services.proto_service import ProtoService
+from services.resilience import ELASTIC, CircuitOpenError, resilient
+from services.utils import _get_search_params
+
+logger = logging.getLogger(os.path.basename(__file__))
+
+# Разделы подсказок: индекс, поле с edge-ngram анализатором и поля, которые возвращаются клиенту
+SUGGEST_SECTIONS = {
+    'films': (Indexes.movies.value, 'title', ['id', 'title']),
+    'persons': (Indexes.persons.value, 'name', ['id', 'name']),
+}
+
+
+def _get_suggest_query_body(prefix: str, size: int, field: str, source: list[str]) -> dict:
+    '''запрос подсказок по префиксу: одно сопоставление с подполем suggest, где уже проиндексированы
+    все префиксы слов (edge-ngram), без вложенных запросов и нечеткого поиска.
+    timeout ограничивает время поиска на шардах: по его истечении возвращается то, что успели найти'''
+    return {
+        'size': size,
+        '_source': source,
+        'timeout': f'{app_settings.suggest_timeout_ms}ms',
+        'query': {'match': {f'{field}.suggest': {'query': prefix, 'operator': 'and'}}},
+    }
+
+
+class SuggestService(ProtoService):
+    async def suggest(self, prefix: str, size: int) -> dict[str, list[Film | Person]]:
+        """
+        Возвращает фильмы и персонажей, названия и имена которых начинаются с prefix (по словам).
+        Оба раздела запрашиваются одним msearch без повторов: если ElasticSearch не ответил
+        за бюджет времени, клиент получает ошибку 503 и сам повторит ввод, а не ждет ретраев.
+        """
+        body = []
+        for index_dict, field, source in SUGGEST_SECTIONS.values():
+            query_body = _get_suggest_query_body(prefix.strip(), size, field, source)
+            body.append({'index': index_dict['index_name'], **_get_search_params(query_body)})
+            body.append(query_body)
+
+        try:
+            response = await self._msearch(body)
+        except (CircuitOpenError, *CONNECTION_EXCEPTIONS):
+            logger.warning(f'Suggestions for "{prefix}" were not received in time')
+            raise HTTPException(status_code=HTTPStatus.SERVICE_UNAVAILABLE, detail='suggestions are unavailable')
+
+        results = {}
+        for (section, (index_dict, _, _)), search in zip(SUGGEST_SECTIONS.items(), response['responses']):
+            if 'error' in search:
+                logger.warning(f'Suggest in {section} failed: {search["error"]}')
+                results[section] = []
+                continue
+            results[section] = [index_dict['index_model'](**hit['_source']) for hit in search['hits']['hits']]
+        return results
+
+    @resilient(ELASTIC, max_tries=1)
+    async def _msearch(self, body: list[dict]) -> dict:
+        return await self.elastic.msearch(
+            body=body,
+            max_concurrent_searches=len(SUGGEST_SECTIONS),
+            request_timeout=app_settings.suggest_timeout_ms * 2 / 1000,
+        )
+
+
+@lru_cache()
+def get_suggest_service(
+        redis: Redis = Depends(get_redis),
+        elastic: AsyncElasticsearch = Depends(get_elastic),
+) -> SuggestService:
+    """
+    Провайдер SuggestService
+    Используем lru_cache-декоратор, чтобы создать объект сервиса в едином экземпляре (синглтона)
+    """
+    return SuggestService(redis, elastic)
@@ -1,8 +1,12 @@
+import hashlib
 import logging
 import os
 
+import orjson
+
 from constants import OptStrType
-from models.models import BaseNameModel, Person
+from core.config import app_settings
+from models.models import BaseNameModel, Genre, Person
 
 logger = logging.getLogger(os.path.basename(__file__))
 
@@ -10,22 +14,37 @@ logger = logging.getLogger(os.path.basename(__file__))
 async def _get_query_body(start_index: int,
                           page_size: int,
                           sort: OptStrType = None,
-                          genre: OptStrType = None,
+                          genre: str | list[str] | None = None,
                           query: OptStrType = None,
-                          person_id: OptStrType = None,
-                          model: BaseNameModel | None = None) -> dict:
-    '''функция для составления запроса поиска в elassticsearch
+                          model: BaseNameModel | None = None,
+                          search_after: list | None = None,
+                          tiebreaker: bool = False,
+                          min_rating: float | None = None,
+                          max_rating: float | None = None,
+                          source: list[str] | None = None) -> dict:
+    '''функция для составления запроса поиска в elassticsearch.
+    Ограничения, не влияющие на релевантность (жанры, рейтинг), попадают в bool.filter:
+    они не считают score и кэшируются в node query cache. Полнотекстовый поиск - в bool.must.
     :param start_index: номер записи с которой начинается выдача записей с ES
     :param page_size: размер станицы
-    :param genre: жанр, по которому фильтруется список фильмов
-    :param person_id: айди персонажа, по которому фильтруется список фильмов
-    :param sort: поле, по которому ссортируется список'''
+    :param genre: жанр или список жанров, по которым фильтруется список фильмов (подходит любой из них)
+    :param sort: поле, по которому ссортируется список
+    :param search_after: значения сортировки последней записи предыдущей страницы
+    :param tiebreaker: досортировать по id, чтобы порядок выдачи был однозначным (нужно для search_after)
+    :param min_rating: минимальный рейтинг фильма
+    :param max_rating: максимальный рейтинг фильма
+    :param source: поля документа, которые нужно вернуть (по умолчанию - весь документ)'''
 
     body = {
         'size': page_size,
         'from': start_index,
+        # Общее число найденных объектов страницам не нужно, оно считается отдельно и только по запросу
+        'track_total_hits': False,
     }
 
+    if source:
+        body['_source'] = source
+
     if sort:
         if sort.startswith('-'):
             sort = sort.replace('-', '')
@@ -33,135 +52,97 @@ async def _get_query_body(start_index: int,
         else:
             body['sort'] = [{sort: {'order': 'asc'}}]
 
+    if tiebreaker:
+        body['sort'] = [*body.get('sort', ['_score']), {'id': {'order': 'asc'}}]
+
+    if search_after:
+        body['from'] = 0
+        body['search_after'] = search_after
+
+    filters = []
     if genre:
-        if not body.get('query', None):
-            body['query'] = {}
-
-        # if isinstance(genre, list) and len(genre) > 1:
-        #     search_query = [{'term': {'genre.id': g}} for g in list(genre)]
-        # else:
-        #     search_query = {'term': {'genre.id': genre[0] if isinstance(genre, list) else genre}}
-
-        body['query']['nested'] = {
-            'path': 'genre',
-            # 'query': {*search_query} if isinstance(search_query, list) else **search_query,
-            'query': {'term': {'genre.id': genre}},
-            'inner_hits': {
+        genres = sorted(genre) if isinstance(genre, list) else [genre]
+        filters.append({'nested': {'path': 'genre', 'query': {'terms': {'genre.id': genres}}}})
+
+    if min_rating is not None or max_rating is not None:
+        rating_range = {}
+        if min_rating is not None:
+            rating_range['gte'] = min_rating
+        if max_rating is not None:
+            rating_range['lte'] = max_rating
+        filters.append({'range': {'imdb_rating': rating_range}})
+
+    must = []
+    if query and model in (Person, Genre):
+        must.append({
+            'multi_match': {
+                'query': query,
+                'fields': ['name'],
+                'fuzziness': 'AUTO'
             }
-        }
-
-    if person_id:
-        if not body.get('query', None):
-            body['query'] = {}
-
-        body = {
-            "query": {
-                'bool': {
-                    'should': [
-                        {"nested": {
-                            "path": "directors",
-                            "query": {
-                                "bool": {
-                                    "must": [
-                                        {"match": {"directors.id": person_id}},
-                                    ]
-                                }
-                            }
-                        }
-                        },
-                        {"nested": {
-                            "path": "actors",
-                            "query": {
-                                "bool": {
-                                    "must": [
-                                        {"match": {"actors.id": person_id}},
-                                    ]
-                                }
-                            }
-                        }
-                        },
-                        {"nested": {
-                            "path": "writers",
-                            "query": {
-                                "bool": {
-                                    "must": [
-                                        {"match": {"writers.id": person_id}},
-                                    ]
+        })
+
+    elif query:
+        must.append({
+            'bool': {
+                "should": [
+                    *[
+                        {
+                            "nested": {
+                                "path": f"{field}",
+                                "query": {
+                                    "multi_match": {
+                                        "query": query,
+                                        "fields": [f"{field}.name"]
+                                    }
                                 }
                             }
                         }
+                        for field in ["directors", "actors", "writers", 'genre']
+                    ],
+                    {
+                        "multi_match": {
+                            "query": query,
+                            "fields": ['title', 'name', 'description']
                         }
-                    ]
-                }
+                    }
+                ]
             }
-        }
-
-    # if person_id:  # TODO нужно доработать т.к. возвращает только первый фильм персонажа на эндпоинте /{person_id}/
-        # if not body.get('query', None):
-        #     body['query'] = {}
-        # body['query']['bool'] = {
-        #     'should': [
-        #         {
-        #             "nested": {
-        #                 "path": field,
-        #                 "query": {
-        #                     "bool": {
-        #                         "must": [
-        #                             {"match": {f"{field}.id": person_id}},
-        #                         ]
-        #                     }
-        #                 }
-        #             }
-        #         }
-        #         for field in ["directors", "actors", "writers"]
-        #     ],
-        # }
-
-    if query and model is Person:
-        if not body.get('query', None):
-            body['query'] = {}
-
-        body['query']['multi_match'] = {
-            'query': query,
-            'fields': ['title', 'name', 'actors.name', 'writers.name', 'directors.name', 'genre.name', 'description'],
-            'fuzziness': 'AUTO'
-        }
+        })
 
-    elif query:
-        if not body.get('query', None):
-            body['query'] = {}
+    if filters or must:
+        body['query'] = {'bool': {}}
+        if filters:
+            body['query']['bool']['filter'] = filters
+        if must:
+            body['query']['bool']['must'] = must
 
-        body['query']['bool'] = {
-            "should": [
-                *[
-                    {
-                        "nested": {
-                            "path": f"{field}",
-                            "query": {
-                                "multi_match": {
-                                    "query": query,
-                                    "fields": [f"{field}.name"]
-                                }
-                            }
-                        }
-                    }
-                    for field in ["directors", "actors", "writers", 'genre']
-                ],
-                {
-                    "multi_match": {
-                        "query": query,
-                        "fields": ['title', 'name', 'description']
-                    }
-                }
-            ]
-        }
+    return body
 
+
+def _get_count_query_body(query_body: dict) -> dict:
+    '''запрос числа объектов, подходящих под условие отбора запроса query_body.
+    Пагинация, сортировка и поля отбрасываются, поэтому запрос одинаков для всех страниц и сортировок.
+    Подсчет останавливается на пороге total_count_threshold, чтобы его цена не росла с размером индекса'''
+    body = {'size': 0, 'track_total_hits': app_settings.total_count_threshold}
+    if 'query' in query_body:
+        body['query'] = query_body['query']
     return body
 
 
+def _get_search_params(query_body: dict) -> dict:
+    '''параметры поиска, при которых повторные запросы обслуживаются кэшами ElasticSearch:
+    request_cache кэширует результат запроса на шарде, а preference, вычисленный из тела запроса,
+    направляет одинаковые запросы на одни и те же копии шардов, где этот кэш уже прогрет'''
+    if not app_settings.elastic_request_cache:
+        return {}
+    digest = hashlib.blake2b(orjson.dumps(query_body, option=orjson.OPT_SORT_KEYS), digest_size=8).hexdigest()
+    return {'request_cache': 'true', 'preference': digest}
+
+
 async def validation_index_model_field(sort_field: OptStrType, index_model) -> None:
-    """Проверяет, что указанное поле подходит для сортировки"""
-    if index_model and sort_field and sort_field not in index_model.__fields__.keys():
+    """Проверяет, что указанное поле (с необязательным "-" для сортировки по убыванию) подходит для сортировки"""
+    if index_model and sort_field and sort_field.removeprefix('-') not in index_model.__fields__.keys():
         return None
 
     return sort_field
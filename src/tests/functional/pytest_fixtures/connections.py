@@ -5,6 +5,7 @@ import pytest_asyncio
 from httpx import AsyncClient
 
 from elasticsearch import AsyncElasticsearch
+from redis.asyncio import Redis
 from main import app
 from tests.functional.settings import test_settings
 
@@ -20,6 +21,13 @@ async def es_client():
     await client.close()
 
 
+@pytest_asyncio.fixture(scope='session')
+async def redis_client():
+    client = Redis(host=test_settings.redis_host, port=test_settings.redis_port)
+    yield client
+    await client.close()
+
+
 @pytest_asyncio.fixture(scope='session')
 async def async_client():
     async with AsyncClient(app=app, base_url=test_settings.service_url) as client:
@@ -0,0 +1,65 @@
+from http import HTTPStatus
+
+import pytest
+
+from db.elastic import Indexes
+from models.models import Film, Genre
+from schemas.es_schemas import elastic_film_index_schema, elastic_genre_index_schema
+from services.cache_keys import get_cache_namespace
+from tests.functional.settings import test_settings
+
+
+@pytest.mark.parametrize(
+    'endpoint, es_index, es_index_schema, model, obj_id',
+    [
+        ('films', 'movies', elastic_film_index_schema, Film, '64afe9bc-6ea9-4843-8c5a-a76007614b45'),
+        ('genres', 'genres', elastic_genre_index_schema, Genre, 'cfaec163-d52b-4cc9-a791-35ccfdb7f7e0'),
+    ]
+)
+@pytest.mark.asyncio
+async def test_get_by_id_read_after_write_hits_cache(get_es_data, es_write_data, es_client, redis_client,
+                                                     get_request, endpoint, es_index, es_index_schema, model, obj_id):
+    """
+    Тест проверяет, что объект, сохраненный в кэш при первом запросе,
+    отдается из Redis при повторном запросе, даже если его уже нет в ElasticSearch
+    """
+    await redis_client.flushdb()
+    es_data = await get_es_data(es_index)
+    await es_write_data(es_index, es_data, es_index_schema)
+    url = test_settings.service_url + f'/api/v1/{endpoint}/{obj_id}'
+
+    first_response = await get_request(url)
+    assert first_response.status == HTTPStatus.OK
+    # Поколение данных индекса известно только воркеру API, поэтому ищем ключ по шаблону
+    assert await redis_client.keys(f'{get_cache_namespace(model)}:o*:{obj_id}')
+
+    await es_client.delete(index=es_index, id=obj_id, refresh=True)
+
+    second_response = await get_request(url)
+    assert second_response.status == HTTPStatus.OK
+    assert second_response.body['id'] == obj_id
+
+
+@pytest.mark.asyncio
+async def test_film_list_read_after_write_hits_cache(get_es_data, es_write_data, es_client, redis_client,
+                                                     get_request):
+    """
+    Тест проверяет, что список фильмов кэшируется под ключом, построенным из параметров запроса,
+    и повторный запрос не обращается в ElasticSearch
+    """
+    await redis_client.flushdb()
+    es_index = Indexes.movies.value.get('index_name')
+    es_data = await get_es_data(es_index)
+    await es_write_data(es_index, es_data, elastic_film_index_schema)
+    url = test_settings.service_url + '/api/v1/films'
+    query_params = {'page_number': 1, 'page_size': 5, 'sort': '-imdb_rating'}
+
+    first_response = await get_request(url, params=query_params)
+    assert first_response.status == HTTPStatus.OK
+    assert await redis_client.keys(f'{get_cache_namespace(Film)}:g*:list:*')
+
+    await es_client.indices.delete(index=es_index)
+
+    second_response = await get_request(url, params=query_params)
+    assert second_response.status == HTTPStatus.OK
+    assert second_response.body == first_response.body
@@ -1,5 +1,7 @@
+import base64
 from http import HTTPStatus
 
+import orjson
 import pytest
 
 from db.elastic import Indexes
@@ -44,6 +46,7 @@ async def test_get_film_detail(get_es_data, es_write_data, film_id, expected_ans
         ({'page_number': 1, 'sort': 'imdb_rating'}, {'status': HTTPStatus.OK, 'count': 10, 'rating_higher': False}),
         ({'sort': '-imdb_rating', 'genre': 'cfaec163-d52b-4cc9-a791-35ccfdb7f7e0'},
          {'status': HTTPStatus.OK, 'count': 5, 'rating_higher': True}),
+        ({'min_rating': 4, 'max_rating': 6}, {'status': HTTPStatus.OK, 'count': 4}),
         ({'page_number': '-1'}, {'status': HTTPStatus.UNPROCESSABLE_ENTITY}),
         ({'genre': 'Unknown'}, {'status': HTTPStatus.NOT_FOUND}),
     ]
@@ -70,3 +73,132 @@ async def test_get_film_list(get_es_data, es_write_data, expected_answer, query_
         assert bool(
             body[0]['imdb_rating'] >= body[1]['imdb_rating']
         ) is expected_answer['rating_higher']
+
+
+@pytest.mark.asyncio
+async def test_get_film_list_by_several_genres(get_es_data, es_write_data, get_request):
+    es_index = Indexes.movies.value.get('index_name')
+    es_film_data = await get_es_data(es_index)
+    await es_write_data(es_index=es_index, data=es_film_data, es_index_schema=elastic_film_index_schema)
+
+    url = test_settings.service_url + '/api/v1/films'
+    query_params = [
+        ('genre', 'cfaec163-d52b-4cc9-a791-35ccfdb7f7e0'),
+        ('genre', 'a9d2d0d9-eb66-459e-9923-949ad0219155'),
+    ]
+
+    response = await get_request(url, params=query_params)
+
+    assert response.status == HTTPStatus.OK
+    assert len(response.body) == 9
+
+
+@pytest.mark.parametrize(
+    'query_data, expected_answer',
+    [
+        ({}, {'status': HTTPStatus.OK, 'fields': {'id', 'title', 'imdb_rating'}}),
+        ({'fields': 'title'}, {'status': HTTPStatus.OK, 'fields': {'id', 'title'}}),
+        ({'fields': 'description'}, {'status': HTTPStatus.BAD_REQUEST}),
+    ]
+)
+@pytest.mark.asyncio
+async def test_get_film_list_fields(get_es_data, es_write_data, get_request, query_data, expected_answer):
+    es_index = Indexes.movies.value.get('index_name')
+    es_film_data = await get_es_data(es_index)
+    await es_write_data(es_index=es_index, data=es_film_data, es_index_schema=elastic_film_index_schema)
+
+    url = test_settings.service_url + '/api/v1/films'
+
+    response = await get_request(url, params=query_data)
+
+    assert response.status == expected_answer['status']
+
+    if response.status == HTTPStatus.OK:
+        assert all(set(film) == expected_answer['fields'] for film in response.body)
+
+
+@pytest.mark.asyncio
+async def test_get_film_list_by_cursor(get_es_data, es_write_data, get_request):
+    es_index = Indexes.movies.value.get('index_name')
+    es_film_data = await get_es_data(es_index)
+    await es_write_data(es_index=es_index, data=es_film_data, es_index_schema=elastic_film_index_schema)
+
+    url = test_settings.service_url + '/api/v1/films'
+    query_params = {'page_size': 3, 'sort': '-imdb_rating'}
+
+    film_ids = []
+    response = await get_request(url, params=query_params)
+    while True:
+        assert response.status == HTTPStatus.OK
+        film_ids.extend(film['id'] for film in response.body)
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            break
+        response = await get_request(url, params={**query_params, 'cursor': cursor})
+
+    assert len(film_ids) == len(es_film_data)
+    assert len(set(film_ids)) == len(film_ids)
+
+
+@pytest.mark.parametrize(
+    'query_data, expected_answer',
+    [
+        ({'page_size': 3, 'with_total': 'true'}, {'total': '10'}),
+        ({'genre': 'cfaec163-d52b-4cc9-a791-35ccfdb7f7e0', 'with_total': 'true'}, {'total': '5'}),
+        ({'page_size': 3}, {'total': None}),
+    ]
+)
+@pytest.mark.asyncio
+async def test_get_film_list_total_count(get_es_data, es_write_data, get_request, query_data, expected_answer):
+    es_index = Indexes.movies.value.get('index_name')
+    es_film_data = await get_es_data(es_index)
+    await es_write_data(es_index=es_index, data=es_film_data, es_index_schema=elastic_film_index_schema)
+
+    url = test_settings.service_url + '/api/v1/films'
+
+    response = await get_request(url, params=query_data)
+
+    assert response.status == HTTPStatus.OK
+    assert response.headers.get('X-Total-Count') == expected_answer['total']
+    if expected_answer['total'] is not None:
+        assert response.headers.get('X-Total-Count-Relation') == 'eq'
+
+
+@pytest.mark.parametrize(
+    'query_data',
+    [
+        {'cursor': 'invalid'},
+        {'page_number': 1000, 'page_size': 100},
+    ]
+)
+@pytest.mark.asyncio
+async def test_get_film_list_bad_pagination(get_request, query_data):
+    url = test_settings.service_url + '/api/v1/films'
+
+    response = await get_request(url, params=query_data)
+
+    assert response.status == HTTPStatus.BAD_REQUEST
+
+
+@pytest.mark.asyncio
+async def test_get_film_list_forged_cursor(get_es_data, es_write_data, get_request):
+    """
+    Тест проверяет, что курсор с подмененными значениями сортировки отклоняется как недействительный,
+    а page_size ограничен и при переходе по курсору
+    """
+    es_index = Indexes.movies.value.get('index_name')
+    es_film_data = await get_es_data(es_index)
+    await es_write_data(es_index=es_index, data=es_film_data, es_index_schema=elastic_film_index_schema)
+
+    url = test_settings.service_url + '/api/v1/films'
+    query_params = {'page_size': 3, 'sort': '-imdb_rating'}
+
+    response = await get_request(url, params=query_params)
+    cursor = orjson.loads(base64.urlsafe_b64decode(response.headers['X-Next-Cursor']))
+    forged_cursor = base64.urlsafe_b64encode(orjson.dumps({**cursor, 'a': ['not a rating', 'x']})).decode()
+
+    response = await get_request(url, params={**query_params, 'cursor': forged_cursor})
+    assert response.status == HTTPStatus.BAD_REQUEST
+
+    response = await get_request(url, params={**query_params, 'page_size': 100000, 'cursor': forged_cursor})
+    assert response.status == HTTPStatus.UNPROCESSABLE_ENTITY
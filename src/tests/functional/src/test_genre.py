@@ -4,7 +4,7 @@ import pytest
 from faker import Faker
 
 from db.elastic import Indexes
-from schemas.es_schemas import elastic_genre_index_schema
+from schemas.es_schemas import elastic_film_index_schema, elastic_genre_index_schema
 from tests.functional.settings import test_settings
 
 fake = Faker()
@@ -33,3 +33,21 @@ async def test_get_genre_by_id(get_es_data, es_write_data, genre, expected_answe
     if status == HTTPStatus.OK:
         assert body['id'] == genre['id']
         assert body['name'] == genre['name']
+
+
+@pytest.mark.asyncio
+async def test_get_genre_list(get_es_data, es_write_data, get_request):
+    es_index = Indexes.movies.value.get('index_name')
+    es_film_data = await get_es_data(es_index)
+    await es_write_data(es_index=es_index, data=es_film_data, es_index_schema=elastic_film_index_schema)
+    url = test_settings.service_url + '/api/v1/genres'
+
+    response = await get_request(url)
+    status = response.status
+    body = response.body
+
+    assert status == HTTPStatus.OK
+    assert len(body) == 6
+    assert body[0] == {'id': 'a9d2d0d9-eb66-459e-9923-949ad0219155', 'name': 'Comedy',
+                       'films_count': 6, 'avg_rating': pytest.approx(4.07, abs=0.01)}
+    assert [genre['films_count'] for genre in body] == sorted([genre['films_count'] for genre in body], reverse=True)
@@ -5,7 +5,7 @@ from http import HTTPStatus
 import pytest
 
 from db.elastic import Indexes
-from schemas.es_schemas import elastic_film_index_schema
+from schemas.es_schemas import elastic_film_index_schema, elastic_genre_index_schema, elastic_person_index_schema
 from tests.functional.settings import test_settings
 
 
@@ -39,3 +39,76 @@ async def test_search(es_write_data, get_es_data, query_data, expected_answer, g
 
     assert status == expected_answer['status']
     assert len(body) == expected_answer['count']
+
+
+@pytest.mark.parametrize(
+    'query_data, expected_answer',
+    [
+        ({'query': 'Melodrama', 'size': 2}, {'status': HTTPStatus.OK, 'films': 2, 'genres': 1}),
+        ({'query': 'David Martin'}, {'status': HTTPStatus.OK, 'person_id': '5bd7f73e-6648-4a4c-926a-13ec037c3fdf'}),
+        ({'query': 'Melodrama', 'size': 0}, {'status': HTTPStatus.UNPROCESSABLE_ENTITY}),
+    ]
+)
+@pytest.mark.asyncio
+async def test_multi_search(es_write_data, get_es_data, query_data, expected_answer, get_request):
+    for index, schema in [
+        (Indexes.movies, elastic_film_index_schema),
+        (Indexes.persons, elastic_person_index_schema),
+        (Indexes.genres, elastic_genre_index_schema),
+    ]:
+        es_index = index.value.get('index_name')
+        es_data = await get_es_data(es_index)
+        await es_write_data(es_index=es_index, data=es_data, es_index_schema=schema)
+
+    url = test_settings.service_url + '/api/v1/search'
+
+    response = await get_request(url, params=query_data)
+    status = response.status
+    body = response.body
+
+    assert status == expected_answer['status']
+
+    for section in ['films', 'genres']:
+        if section in expected_answer:
+            assert len(body[section]) == expected_answer[section]
+
+    if 'person_id' in expected_answer:
+        assert body['persons'][0]['id'] == expected_answer['person_id']
+
+
+@pytest.mark.parametrize(
+    'query_data, expected_answer',
+    [
+        ({'prefix': 'depl'}, {'status': HTTPStatus.OK, 'film_title': 'Deploy Strategic Mindshare'}),
+        ({'prefix': 'explo', 'size': 1}, {'status': HTTPStatus.OK, 'films': 1}),
+        ({'prefix': 'david mar'}, {'status': HTTPStatus.OK, 'person_id': '5bd7f73e-6648-4a4c-926a-13ec037c3fdf'}),
+        ({'prefix': 'zzz'}, {'status': HTTPStatus.OK, 'films': 0}),
+        ({'prefix': ''}, {'status': HTTPStatus.UNPROCESSABLE_ENTITY}),
+    ]
+)
+@pytest.mark.asyncio
+async def test_suggest(es_write_data, get_es_data, query_data, expected_answer, get_request):
+    for index, schema in [
+        (Indexes.movies, elastic_film_index_schema),
+        (Indexes.persons, elastic_person_index_schema),
+    ]:
+        es_index = index.value.get('index_name')
+        es_data = await get_es_data(es_index)
+        await es_write_data(es_index=es_index, data=es_data, es_index_schema=schema)
+
+    url = test_settings.service_url + '/api/v1/suggest'
+
+    response = await get_request(url, params=query_data)
+    status = response.status
+    body = response.body
+
+    assert status == expected_answer['status']
+
+    if 'films' in expected_answer:
+        assert len(body['films']) == expected_answer['films']
+
+    if 'film_title' in expected_answer:
+        assert body['films'][0]['title'] == expected_answer['film_title']
+
+    if 'person_id' in expected_answer:
+        assert body['persons'][0]['id'] == expected_answer['person_id']
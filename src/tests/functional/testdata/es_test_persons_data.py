@@ -1,42 +1,157 @@
 es_persons_data = [
     {
         "id": "5bd7f73e-6648-4a4c-926a-13ec037c3fdf",
-        "name": "David Martin"
+        "name": "David Martin",
+        "films": [
+            {
+                "id": "64afe9bc-6ea9-4843-8c5a-a76007614b45",
+                "title": "Deploy Strategic Mindshare",
+                "imdb_rating": 4.0,
+                "roles": [
+                    "director"
+                ]
+            },
+            {
+                "id": "598baf06-d300-4567-8ab5-1b11079691cf",
+                "title": "Implement Value-Added Users",
+                "imdb_rating": 7.8,
+                "roles": [
+                    "director"
+                ]
+            }
+        ]
     },
     {
         "id": "79dcd2f3-97d0-46df-bdff-63c36775288f",
-        "name": "Daniel Holden"
+        "name": "Daniel Holden",
+        "films": []
     },
     {
         "id": "a439c2b4-ee60-4eea-b3cc-221108f0c971",
-        "name": "Crystal Sandoval"
+        "name": "Crystal Sandoval",
+        "films": [
+            {
+                "id": "64afe9bc-6ea9-4843-8c5a-a76007614b45",
+                "title": "Deploy Strategic Mindshare",
+                "imdb_rating": 4.0,
+                "roles": [
+                    "director"
+                ]
+            }
+        ]
     },
     {
         "id": "6312de3c-0b94-4bb8-8d23-29771f491f8f",
-        "name": "Wendy Horton"
+        "name": "Wendy Horton",
+        "films": [
+            {
+                "id": "64afe9bc-6ea9-4843-8c5a-a76007614b45",
+                "title": "Deploy Strategic Mindshare",
+                "imdb_rating": 4.0,
+                "roles": [
+                    "director"
+                ]
+            }
+        ]
     },
     {
         "id": "addce89f-6972-4aed-b182-25f720f76ba8",
-        "name": "Allison Mullins"
+        "name": "Allison Mullins",
+        "films": [
+            {
+                "id": "64afe9bc-6ea9-4843-8c5a-a76007614b45",
+                "title": "Deploy Strategic Mindshare",
+                "imdb_rating": 4.0,
+                "roles": [
+                    "actor"
+                ]
+            },
+            {
+                "id": "ac62e8fc-d8f3-45bb-b86f-0611292c3c38",
+                "title": "Grow User-Centric E-Commerce",
+                "imdb_rating": 4.5,
+                "roles": [
+                    "actor"
+                ]
+            }
+        ]
     },
     {
         "id": "02dd3343-8521-4eb2-b8f3-ff8ae3c30a19",
-        "name": "Robert Molina"
+        "name": "Robert Molina",
+        "films": [
+            {
+                "id": "64afe9bc-6ea9-4843-8c5a-a76007614b45",
+                "title": "Deploy Strategic Mindshare",
+                "imdb_rating": 4.0,
+                "roles": [
+                    "actor"
+                ]
+            }
+        ]
     },
     {
         "id": "74c322eb-1faf-4c60-9789-736097a2b628",
-        "name": "Rachel Waters"
+        "name": "Rachel Waters",
+        "films": [
+            {
+                "id": "64afe9bc-6ea9-4843-8c5a-a76007614b45",
+                "title": "Deploy Strategic Mindshare",
+                "imdb_rating": 4.0,
+                "roles": [
+                    "actor"
+                ]
+            }
+        ]
     },
     {
         "id": "3b7b7557-a05f-4dd3-b731-e1a2db4a0c13",
-        "name": "Briana White"
+        "name": "Briana White",
+        "films": [
+            {
+                "id": "64afe9bc-6ea9-4843-8c5a-a76007614b45",
+                "title": "Deploy Strategic Mindshare",
+                "imdb_rating": 4.0,
+                "roles": [
+                    "actor"
+                ]
+            }
+        ]
     },
     {
         "id": "b7dfd2c5-59ce-47b1-9e36-b4c7622347b6",
-        "name": "Mrs. Sandra Ramos"
+        "name": "Mrs. Sandra Ramos",
+        "films": [
+            {
+                "id": "64afe9bc-6ea9-4843-8c5a-a76007614b45",
+                "title": "Deploy Strategic Mindshare",
+                "imdb_rating": 4.0,
+                "roles": [
+                    "actor"
+                ]
+            }
+        ]
     },
     {
         "id": "8b5898c1-bc14-4911-ba70-16c9f762aa37",
-        "name": "Robert Smith"
+        "name": "Robert Smith",
+        "films": [
+            {
+                "id": "64afe9bc-6ea9-4843-8c5a-a76007614b45",
+                "title": "Deploy Strategic Mindshare",
+                "imdb_rating": 4.0,
+                "roles": [
+                    "writer"
+                ]
+            },
+            {
+                "id": "d55646b8-f615-4cb1-8984-934ed0b20869",
+                "title": "Integrate Magnetic Convergence",
+                "imdb_rating": 2.0,
+                "roles": [
+                    "writer"
+                ]
+            }
+        ]
     }
 ]
@@ -0,0 +1,98 @@
+import pytest
+
+from services.local_cache import LocalCache
+from services.resilience import circuit_breakers, retry_budget
+from services.single_flight import SingleFlight
+
+
+class FakePipeline:
+    """Pipeline FakeRedis: команды копятся и выполняются при execute"""
+
+    def __init__(self, redis: 'FakeRedis'):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    async def execute(self):
+        return [await getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+
+
+class FakeRedis:
+    """Redis в памяти без учета ttl, с журналом вызовов; достаточно для тестов сервисов без Redis"""
+
+    def __init__(self):
+        self.data: dict[str, bytes] = {}
+        self.calls: list[tuple] = []
+        self.stream: list[dict] = []
+
+    async def get(self, key):
+        self.calls.append(('get', key))
+        return self.data.get(key)
+
+    async def mget(self, keys):
+        self.calls.append(('mget', tuple(keys)))
+        return [self.data.get(key) for key in keys]
+
+    async def set(self, key, value, ex=None, nx=False, px=None):
+        self.calls.append(('set', key))
+        if nx and key in self.data:
+            return None
+        self.data[key] = value if isinstance(value, bytes) else str(value).encode()
+        return True
+
+    async def delete(self, *keys):
+        self.calls.append(('delete', *keys))
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    async def exists(self, key):
+        return int(key in self.data)
+
+    async def ttl(self, key):
+        return 30 if key in self.data else -2
+
+    async def eval(self, script, numkeys, key, token):
+        if self.data.get(key) == token.encode():
+            del self.data[key]
+            return 1
+        return 0
+
+    async def publish(self, *args):
+        pass
+
+    async def xadd(self, name, fields, **kwargs):
+        self.stream.append(fields)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+@pytest.fixture
+def fake_redis() -> FakeRedis:
+    return FakeRedis()
+
+
+@pytest.fixture
+def local_cache() -> LocalCache:
+    return LocalCache(max_entries=1000, default_ttl=60)
+
+
+@pytest.fixture
+def single_flight() -> SingleFlight:
+    return SingleFlight(lock_ttl_ms=1000, wait_timeout=0.1, poll_interval=0.01)
+
+
+@pytest.fixture(autouse=True)
+def reset_resilience():
+    """Предохранители и бюджет повторов - глобальные, тесты не должны влиять друг на друга"""
+    for breaker in circuit_breakers.values():
+        breaker.__init__(breaker.name, breaker.failure_threshold, breaker.recovery_timeout)
+    retry_budget.__init__(retry_budget.ratio, retry_budget.min_retries, retry_budget.window)
+    yield
@@ -0,0 +1,30 @@
+import pytest
+
+from models.models import Film
+from services.cache_codecs import ENTRY_HEADER, MsgpackCodec, OrjsonCodec, decode_entry, encode_entry
+
+FILMS = [Film(id='1', title='Star', imdb_rating=8.5), Film(id='2', title='Wars')]
+
+
+@pytest.mark.parametrize('codec', [OrjsonCodec(), MsgpackCodec()], ids=lambda codec: codec.name)
+def test_entry_round_trip(codec):
+    """Тест проверяет, что запись кэша декодируется в те же объекты и тот же момент истечения soft_ttl"""
+    data = encode_entry(list[Film], FILMS, 123.5, codec=codec)
+
+    assert data[0] == codec.codec_id
+    assert decode_entry(list[Film], data) == (FILMS, 123.5)
+
+
+def test_entry_is_read_by_codec_it_was_written_with():
+    """Тест проверяет, что смена кодека не ломает чтение уже записанных значений"""
+    orjson_data = encode_entry(Film, FILMS[0], 1.0, codec=OrjsonCodec())
+    msgpack_data = encode_entry(Film, FILMS[0], 1.0, codec=MsgpackCodec())
+
+    assert orjson_data != msgpack_data
+    assert decode_entry(Film, orjson_data) == decode_entry(Film, msgpack_data) == (FILMS[0], 1.0)
+
+
+@pytest.mark.parametrize('data', [b'', b'["1", "Star", 8.5]', ENTRY_HEADER.pack(99, 1.0) + b'[]'])
+def test_unknown_entry_is_a_miss(data):
+    """Тест проверяет, что записи неизвестного формата (например, старые JSON без заголовка) считаются промахом"""
+    assert decode_entry(Film, data) is None
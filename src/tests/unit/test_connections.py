@@ -0,0 +1,68 @@
+import pytest
+from elasticsearch.connection_pool import ConnectionPool
+
+from db import connections
+from db.connections import LatencyAwareSelector, NodeStats
+
+
+class FakeConnection:
+    """Соединение с узлом ElasticSearch, у которого есть только статистика времени ответа"""
+
+    def __init__(self, host: str, latency: float | None = None):
+        self.host = host
+        self.node_stats = NodeStats(decay=0.5, ttl=60)
+        if latency is not None:
+            self.node_stats.record_latency(latency)
+
+
+def test_node_score_follows_latency_and_load():
+    """Тест проверяет, что оценка узла учитывает сглаженное время ответа и число выполняемых запросов"""
+    stats = NodeStats(decay=0.5, ttl=60)
+    assert stats.get_score() == 0
+
+    stats.record_latency(0.1)
+    stats.record_latency(0.3)
+    assert stats.get_score() == pytest.approx(0.2)
+
+    stats.in_flight = 2
+    assert stats.get_score() == pytest.approx(0.6)
+
+
+def test_node_score_resets_without_fresh_measurements(monkeypatch):
+    """Тест проверяет, что узел без свежих замеров получает нулевую оценку и снова получает запросы"""
+    now = 100.0
+    monkeypatch.setattr(connections.time, 'monotonic', lambda: now)
+    stats = NodeStats(decay=0.5, ttl=60)
+    stats.record_latency(1.0)
+    assert stats.get_score() == 1.0
+
+    now += 61
+    assert stats.get_score() == 0
+
+
+def test_selector_prefers_faster_node():
+    """Тест проверяет, что из двух узлов выбирается узел с меньшим временем ответа"""
+    fast, slow = FakeConnection('fast', latency=0.01), FakeConnection('slow', latency=0.5)
+    selector = LatencyAwareSelector({})
+
+    assert {selector.select([fast, slow]).host for _ in range(20)} == {'fast'}
+
+    # Загруженный быстрый узел уступает медленному
+    fast.node_stats.in_flight = 100
+    assert selector.select([fast, slow]) is slow
+
+
+def test_selector_skips_dead_node():
+    """Тест проверяет, что узел, отмеченный пулом недоступным, не выбирается даже при лучшей оценке"""
+    fast, slow, medium = FakeConnection('fast', 0.01), FakeConnection('slow', 0.5), FakeConnection('medium', 0.1)
+    pool = ConnectionPool(
+        [(fast, {}), (slow, {}), (medium, {})],
+        selector_class=LatencyAwareSelector,
+        dead_timeout=60,
+    )
+
+    pool.mark_dead(fast)
+
+    selected = {pool.get_connection().host for _ in range(20)}
+    assert 'fast' not in selected
+    assert 'medium' in selected
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from services import deadline
+from services.deadline import (DeadlineExceeded, deadline_scope, get_elastic_timeout_params, get_remaining,
+                               has_time_for, run_within_deadline)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    clock = FakeClock()
+    monkeypatch.setattr(deadline.time, 'monotonic', clock)
+    return clock
+
+
+def test_elastic_timeout_params_without_deadline():
+    """Тест проверяет, что без дедлайна таймауты запроса к ElasticSearch не ограничиваются"""
+    assert get_elastic_timeout_params() == {}
+
+
+def test_elastic_timeout_params_follow_remaining_budget(clock):
+    """Тест проверяет, что таймауты запроса к ElasticSearch рассчитываются из остатка бюджета"""
+    with deadline_scope(1):
+        clock.now += 0.5
+        assert get_elastic_timeout_params() == {'request_timeout': pytest.approx(0.5), 'timeout': '400ms'}
+        assert get_elastic_timeout_params(shard_timeout=False) == {'request_timeout': pytest.approx(0.5)}
+
+
+def test_elastic_timeout_params_near_deadline(clock):
+    """
+    Тест проверяет, что при почти исчерпанном бюджете таймаут шардов не меньше 1ms,
+    а при исчерпанном запрос к ElasticSearch не выполняется
+    """
+    with deadline_scope(1):
+        clock.now += 0.9995
+        params = get_elastic_timeout_params()
+        assert params['request_timeout'] == pytest.approx(0.0005)
+        assert params['timeout'] == '1ms'
+
+        clock.now += 0.0005
+        with pytest.raises(DeadlineExceeded):
+            get_elastic_timeout_params()
+
+
+def test_nested_deadline_is_not_later_than_outer(clock):
+    """Тест проверяет, что вложенный дедлайн не продлевает внешний, а по выходе из блока восстанавливается"""
+    with deadline_scope(1):
+        with deadline_scope(5):
+            assert get_remaining() == pytest.approx(1)
+            assert not has_time_for(2)
+        with deadline_scope(0.2):
+            assert get_remaining() == pytest.approx(0.2)
+        assert get_remaining() == pytest.approx(1)
+    assert get_remaining() is None
+
+
+@pytest.mark.asyncio
+async def test_run_within_deadline_cancels_slow_call():
+    """Тест проверяет, что ожидание ограничено долей остатка бюджета, а медленный вызов отменяется"""
+    cancelled = asyncio.Event()
+
+    async def slow_call():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with deadline_scope(0.1):
+        with pytest.raises(DeadlineExceeded):
+            await run_within_deadline(slow_call(), share=0.5)
+
+    assert cancelled.is_set()
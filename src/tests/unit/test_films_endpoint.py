@@ -0,0 +1,70 @@
+import pytest
+from fastapi import Response
+from fastapi.routing import serialize_response
+
+from api.v1.endpoints.films import FilmListProjectionSerializer, FilmListSerializer, film_details, film_list, router
+from api.v1.fields_params import FieldsParams
+from api.v1.paginate_params import PaginatedParams
+from api.v1.response_cache import PARTIAL_RESULTS_HEADER
+from models.models import Film, Page
+from services.resilience import CircuitOpenError
+
+
+class FakeFilmService:
+    """Сервис фильмов, у которого фильм есть (например, из last-known-good), а рекомендации недоступны"""
+
+    async def get_by_id(self, film_id: str, index_dict: dict) -> Film:
+        return Film(id=film_id, title='Star', imdb_rating=7.5, description='', genre=[], directors=[], actors=[],
+                    writers=[], similar_films=['2', '3'])
+
+    async def get_recommended_films(self, film: Film, count: int, source: list[str] | None = None) -> list[Film]:
+        raise CircuitOpenError('elastic')
+
+
+@pytest.mark.asyncio
+async def test_film_details_without_recommendations_when_elastic_is_down():
+    """
+    Тест проверяет, что при недоступности ElasticSearch фильм отдается без рекомендаций,
+    а ответ помечается как неполный, чтобы не попасть в кэш ответов
+    """
+    response = Response()
+    film = await film_details('1', response, film_service=FakeFilmService())
+
+    assert film.id == '1'
+    assert film.recommended_films == []
+    assert response.headers[PARTIAL_RESULTS_HEADER] == 'true'
+
+
+class FakeFilmListService:
+    """Сервис фильмов, который отдает одну страницу из одного фильма"""
+
+    async def get_page_film(self, *args, **kwargs) -> Page[Film]:
+        film = Film(id='1', title='Star', imdb_rating=7.5, description='', genre=[], directors=[], actors=[],
+                    writers=[])
+        return Page[Film](items=[film])
+
+
+async def get_film_list_body(fields: str | None) -> tuple[list, list[dict]]:
+    """Вызывает film_list и сериализует результат по схеме ответа маршрута"""
+    route = next(route for route in router.routes if route.path == '')
+    films = await film_list(Response(), paginated=PaginatedParams(page_size=10, page_number=1),
+                            fields_params=FieldsParams(fields), film_service=FakeFilmListService())
+    return films, await serialize_response(field=route.response_field, response_content=films, exclude_unset=True)
+
+
+@pytest.mark.asyncio
+async def test_film_list_without_fields_uses_strict_serializer():
+    """Тест проверяет, что без параметра fields список фильмов отдается полным сериализатором со всеми полями"""
+    films, body = await get_film_list_body(None)
+
+    assert all(isinstance(film, FilmListSerializer) for film in films)
+    assert body == [{'id': '1', 'title': 'Star', 'imdb_rating': 7.5}]
+
+
+@pytest.mark.asyncio
+async def test_film_list_with_fields_returns_projection():
+    """Тест проверяет, что с параметром fields в ответ попадают только запрошенные и обязательные поля"""
+    films, body = await get_film_list_body('title')
+
+    assert all(isinstance(film, FilmListProjectionSerializer) for film in films)
+    assert body == [{'id': '1', 'title': 'Star'}]
@@ -0,0 +1,94 @@
+import asyncio
+
+import orjson
+import pytest
+
+from models.models import Film, Page
+from services.cache_keys import build_list_key
+from services.generations import CacheGenerations
+from services.invalidation import DATA_EVENTS_STREAM, apply_data_event, listen_data_events
+from services.local_cache import LocalCache
+from services.proto_service import ProtoService
+
+
+def build_event(index_name: str, generation: int) -> dict[bytes, bytes]:
+    return {
+        b'index': index_name.encode(),
+        b'generation': str(generation).encode(),
+        b'objects_generation': b'0',
+        b'ids': orjson.dumps(None),
+    }
+
+
+class FakeStreamRedis:
+    """Redis с потоком событий: xread отдает подготовленные ответы, а когда они закончились - останавливает чтение"""
+
+    def __init__(self, last_event_id: bytes | None, responses: list):
+        self.last_event_id = last_event_id
+        self.responses = responses
+        self.read_from: list[str] = []
+
+    async def xrevrange(self, stream, count=None):
+        return [(self.last_event_id, {})] if self.last_event_id else []
+
+    async def hgetall(self, key):
+        return {b'movies': b'1'}
+
+    async def xread(self, streams, block=None):
+        self.read_from.append(streams[DATA_EVENTS_STREAM])
+        if not self.responses:
+            raise asyncio.CancelledError()
+        return self.responses.pop(0)
+
+
+@pytest.mark.asyncio
+async def test_events_published_during_generations_load_are_applied():
+    """
+    Тест проверяет, что чтение потока начинается с события, последнего на момент до загрузки поколений,
+    и событие, опубликованное во время загрузки, применяется
+    """
+    redis = FakeStreamRedis(b'1-0', [[(DATA_EVENTS_STREAM, [(b'2-0', build_event('movies', 2))])]])
+    generations = CacheGenerations()
+
+    with pytest.raises(asyncio.CancelledError):
+        await listen_data_events(redis, generations, LocalCache(max_entries=10, default_ttl=60))
+
+    assert redis.read_from == [b'1-0', b'2-0']
+    assert generations.get('movies') == 2
+
+
+@pytest.mark.asyncio
+async def test_malformed_event_is_skipped():
+    """Тест проверяет, что событие, которое не удалось применить, пропускается, а чтение потока продолжается"""
+    redis = FakeStreamRedis(None, [
+        [(DATA_EVENTS_STREAM, [(b'1-0', {b'index': b'movies'}), (b'2-0', build_event('movies', 3))])],
+    ])
+    generations = CacheGenerations()
+
+    with pytest.raises(asyncio.CancelledError):
+        await listen_data_events(redis, generations, LocalCache(max_entries=10, default_ttl=60))
+
+    assert redis.read_from == ['0-0', b'2-0']
+    assert generations.get('movies') == 3
+
+
+@pytest.mark.asyncio
+async def test_negative_marker_invalidates_l1_of_other_workers(fake_redis, local_cache, single_flight):
+    """
+    Тест проверяет, что запись, которую воркер заменил в Redis отметкой об отсутствии,
+    удаляется и из L1-кэша остальных воркеров
+    """
+    service = ProtoService(fake_redis, elastic=None, local_cache=local_cache, single_flight=single_flight)
+    cache_key = build_list_key(Film, query='star')
+    await service._put_objs_to_cache(cache_key, Film, Page(items=[Film(id='1', title='Star')]))
+    other_worker_cache = LocalCache(max_entries=10, default_ttl=60)
+    other_worker_cache.set(cache_key, Page(items=[Film(id='1', title='Star')]))
+
+    await service._put_negative_to_cache(cache_key)
+    await service._put_negative_to_cache(cache_key)
+    for event in fake_redis.stream:
+        apply_data_event({name.encode(): value for name, value in event.items()}, CacheGenerations(),
+                         other_worker_cache)
+
+    assert len(fake_redis.stream) == 1
+    assert other_worker_cache.get(cache_key) is None
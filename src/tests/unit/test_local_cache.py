@@ -0,0 +1,45 @@
+import pytest
+
+from services import local_cache as local_cache_module
+from services.local_cache import LocalCache
+
+
+def test_least_recently_used_entry_is_evicted():
+    """Тест проверяет, что при переполнении вытесняется запись, которую дольше всех не читали"""
+    cache = LocalCache(max_entries=2, default_ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_entry_expires_after_ttl(monkeypatch):
+    """Тест проверяет, что запись живет не дольше своего ttl"""
+    now = 100.0
+    monkeypatch.setattr(local_cache_module.time, 'monotonic', lambda: now)
+    cache = LocalCache(max_entries=10, default_ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2, ttl=5)
+
+    now += 10
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+
+    now += 60
+    assert cache.get('a') is None
+    assert cache.stats() == pytest.approx({
+        'entries': 0, 'max_entries': 10, 'hits': 1, 'misses': 2, 'evictions': 0, 'hit_ratio': 0.3333,
+    })
+
+
+def test_disabled_cache_stores_nothing():
+    """Тест проверяет, что при max_entries=0 L1 кэш отключен"""
+    cache = LocalCache(max_entries=0, default_ttl=60)
+    cache.set('a', 1)
+    assert cache.get('a') is None
@@ -0,0 +1,67 @@
+import pytest
+
+from services.popularity import POPULARITY_KEY_PREFIX, PopularityTracker
+
+
+class FakeSortedSetRedis:
+    def __init__(self):
+        self.zsets: dict[str, dict[str, float]] = {}
+
+    def pipeline(self, transaction=True):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    def zincrby(self, key, amount, member):
+        zset = self.zsets.setdefault(key, {})
+        zset[member] = zset.get(member, 0) + amount
+
+    def zremrangebyrank(self, key, start, stop):
+        pass
+
+    def expire(self, key, ttl):
+        pass
+
+    async def execute(self):
+        pass
+
+
+def test_counter_is_capped():
+    """Тест проверяет, что число объектов в памяти ограничено, а при заполнении вытесняются редкие"""
+    tracker = PopularityTracker(max_tracked=3, retention=60)
+    for obj_id in ('popular', 'popular', 'rare-1', 'rare-2'):
+        tracker.record('film', obj_id)
+
+    tracker.record('film', 'new')
+    tracker.record('film', 'popular')
+
+    assert tracker._counts['film'] == {'popular': 3, 'new': 1}
+
+
+def test_new_objects_are_ignored_when_counter_is_full_of_popular():
+    """Тест проверяет, что заполненный часто запрашиваемыми объектами счетчик не принимает новые"""
+    tracker = PopularityTracker(max_tracked=2, retention=60)
+    for obj_id in ('a', 'a', 'b', 'b'):
+        tracker.record('film', obj_id)
+
+    tracker.record('film', 'random-uuid')
+
+    assert tracker._counts['film'] == {'a': 2, 'b': 2}
+
+
+@pytest.mark.asyncio
+async def test_flush_moves_counts_to_redis():
+    """Тест проверяет, что сброс переносит счетчики в Redis и очищает их в памяти"""
+    tracker = PopularityTracker(max_tracked=10, retention=60)
+    redis = FakeSortedSetRedis()
+    tracker.record('film', 'a')
+    tracker.record('film', 'a')
+
+    await tracker.flush(redis)
+
+    assert redis.zsets == {POPULARITY_KEY_PREFIX + 'film': {'a': 2}}
+    assert tracker._counts == {}
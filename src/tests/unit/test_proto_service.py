@@ -0,0 +1,254 @@
+import asyncio
+import time
+from http import HTTPStatus
+
+import pytest
+from elasticsearch import NotFoundError
+from fastapi import HTTPException
+
+from db.elastic import Indexes
+from models.models import Film, Page
+from services import proto_service
+from services.cache_codecs import encode_entry
+from services.cache_keys import build_last_good_key, build_list_key, build_negative_key, build_obj_key
+from services.cache_policy import CachePolicy
+from services.deadline import DeadlineExceeded
+from services.local_cache import LocalCache
+from services.proto_service import ProtoService, _background_tasks
+from services.single_flight import SingleFlight
+
+
+@pytest.fixture
+def service(fake_redis, local_cache, single_flight) -> ProtoService:
+    return ProtoService(fake_redis, elastic=None, local_cache=local_cache, single_flight=single_flight)
+
+
+@pytest.mark.asyncio
+async def test_empty_partial_page_is_not_cached_as_missing(service, fake_redis):
+    """
+    Тест проверяет, что пустая страница, которую ElasticSearch вернул по таймауту,
+    не превращается в отметку об отсутствии и не удаляет закэшированную страницу
+    """
+    cache_key = build_list_key(Film, query='star')
+    await service._put_objs_to_cache(cache_key, Film, Page(items=[Film(id='1', title='Star')]))
+
+    async def load_from_elastic():
+        return Page(items=[], partial=True)
+
+    with pytest.raises(DeadlineExceeded):
+        await service._load_or_mark_missing(
+            cache_key, lambda: service._load_objs_to_cache(cache_key, Film, load_from_elastic),
+        )
+
+    assert cache_key in fake_redis.data
+    assert build_negative_key(cache_key) not in fake_redis.data
+
+
+@pytest.mark.asyncio
+async def test_partial_page_is_returned_but_not_cached(service, fake_redis):
+    """Тест проверяет, что неполная непустая страница отдается клиенту, но в кэш не сохраняется"""
+    cache_key = build_list_key(Film, query='star')
+
+    async def load_from_elastic():
+        return Page(items=[Film(id='1', title='Star')], partial=True)
+
+    page = await service._get_list_with_cache(cache_key, Film, load_from_elastic)
+
+    assert page.partial and page.items
+    assert cache_key not in fake_redis.data
+
+
+@pytest.mark.asyncio
+async def test_empty_complete_page_is_cached_as_missing(service, fake_redis):
+    """Тест проверяет, что полный пустой результат запоминается отметкой об отсутствии"""
+    cache_key = build_list_key(Film, query='nothing')
+
+    async def load_from_elastic():
+        return Page(items=[])
+
+    assert await service._get_list_with_cache(cache_key, Film, load_from_elastic) is None
+    assert build_negative_key(cache_key) in fake_redis.data
+
+
+class FakeElastic:
+    """ElasticSearch, который отдает фильмы через get и mget и считает запросы"""
+
+    def __init__(self, films: dict[str, Film]):
+        self.films = films
+        self.get_calls = 0
+        self.mget_calls = 0
+
+    async def get(self, index, id, **kwargs):
+        self.get_calls += 1
+        await asyncio.sleep(0.01)
+        if id not in self.films:
+            raise NotFoundError(HTTPStatus.NOT_FOUND, 'not_found', {})
+        return {'_id': id, 'found': True, '_source': self.films[id].model_dump()}
+
+    async def mget(self, index, body, **kwargs):
+        self.mget_calls += 1
+        await asyncio.sleep(0.01)
+        return {'docs': [
+            {'_id': obj_id, 'found': True, '_source': self.films[obj_id].model_dump()}
+            for obj_id in body['ids'] if obj_id in self.films
+        ]}
+
+
+@pytest.mark.asyncio
+async def test_stale_object_is_served_and_refreshed_in_background(fake_redis, local_cache, single_flight, monkeypatch):
+    """
+    Тест проверяет, что устаревшее значение отдается сразу, а обновляется в фоне
+    одним запросом в ElasticSearch на все одновременные запросы
+    """
+    # soft_ttl в прошлом: любая запись в кэше сразу считается устаревшей
+    monkeypatch.setattr(proto_service, 'get_cache_policy',
+                        lambda model: CachePolicy(soft_ttl=-1, grace=60, local_ttl=60))
+    elastic = FakeElastic({'1': Film(id='1', title='New')})
+    service = ProtoService(fake_redis, elastic, local_cache=local_cache, single_flight=single_flight)
+    await service._put_obj_to_cache(build_obj_key(Film, '1'), Film(id='1', title='Old'))
+
+    films = await asyncio.gather(*[service.get_by_id('1', Indexes.movies.value) for _ in range(5)])
+    await asyncio.gather(*_background_tasks)
+
+    assert {film.title for film in films} == {'Old'}
+    assert elastic.get_calls == 1
+    assert (await service.get_by_id('1', Indexes.movies.value)).title == 'New'
+    await asyncio.gather(*_background_tasks)
+
+
+@pytest.mark.asyncio
+async def test_unknown_id_is_cached_as_missing(fake_redis, local_cache, single_flight):
+    """Тест проверяет, что отсутствие объекта запоминается и повторный запрос не идет в ElasticSearch"""
+    elastic = FakeElastic({})
+    service = ProtoService(fake_redis, elastic, local_cache=local_cache, single_flight=single_flight)
+
+    for _ in range(2):
+        with pytest.raises(HTTPException) as error:
+            await service.get_by_id('unknown', Indexes.movies.value)
+        assert error.value.status_code == HTTPStatus.NOT_FOUND
+        # Отметка читается и из Redis, а не только из L1 кэша воркера
+        local_cache.clear()
+
+    assert build_negative_key(build_obj_key(Film, 'unknown')) in fake_redis.data
+    assert elastic.get_calls == 1
+
+
+@pytest.mark.asyncio
+async def test_unknown_id_is_loaded_once_across_workers(fake_redis):
+    """
+    Тест проверяет, что воркер, ожидающий чужой загрузки неизвестного id, получает отметку
+    об отсутствии объекта и не идет в ElasticSearch сам
+    """
+    elastic = FakeElastic({})
+    workers = [
+        ProtoService(fake_redis, elastic, local_cache=LocalCache(max_entries=10, default_ttl=60),
+                     single_flight=SingleFlight(lock_ttl_ms=1000, wait_timeout=0.1, poll_interval=0.01))
+        for _ in range(2)
+    ]
+
+    results = await asyncio.gather(
+        *[worker.get_by_id('unknown', Indexes.movies.value) for worker in workers], return_exceptions=True,
+    )
+
+    assert [error.status_code for error in results] == [HTTPStatus.NOT_FOUND] * 2
+    assert elastic.get_calls == 1
+
+
+@pytest.mark.asyncio
+async def test_stale_objects_are_refreshed_once(fake_redis, local_cache, single_flight):
+    """
+    Тест проверяет, что одновременные запросы одних и тех же устаревших объектов
+    отдают их сразу и обновляют в фоне одним запросом в ElasticSearch
+    """
+    films = {obj_id: Film(id=obj_id, title=obj_id) for obj_id in ('1', '2', '3')}
+    elastic = FakeElastic(films)
+    service = ProtoService(fake_redis, elastic, local_cache=local_cache, single_flight=single_flight)
+    for obj_id, film in films.items():
+        fake_redis.data[build_obj_key(Film, obj_id)] = encode_entry(Film, film, soft_expires_at=time.time() - 1)
+
+    results = await asyncio.gather(*[service.get_many(list(films), Indexes.movies.value) for _ in range(5)])
+    await asyncio.gather(*_background_tasks)
+
+    assert all([film.id for film in result] == list(films) for result in results)
+    assert elastic.mget_calls == 1
+
+
+@pytest.mark.asyncio
+async def test_last_good_is_kept_only_for_bounded_keys(service, fake_redis):
+    """
+    Тест проверяет, что последнее удачное значение хранится для объектов и первых страниц без поиска,
+    но не для страниц поиска, число которых растет с числом разных запросов
+    """
+    film = Film(id='1', title='Star')
+    first_page_key = build_list_key(Film, start_index=0)
+    search_page_key = build_list_key(Film, start_index=0, query='star')
+
+    await service._put_obj_to_cache(build_obj_key(Film, film.id), film)
+    await service._put_objs_to_cache(first_page_key, Film, Page(items=[film]), keep_last_good=True)
+    await service._put_objs_to_cache(search_page_key, Film, Page(items=[film]))
+
+    assert build_last_good_key(build_obj_key(Film, film.id)) in fake_redis.data
+    assert build_last_good_key(first_page_key) in fake_redis.data
+    assert build_last_good_key(search_page_key) not in fake_redis.data
+
+
+class FakeSearchElastic:
+    """ElasticSearch с поиском в срезе индекса (point in time), который запоминает открытые и закрытые срезы"""
+
+    def __init__(self, films: list[Film], search_error: Exception | None = None):
+        self.films = films
+        self.search_error = search_error
+        self.opened_pits: list[str] = []
+        self.closed_pits: list[str] = []
+        self.transport = self
+
+    async def perform_request(self, method, url, params=None, body=None):
+        if method == 'POST':
+            self.opened_pits.append(f'pit-{len(self.opened_pits)}')
+            return {'id': self.opened_pits[-1]}
+        self.closed_pits.append(body['id'])
+        return {'succeeded': True}
+
+    async def search(self, body, **kwargs):
+        if self.search_error:
+            raise self.search_error
+        ids = [film.id for film in self.films]
+        start = ids.index(body['search_after'][0]) + 1 if 'search_after' in body else 0
+        hits = [{'_source': film.model_dump(), 'sort': [film.id]} for film in self.films[start:start + body['size']]]
+        return {'hits': {'hits': hits}, 'pit_id': body['pit']['id']}
+
+
+@pytest.mark.asyncio
+async def test_point_in_time_is_closed_on_last_page(fake_redis, local_cache, single_flight):
+    """
+    Тест проверяет, что срез индекса открывается один раз на выдачу, передается дальше в странице
+    и закрывается, когда выдача закончилась
+    """
+    elastic = FakeSearchElastic([Film(id=str(i), title=str(i)) for i in range(3)])
+    service = ProtoService(fake_redis, elastic, local_cache=local_cache, single_flight=single_flight)
+
+    first_page = await service._search_page('movies', {'size': 2, 'sort': [{'id': 'asc'}]}, Film, use_pit=True)
+    assert first_page.pit_id == 'pit-0'
+    assert first_page.search_after == ['1']
+
+    query_body = {'size': 2, 'sort': [{'id': 'asc'}], 'search_after': first_page.search_after}
+    last_page = await service._search_page('movies', query_body, Film, pit_id=first_page.pit_id, use_pit=True)
+    await asyncio.gather(*_background_tasks)
+
+    assert [film.id for film in last_page.items] == ['2']
+    assert last_page.search_after is None
+    assert last_page.pit_id is None
+    assert elastic.opened_pits == elastic.closed_pits == ['pit-0']
+
+
+@pytest.mark.asyncio
+async def test_point_in_time_is_closed_when_search_fails(fake_redis, local_cache, single_flight):
+    """Тест проверяет, что срез, открытый для запроса, закрывается, если поиск в нем не удался"""
+    elastic = FakeSearchElastic([], search_error=ValueError())
+    service = ProtoService(fake_redis, elastic, local_cache=local_cache, single_flight=single_flight)
+
+    with pytest.raises(ValueError):
+        await service._search_page('movies', {'size': 2, 'sort': [{'id': 'asc'}]}, Film, use_pit=True)
+    await asyncio.gather(*_background_tasks)
+
+    assert elastic.opened_pits == elastic.closed_pits == ['pit-0']
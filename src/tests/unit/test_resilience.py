@@ -0,0 +1,125 @@
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from services import resilience
+from services.resilience import REDIS, CircuitBreaker, CircuitOpenError, RetryBudget, get_circuit_breaker, resilient
+
+
+def test_circuit_breaker_opens_and_recovers(monkeypatch):
+    """
+    Тест проверяет переходы предохранителя: closed -> open после серии сбоев,
+    half_open с одним пробным запросом по истечении recovery_timeout и closed после его успеха
+    """
+    now = 100.0
+    monkeypatch.setattr(resilience.time, 'monotonic', lambda: now)
+    breaker = CircuitBreaker('elastic', failure_threshold=2, recovery_timeout=10)
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.is_open
+    assert not breaker.allow()
+
+    now += 10
+    assert not breaker.is_open
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Пока пробный запрос не завершен, остальные отклоняются
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+    assert breaker.rejected == 2
+
+
+def test_circuit_breaker_reopens_after_failed_probe(monkeypatch):
+    """Тест проверяет, что сбой пробного запроса снова размыкает предохранитель на recovery_timeout"""
+    now = 100.0
+    monkeypatch.setattr(resilience.time, 'monotonic', lambda: now)
+    breaker = CircuitBreaker('elastic', failure_threshold=1, recovery_timeout=10)
+
+    breaker.record_failure()
+    now += 10
+    assert breaker.allow()
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_retry_budget_is_exhausted():
+    """Тест проверяет, что повторы сверх min_retries и доли ratio от числа запросов не разрешаются"""
+    budget = RetryBudget(ratio=0.1, min_retries=2, window=10)
+    for _ in range(30):
+        budget.record_request()
+
+    assert [budget.try_spend() for _ in range(4)] == [True, True, True, False]
+    assert budget.stats() == {'requests': 30, 'retries': 3, 'rejected': 1}
+
+
+@pytest.mark.asyncio
+async def test_resilient_retries_and_falls_back(monkeypatch):
+    """
+    Тест проверяет, что декоратор повторяет запрос при сбое соединения, а когда попытки
+    исчерпаны - возвращает fallback; предохранитель учитывает один сбой на вызов, и после серии
+    неудачных вызовов хранилище больше не вызывается
+    """
+    monkeypatch.setattr(resilience, 'get_retry_delay', lambda attempt: 0)
+    breaker = get_circuit_breaker(REDIS)
+    calls = []
+
+    @resilient(REDIS, fallback=None, max_tries=3)
+    async def get_value():
+        calls.append(1)
+        raise RedisConnectionError()
+
+    assert await get_value() is None
+    assert len(calls) == 3
+    assert breaker.failures == 1
+
+    for _ in range(breaker.failure_threshold - 1):
+        await get_value()
+    assert breaker.is_open
+    assert len(calls) == 3 * breaker.failure_threshold
+    assert await get_value() is None
+    assert len(calls) == 3 * breaker.failure_threshold
+
+
+@pytest.mark.asyncio
+async def test_resilient_raises_circuit_open_without_fallback(monkeypatch):
+    """Тест проверяет, что без fallback при разомкнутом предохранителе поднимается CircuitOpenError"""
+    monkeypatch.setattr(resilience, 'get_retry_delay', lambda attempt: 0)
+
+    @resilient(REDIS, max_tries=1)
+    async def get_value():
+        raise RedisConnectionError()
+
+    for _ in range(get_circuit_breaker(REDIS).failure_threshold):
+        with pytest.raises(RedisConnectionError):
+            await get_value()
+
+    with pytest.raises(CircuitOpenError):
+        await get_value()
+
+
+@pytest.mark.asyncio
+async def test_resilient_probe_is_retried_within_one_call(monkeypatch):
+    """Тест проверяет, что пробный запрос после размыкания повторяется в том же вызове и замыкает предохранитель"""
+    monkeypatch.setattr(resilience, 'get_retry_delay', lambda attempt: 0)
+    breaker = get_circuit_breaker(REDIS)
+    breaker.state = CircuitBreaker.HALF_OPEN
+    calls = []
+
+    @resilient(REDIS, max_tries=3)
+    async def get_value():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RedisConnectionError()
+        return 'value'
+
+    assert await get_value() == 'value'
+    assert len(calls) == 2
+    assert breaker.state == CircuitBreaker.CLOSED
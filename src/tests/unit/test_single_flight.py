@@ -0,0 +1,135 @@
+import asyncio
+import time
+
+import pytest
+
+from services.deadline import deadline_scope
+from services.single_flight import LOCK_KEY_PREFIX
+
+
+class SlowLockRedis:
+    """Redis, который отвечает на команды блокировки дольше бюджета запроса"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.calls = []
+
+    async def set(self, *args, **kwargs):
+        self.calls.append('set')
+        await asyncio.sleep(self.delay)
+        return True
+
+    async def eval(self, *args):
+        self.calls.append('eval')
+        await asyncio.sleep(self.delay)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_are_collapsed(single_flight):
+    """Тест проверяет, что одновременные вызовы с одним ключом выполняют функцию один раз"""
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return 'value'
+
+    results = await asyncio.gather(*[single_flight.do('key', compute) for _ in range(10)])
+
+    assert results == ['value'] * 10
+    assert calls == 1
+    assert not single_flight.is_in_flight('key')
+
+
+@pytest.mark.asyncio
+async def test_lock_is_taken_and_released(single_flight, fake_redis):
+    """Тест проверяет, что значение вычисляется под блокировкой в Redis, которая затем снимается"""
+    async def compute():
+        assert LOCK_KEY_PREFIX + 'key' in fake_redis.data
+        return 'value'
+
+    result = await single_flight.do_with_lock(fake_redis, 'key', read_cache=_no_value, compute=compute)
+
+    assert result == 'value'
+    assert LOCK_KEY_PREFIX + 'key' not in fake_redis.data
+
+
+@pytest.mark.asyncio
+async def test_waits_for_value_computed_by_other_worker(single_flight, fake_redis):
+    """Тест проверяет, что при чужой блокировке значение берется из кэша, а не вычисляется повторно"""
+    fake_redis.data[LOCK_KEY_PREFIX + 'key'] = b'other worker'
+    cache = {}
+
+    async def other_worker():
+        await asyncio.sleep(0.02)
+        cache['key'] = 'value'
+
+    async def compute():
+        raise AssertionError('value must not be computed twice')
+
+    async def read_cache():
+        return cache.get('key')
+
+    _, result = await asyncio.gather(
+        other_worker(), single_flight.do_with_lock(fake_redis, 'key', read_cache=read_cache, compute=compute),
+    )
+    assert result == 'value'
+    assert single_flight.collapsed_remote == 1
+
+
+@pytest.mark.asyncio
+async def test_missing_value_marked_by_other_worker_is_not_recomputed(single_flight, fake_redis):
+    """Тест проверяет, что отметка другого воркера об отсутствии значения завершает ожидание результатом None"""
+    fake_redis.data[LOCK_KEY_PREFIX + 'key'] = b'other worker'
+    missing = set()
+
+    async def other_worker():
+        await asyncio.sleep(0.02)
+        missing.add('key')
+
+    async def compute():
+        raise AssertionError('value must not be computed twice')
+
+    async def is_missing():
+        return 'key' in missing
+
+    _, result = await asyncio.gather(
+        other_worker(),
+        single_flight.do_with_lock(fake_redis, 'key', read_cache=_no_value, compute=compute, is_missing=is_missing),
+    )
+    assert result is None
+    assert single_flight.collapsed_remote == 1
+
+
+@pytest.mark.asyncio
+async def test_slow_lock_does_not_outlive_deadline(single_flight):
+    """Тест проверяет, что медленный Redis не задерживает запрос дольше его бюджета времени"""
+    redis = SlowLockRedis(delay=1)
+
+    async def compute():
+        return 'value'
+
+    started = time.monotonic()
+    with deadline_scope(0.1):
+        result = await single_flight.do_with_lock(redis, 'key', read_cache=_no_value, compute=compute)
+
+    assert result == 'value'
+    assert time.monotonic() - started < 0.1
+
+
+@pytest.mark.asyncio
+async def test_lock_is_skipped_when_budget_is_almost_spent(single_flight):
+    """Тест проверяет, что при остатке бюджета меньше одного обращения к Redis блокировка не берется"""
+    redis = SlowLockRedis(delay=0)
+
+    async def compute():
+        return 'value'
+
+    with deadline_scope(0.001):
+        assert await single_flight.do_with_lock(redis, 'key', read_cache=_no_value, compute=compute) == 'value'
+    assert redis.calls == []
+
+
+async def _no_value():
+    return None